@@ -0,0 +1,208 @@
+from collections.abc import Mapping
+
+
+class BalanceState(Mapping):
+    """
+    Immutable balance state of the network after one block. A state either holds every balance itself (a checkpoint)
+    or only the balances its block changed, layered on top of the state before it. Unchanged accounts are shared with
+    the base state instead of being copied.
+
+    Attributes
+    ----------
+    base : BalanceState or None
+        state this one was derived from. None for checkpoints.
+    delta : dict
+        new balances of the accounts touched by this state's block (every balance for checkpoints).
+    depth : int
+        number of states between this one and the checkpoint it is derived from.
+    total : float
+        sum of all balances, maintained incrementally when a state is derived.
+
+    Methods
+    ----------
+    derive(delta: dict)
+        Returns a new state with the balances in delta layered on top of this one.
+    flatten()
+        Returns a checkpoint holding the same balances as this state.
+    to_dict()
+        Returns a plain dict of all balances.
+    """
+    __slots__ = ('base', 'delta', 'depth', 'total')
+
+    def __init__(self, delta: dict, base=None, total: float = None):
+        """
+        Constructor for a BalanceState. Without a base the state is a checkpoint and delta must hold every balance.
+
+        :param delta: dict. Balances changed relative to base, or all balances if base is None.
+        :param base: BalanceState. State this one is derived from.
+        :param total: float. Sum of all balances, computed from delta and base if not given.
+        """
+        self.base = base
+        self.delta = delta
+        self.depth = 0 if base is None else base.depth + 1
+        if total is None:
+            if base is None:
+                total = sum(delta.values())
+            else:
+                total = base.total + sum(v - base.get(k, 0) for k, v in delta.items())
+        self.total = total
+
+    def __getitem__(self, node):
+        state = self
+        while state is not None:
+            if node in state.delta:
+                return state.delta[node]
+            state = state.base
+        raise KeyError(node)
+
+    def __contains__(self, node) -> bool:
+        try:
+            self[node]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return len(self.to_dict())
+
+    def __str__(self) -> str:
+        return str(self.to_dict())
+
+    def __repr__(self) -> str:
+        return 'BalanceState(' + str(self) + ')'
+
+    def derive(self, delta: dict):
+        """
+        Returns a new state with the balances in delta layered on top of this one.
+
+        :param delta: dict. New balances of the touched accounts.
+        :return: BalanceState.
+        """
+        return BalanceState(delta, base=self)
+
+    def to_dict(self) -> dict:
+        """
+        Returns a plain dict of all balances, applying the deltas from the checkpoint forward.
+
+        :return: dict.
+        """
+        chain = []
+        state = self
+        while state is not None:
+            chain.append(state.delta)
+            state = state.base
+        balances = {}
+        for delta in reversed(chain):
+            balances.update(delta)
+        return balances
+
+    def flatten(self):
+        """
+        Returns a checkpoint holding the same balances as this state.
+
+        :return: BalanceState.
+        """
+        return BalanceState(self.to_dict(), total=self.total)
+
+
+class BalanceHistory:
+    """
+    List-like history of BalanceState objects, one per block index. Consecutive states share structure, and every
+    checkpoint_interval states a full checkpoint is stored so that looking up a historical balance never walks more
+    than checkpoint_interval deltas. The balances of the tip are also kept in a plain dict so current balances can be
+    read in O(1).
+
+    Attributes
+    ----------
+    states : list
+        BalanceState for every block index.
+    checkpoint_interval : int
+        maximum depth of a state before it is stored as a full checkpoint.
+    tip : dict
+        balances of the last state.
+    first_index : int
+        block index of the first state held. Non-zero when the history was restored from a checkpoint, earlier states
+        are then not held in memory.
+
+    Methods
+    ----------
+    put(state: BalanceState, index: int)
+        Stores state at index, dropping any states at or after index first.
+    """
+    DEFAULT_CHECKPOINT_INTERVAL = 64
+
+    def __init__(self, initial_balances: dict, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+                 first_index: int = 0):
+        """
+        Constructor for a BalanceHistory holding only one state, the genesis state or a restored checkpoint.
+
+        :param initial_balances: dict. Balances of the genesis block, or of the checkpointed block.
+        :param checkpoint_interval: int. Maximum number of deltas between two full checkpoints.
+        :param first_index: int. Block index of initial_balances.
+        """
+        self.checkpoint_interval = checkpoint_interval
+        self.first_index = first_index
+        self.states = [BalanceState(dict(initial_balances))]
+        self.tip = dict(initial_balances)
+
+    @classmethod
+    def from_dicts(cls, balances: list, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Builds a history from a list of full balance dicts, as stored by older versions of the Ledger.
+
+        :param balances: list. One balance dict per block index.
+        :param checkpoint_interval: int. Maximum number of deltas between two full checkpoints.
+        :return: BalanceHistory.
+        """
+        history = cls(balances[0], checkpoint_interval)
+        for index in range(1, len(balances)):
+            previous, current = balances[index - 1], balances[index]
+            delta = {k: v for k, v in current.items() if previous.get(k) != v}
+            history.put(history.states[-1].derive(delta), index)
+        return history
+
+    def __getitem__(self, index) -> BalanceState:
+        if index < 0:
+            index += len(self)
+        if index < self.first_index:
+            raise IndexError('balance state ' + str(index) + ' is older than the restored checkpoint')
+        return self.states[index - self.first_index]
+
+    def __len__(self) -> int:
+        return self.first_index + len(self.states)
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __str__(self) -> str:
+        return str([state.to_dict() for state in self.states])
+
+    def put(self, state: BalanceState, index: int):
+        """
+        Stores state at index. If index already holds a state, that state and every state after it are dropped first.
+
+        :param state: BalanceState. State to store.
+        :param index: int. Block index the state belongs to.
+        :return: None
+        """
+        position = index - self.first_index
+        extends_tip = position >= len(self.states)
+        del self.states[position:]
+        if state.depth >= self.checkpoint_interval:
+            state = state.flatten()
+        if extends_tip and state.base is not None and state.base is self.states[-1]:
+            self.tip.update(state.delta)
+        else:
+            self.tip = state.to_dict()
+        self.states.append(state)
+
+
+if __name__ == '__main__':
+    history = BalanceHistory({'0': 10, '1': 10, '2': 10, '3': 10}, checkpoint_interval=4)
+    for i in range(1, 10):
+        history.put(history[-1].derive({'0': history.tip['0'] - 1, '1': history.tip['1'] + 1}), i)
+    print('state 3: ', history[3], ' depth: ', history[3].depth)
+    print('tip: ', history.tip, ' total: ', history[-1].total)
@@ -1,42 +1,232 @@
-import json, hashlib, datetime, copy
+import json, hashlib, datetime
 from Transaction import Transaction
+from TransactionBatch import TransactionBatch, iter_transfers
+import Merkle
 
 
 class Block:
+    """
+    A block of transactions. Besides the transactions and the signatures collected for it, every block carries a header
+    of its index, timestamp, the hash of the previous block's header (prev_hash) and the Merkle root over the unique_ids
+    of its transactions. Headers alone are enough to check that the chain is linked and, with an inclusion proof, that
+    a transaction is part of a block.
+
+    Once a block is created its transactions are frozen into a tuple and the encoded form of everything but the
+    signatures is cached, so serializing a block while it collects signatures only re-encodes the signature section.
+    Signatures are added with add_signature. Code that changes any other attribute has to call invalidate().
+    """
 
     def __init__(self, json_string: str = '', timestamp: str = '',
-                 transactions: list = [], index: int = 0):
+                 transactions: list = [], index: int = 0, prev_hash: str = ''):
         """
         Constructor for a Block.
 
         :param json_string: str. Constructor can take in just a JSON string and build a block object from that.
         :param timestamp: str. Used if JSON string parameter not used.
-        :param transactions: list of Transaction objects. Used if JSON string parameter not used.
+        :param transactions: list of Transaction objects, or a TransactionBatch. Used if JSON string parameter not used.
         :param index: int. Used if JSON string parameter not used.
+        :param prev_hash: str. Header hash of the previous block, '' for the genesis block. Used if JSON string
+        parameter not used.
         """
         # if JSON string is provided, assign parameters from that.
         if json_string != '':
             json_obj = json.loads(json_string)
             self.index = int(json_obj['index'])
             self.timestamp = json_obj['timestamp']
-            self.transactions = [Transaction(x) for x in json_obj['transactions']]
+            self.transactions = tuple(Transaction(x) for x in json_obj['transactions'])
             self.signatures = json_obj['signatures']
+            # blocks written before headers were introduced have no prev_hash and no stored root
+            self.prev_hash = json_obj.get('prev_hash', '')
+            self.merkle_root = json_obj.get('merkle_root') or self.compute_merkle_root()
         # otherwise construct Block from assigned variables.
         else:
             self.index = index
             self.timestamp = str(datetime.datetime.now())
-            self.transactions = transactions
+            self.transactions = self.freeze(transactions)
             self.signatures = {}  # 'key':value -> 'unique node signature':stake
+            self.prev_hash = prev_hash
+            self.merkle_root = self.compute_merkle_root()
+        self._header_hash = None
+        self._encoded = None  # (JSON before the signatures, JSON after the signatures)
+
+    @classmethod
+    def from_fields(cls, index: int, timestamp: str, transactions: list, signatures: dict, prev_hash: str = '',
+                    merkle_root: str = None):
+        """
+        Construct a block from already decoded attributes, e.g. by a codec, without parsing JSON.
+
+        :param index: int.
+        :param timestamp: str.
+        :param transactions: list of Transaction objects.
+        :param signatures: dict. 'unique node signature':stake
+        :param prev_hash: str. Header hash of the previous block.
+        :param merkle_root: str. Merkle root over the transaction ids, computed if not given.
+        :return: Block.
+        """
+        block = cls.__new__(cls)
+        block.index = index
+        block.timestamp = timestamp
+        block.transactions = cls.freeze(transactions)
+        block.signatures = signatures
+        block.prev_hash = prev_hash
+        block.merkle_root = merkle_root or block.compute_merkle_root()
+        block._header_hash = None
+        block._encoded = None
+        return block
+
+    @staticmethod
+    def freeze(transactions):
+        """
+        Returns the transactions in a form that cannot be appended to or reordered after the block was created.
+
+        :param transactions: list of Transaction objects, or a TransactionBatch (already read-only).
+        :return: tuple of Transaction objects, or the TransactionBatch.
+        """
+        if isinstance(transactions, (tuple, TransactionBatch)):
+            return transactions
+        return tuple(transactions)
+
+    def __setstate__(self, state: dict):
+        """
+        Restore a pickled block, including ones pickled before headers and caching were introduced.
+
+        :param state: dict. Attribute dict.
+        :return: None
+        """
+        self.__dict__.update(state)
+        self.transactions = self.freeze(self.transactions)
+        self.prev_hash = state.get('prev_hash', '')
+        self.merkle_root = state.get('merkle_root') or self.compute_merkle_root()
+        self._header_hash = None
+        self._encoded = None
 
     def __str__(self):
         """
-        override for the string representation of a Block
+        override for the string representation of a Block. Only the signatures are encoded on every call, the rest is
+        encoded once and cached.
 
         :return: str.
         """
-        block_dict = copy.deepcopy(self.__dict__)
-        block_dict['transactions'] = [str(tx) for tx in block_dict['transactions']]
-        return json.dumps(block_dict)
+        if self._encoded is None:
+            head = json.dumps({
+                'index': self.index,
+                'timestamp': self.timestamp,
+                'transactions': [str(tx) for tx in self.transactions]
+            })
+            tail = json.dumps({'prev_hash': self.prev_hash, 'merkle_root': self.merkle_root})
+            self._encoded = (head[:-1] + ', "signatures": ', ', ' + tail[1:])
+        head, tail = self._encoded
+        return head + json.dumps(self.signatures) + tail
+
+    def add_signature(self, signature: str, stake: float):
+        """
+        Adds the stake of a signer to the block. Signatures are not part of the header or the cached encoding, so
+        nothing has to be invalidated.
+
+        :param signature: str. Unique signature of the signing node.
+        :param stake: float. Stake the node puts behind the block.
+        :return: None
+        """
+        self.signatures[signature] = stake
+
+    def invalidate(self):
+        """
+        Drops every cached encoding and recomputes the Merkle root. Must be called after the index, timestamp,
+        transactions or prev_hash of the block were changed.
+
+        :return: None
+        """
+        self.transactions = self.freeze(self.transactions)
+        for tx in self.transactions:
+            if isinstance(tx, Transaction):
+                tx.invalidate()
+        self.merkle_root = self.compute_merkle_root()
+        self._header_hash = None
+        self._encoded = None
+
+    def transaction_ids(self) -> list:
+        return [unique_id for _, _, _, unique_id in iter_transfers(self.transactions)]
+
+    def compute_merkle_root(self) -> str:
+        """
+        Compute the Merkle root over the unique_ids of the block's transactions.
+
+        :return: str. Hex digest.
+        """
+        return Merkle.merkle_root(self.transaction_ids())
+
+    def verify_merkle_root(self) -> bool:
+        """
+        Check that the Merkle root in the header matches the block's transactions.
+
+        :return: bool.
+        """
+        return self.merkle_root == self.compute_merkle_root()
+
+    def verify_transaction_ids(self) -> bool:
+        """
+        Check that every transaction carries the hash of its own fields as its unique_id. The Merkle root only covers
+        the ids, so without this check a relay could change the amount or receiver of a transaction and the header and
+        its signatures would still verify.
+
+        :return: bool.
+        """
+        return all(tx.generateIDh() == tx.unique_id for tx in self.transactions)
+
+    def header(self) -> dict:
+        """
+        Returns the header of the block. Signatures are not part of it, so the header does not change while stake is
+        collected.
+
+        :return: dict.
+        """
+        return {'index': self.index, 'timestamp': self.timestamp, 'prev_hash': self.prev_hash,
+                'merkle_root': self.merkle_root}
+
+    @staticmethod
+    def hash_header(header: dict) -> str:
+        """
+        Returns the hash of a block header.
+
+        :param header: dict. Header as returned by Block.header().
+        :return: str. Hex SHA-256 digest.
+        """
+        return hashlib.sha256(json.dumps(header, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def header_hash(self) -> str:
+        """
+        Returns the hash of the block header, computed once and cached.
+
+        :return: str. Hex SHA-256 digest.
+        """
+        if self._header_hash is None:
+            self._header_hash = self.hash_header(self.header())
+        return self._header_hash
+
+    def inclusion_proof(self, unique_id: str) -> list:
+        """
+        Returns a proof that the transaction with unique_id is part of this block, verifiable against the header alone
+        with Block.verify_inclusion.
+
+        :param unique_id: str.
+        :return: list. Merkle proof, see Merkle.merkle_proof. None if the transaction is not in the block.
+        """
+        ids = self.transaction_ids()
+        if unique_id not in ids:
+            return None
+        return Merkle.merkle_proof(ids, ids.index(unique_id))
+
+    @staticmethod
+    def verify_inclusion(header: dict, unique_id: str, proof: list) -> bool:
+        """
+        Check an inclusion proof against a block header, without the block's transactions.
+
+        :param header: dict. Header as returned by Block.header().
+        :param unique_id: str. Id of the transaction.
+        :param proof: list. Proof as returned by Block.inclusion_proof.
+        :return: bool.
+        """
+        return proof is not None and Merkle.verify_proof(unique_id, proof, header['merkle_root'])
 
     def verify_proof_of_stake(self):
 
@@ -50,7 +240,7 @@ class Block:
             # print('looping through signatures key: ', k, 'value: ', v, '\n')
             sum_stake += v
         # If there is enough stake, return True
-        if sum_stake > sum([tx.amount for tx in self.transactions]):
+        if sum_stake > sum(amount for _, _, amount, _ in iter_transfers(self.transactions)):
             return True
         # This means there was not enough stake
         else:
@@ -71,3 +261,44 @@ if __name__ == '__main__':
     print('\njson representation of block b: \n', str(b), '\n')
     b2 = Block(str(b))
     print(b2.verify_proof_of_stake())
+    unique_id = b2.transactions[1].unique_id
+    proof = b2.inclusion_proof(unique_id)
+    print('header hash: ', b2.header_hash())
+    print('inclusion proof valid: ', Block.verify_inclusion(b2.header(), unique_id, proof))
+
+    # cached encoding must track signatures and be dropped only by invalidate()
+    assert str(b2) == str(Block(str(b2)))
+    b2.add_signature('2', 1.5)
+    assert json.loads(str(b2))['signatures']['2'] == 1.5
+    b2.timestamp = 'changed'
+    assert json.loads(str(b2))['timestamp'] != 'changed'
+    b2.invalidate()
+    assert json.loads(str(b2))['timestamp'] == 'changed' and b2.header_hash() == Block.hash_header(b2.header())
+    tx = b2.transactions[0]
+    tx.amount = 99
+    tx.invalidate()
+    assert json.loads(str(tx))['amount'] == 99
+    print('cache invalidation checks passed')
+
+    # Benchmark: serialization cost of one signature-collection hop (sign, then str() for the message and the
+    # verify/forward path), before and after caching.
+    # usage: python Block.py [transactions per block] [hops]
+    import copy, sys, time
+    n_tx = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    hops = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    block = Block(index=1, transactions=[Transaction(_to='1', _from='2', amount=0.5) for _ in range(n_tx)])
+
+    def uncached_str(block):
+        block_dict = copy.deepcopy({k: v for k, v in block.__dict__.items() if not k.startswith('_')})
+        block_dict['transactions'] = [json.dumps(tx.to_dict()) for tx in block_dict['transactions']]
+        return json.dumps(block_dict)
+
+    for name, encode in (('uncached', uncached_str), ('cached', str)):
+        block.signatures = {}
+        start = time.perf_counter()
+        for hop in range(hops):
+            block.add_signature(str(hop), 0.1)
+            for _ in range(3):
+                encode(block)
+        elapsed = time.perf_counter() - start
+        print('{:8} {:.3f} ms per hop ({} transactions)'.format(name, elapsed / hops * 1000, n_tx))
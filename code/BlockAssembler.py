@@ -0,0 +1,165 @@
+from Transaction import Transaction
+from Codec import get_codec
+
+
+def by_age(tx: Transaction):
+    return 0  # stable sort keeps the mempool's arrival order, oldest first
+
+
+def by_amount(tx: Transaction):
+    return -tx.amount
+
+
+def by_fee(tx: Transaction):
+    return -tx.fee
+
+
+PRIORITIES = {'age': by_age, 'amount': by_amount, 'fee': by_fee}
+
+
+def encoded_size(tx: Transaction, codec=None) -> int:
+    """
+    Returns the number of bytes a transaction adds to a Block message encoded with codec.
+
+    :param tx: Transaction.
+    :param codec: JsonCodec or BinaryCodec, defaults to JSON, the larger encoding.
+    :return: int.
+    """
+    return (codec or get_codec('json')).transaction_size(tx)
+
+
+class BlockAssembler:
+    """
+    Picks the transactions of the next block from the pending ones. Candidates are ordered by a pluggable priority and
+    taken until the block holds max_transactions or its transactions would exceed max_bytes in the Block message of the
+    codec the node sends blocks with, so block size, serialization time and signature collection stay bounded no matter
+    how many transactions are pending. Transactions that are not picked stay in the mempool for the next term.
+
+    Attributes
+    ----------
+    max_transactions : int
+        maximum number of transactions in a block.
+    max_bytes : int
+        maximum size in bytes of the encoded transactions of a block.
+    codec : JsonCodec or BinaryCodec
+        codec whose encoding max_bytes is measured in.
+    priority : function
+        key function, candidates with a smaller key are picked first. Ties keep the mempool order.
+
+    Methods
+    ----------
+    select(candidates: list, balances: Mapping)
+        Returns the transactions to put into the next block in priority order and the candidates that can never be
+        admitted on these balances.
+    """
+    DEFAULT_MAX_TRANSACTIONS = 500
+    # measured in the message as sent, so it leaves room for the header and signatures below the 256KiB SQS message limit
+    DEFAULT_MAX_BYTES = 192 * 1024
+
+    def __init__(self, max_transactions: int = DEFAULT_MAX_TRANSACTIONS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 priority='age', codec='json'):
+        """
+        Constructor for a BlockAssembler.
+
+        :param max_transactions: int. Maximum number of transactions in a block.
+        :param max_bytes: int. Maximum size in bytes of the encoded transactions of a block.
+        :param priority: str or function. 'age', 'amount', 'fee', or a key function taking a Transaction.
+        :param codec: str or codec. Codec the blocks are sent with, 'json' or 'binary' (see Codec.py).
+        """
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.codec = get_codec(codec) if isinstance(codec, str) else codec
+        self.priority = PRIORITIES[priority] if isinstance(priority, str) else priority
+
+    def order(self, candidates: list) -> list:
+        """
+        Returns the candidates in the order they are considered for the block.
+
+        :param candidates: list of Transaction objects, oldest first.
+        :return: list of Transaction objects.
+        """
+        if self.priority is by_age:
+            return candidates
+        return sorted(candidates, key=self.priority)
+
+    def select(self, candidates: list, balances=None) -> tuple:
+        """
+        Picks the transactions of the next block in a single pass over the candidates, in priority order. A candidate
+        that does not fit into the remaining bytes is skipped so smaller ones after it can still fill the block.
+
+        If balances are given, every candidate is checked against an overlay of the balances changed by the
+        transactions admitted so far: it is admitted if its sender stays solvent and skipped otherwise, without
+        affecting any other transaction of the same sender, so the block never has to be verified again after it was
+        built. A skipped candidate is only invalid if its sender cannot afford it on the given balances alone; one
+        that overdraws only after other transactions of the block depends on the order and stays pending, the sender
+        may afford it in a later block.
+
+        :param candidates: list of Transaction objects, oldest first, e.g. Mempool.snapshot().
+        :param balances: Mapping. Balances the block is applied to, e.g. the ledger tip. None skips the solvency check.
+        :return: tuple. (selected Transaction objects, unique_ids of the candidates invalid on the balances)
+        """
+        selected = []
+        invalid = []
+        change = {}  # account -> balance after the transactions admitted so far
+        size = 0
+        for tx in self.order(candidates):
+            if len(selected) >= self.max_transactions:
+                break
+            checked = balances is not None and tx.from_node != 'reward'
+            if checked:
+                sender = change[tx.from_node] if tx.from_node in change else balances.get(tx.from_node, 0)
+                if sender - tx.amount < 0:
+                    if balances.get(tx.from_node, 0) - tx.amount < 0:
+                        invalid.append(tx.unique_id)
+                    continue
+            tx_size = encoded_size(tx, self.codec)
+            if size + tx_size > self.max_bytes:
+                continue
+            if balances is not None:
+                if checked:
+                    change[tx.from_node] = sender - tx.amount
+                receiver = change[tx.to_node] if tx.to_node in change else balances.get(tx.to_node, 0)
+                change[tx.to_node] = receiver + tx.amount
+            selected.append(tx)
+            size += tx_size
+        return selected, invalid
+
+
+if __name__ == '__main__':
+    # Benchmark: time to assemble and serialize a block as the number of pending transactions grows.
+    # usage: python BlockAssembler.py [max transactions per block]
+    import random, sys, time
+    from Block import Block
+    from Ledger import Ledger
+    max_transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    balances = dict(Ledger.INITIAL_BALANCES)
+    for priority in ('age', 'fee'):
+        assembler = BlockAssembler(max_transactions, priority=priority)
+        for pending in (100, 1000, 10000, 50000):
+            candidates = [Transaction(_to=random.choice('0123'), _from=random.choice('0123'), amount=0.01,
+                                      fee=random.choice([0, 0.01, 0.05])) for _ in range(pending)]
+            start = time.perf_counter()
+            selected, invalid = assembler.select(candidates, balances)
+            encoded = assembler.codec.encode_message('Block', {'block': Block(index=1, transactions=selected)})['contents']
+            print('{:4} {:>6} pending -> {:>4} transactions, {:>4} invalid, {:>7} bytes, {:.1f} ms'.format(
+                priority, pending, len(selected), len(invalid), len(encoded), (time.perf_counter() - start) * 1000))
+
+    # a block filled up to max_bytes stays below the SQS message limit with either codec, signatures included
+    candidates = [Transaction(_to=random.choice('0123'), _from=random.choice('0123'), amount=0.01) for _ in range(5000)]
+    for codec in ('json', 'binary'):
+        assembler = BlockAssembler(len(candidates), codec=codec)
+        block = Block(index=1, transactions=assembler.select(candidates)[0])
+        for node in range(8):
+            block.add_signature(str(node) + ':' + '00' * 64, 1.5)
+        contents = assembler.codec.encode_message('Block', {'block': block, 'leader_id': '0', 'term': 1,
+                                                            'history': [str(node) for node in range(8)]})['contents']
+        print('{:6} full block: {:>4} transactions, message {:>6} bytes, below 256KiB: {}'.format(
+            codec, len(block.transactions), len(contents), len(contents) < 256 * 1024))
+
+    # a transaction overdrawing after the sender's earlier ones is skipped but stays pending, without taking the
+    # sender's other transactions with it; only one the sender cannot afford at all is invalid
+    spend = [Transaction(_to='1', _from='2', amount=6), Transaction(_to='3', _from='2', amount=6),
+             Transaction(_to='1', _from='2', amount=3), Transaction(_to='1', _from='2', amount=balances['2'] + 1)]
+    selected, invalid = BlockAssembler().select(spend, balances)
+    print('admitted: ', [tx.amount for tx in selected], ' pending: ', len(spend) - len(selected) - len(invalid),
+          ' invalid: ', len(invalid))
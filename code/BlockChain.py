@@ -1,39 +1,59 @@
 from Block import Block
-from Transaction import Transaction
 from Ledger import Ledger
-import datetime, os, pickle, collections, copy
+from BlockLog import BlockLog
+from BlockStore import BlockStore
+from ChainRenderer import format_block, BackgroundRenderer
+import os, pickle
 
 
 class BlockChain:
-    def __init__(self, node_id: str, ledger: Ledger):
+    GENESIS_TIMESTAMP = '2020-01-01 00:00:00'
+
+    def __init__(self, node_id: str, ledger: Ledger, segment_size: int = BlockLog.DEFAULT_SEGMENT_SIZE,
+                 incremental_text: bool = True, background_render: bool = False,
+                 cache_size: int = BlockStore.DEFAULT_CACHE_SIZE):
         """
         Constructor initializes a BlockChain using a Genesis Block. Only used if no chain already on disk when Node.py
         starts up.
 
-        :param node_id: str. One of '0', '1', '2', or '3', the possible nodes in network.
+        :param node_id: str. Id of the node, see Cluster.
         :param ledger: Ledger. Reference to ledger passed to constructor for reference.
+        :param segment_size: int. Size in bytes at which the on-disk block log rolls over to a new segment.
+        :param incremental_text: bool. If True the text file is append-only (oldest block first) and only the new block
+        is formatted on every add. If False the whole newest-first text file is rewritten on every add.
+        :param background_render: bool. If True request_render regenerates the newest-first view of the chain on a
+        renderer thread instead of the calling thread. The view is only rendered on request, never per added block.
+        :param cache_size: int. Maximum number of decoded blocks kept in memory, the rest are read from disk on demand.
         """
         self.ledger = ledger
         self.node_id = node_id
         filename = '../files/blockchain' + node_id
         self.file_path = filename + '.txt'
         self.pickle_path = filename + '.pickle'
-        self.blockchain = []
+        self.log_path = filename + '_log'
+        self.newest_first_path = filename + '_newest_first.txt'
+        self.incremental_text = incremental_text
+        self.renderer = BackgroundRenderer(self.render_newest_first, 'Chain Renderer Thread' + node_id) \
+            if background_render else None
+        self.segment_size = segment_size
+        self.cache_size = cache_size
+        self.block_log = None
+        self.blockchain = None  # BlockStore, list-like view of the chain on disk
         self.saved_blocks = []
         self.create_or_read_file()
 
     def add_block(self, block):
         """
-        This method adds blocks to the chain and writes new chain to disk.
+        This method adds blocks to the chain and appends the new block to the block log on disk. Replacing an existing
+        index drops that block and every block after it before appending.
 
         :param block: Block. Block to be added to chain. Block is assumed to have been verified already
         :return: None
         """
-        if block.index >= len(self.blockchain):
-            self.blockchain.append(block)
-        else:
-            self.blockchain[block.index] = block
-        self.write_to_disk()
+        replaced = block.index < len(self.blockchain)
+        if replaced:
+            self.blockchain.truncate(block.index)
+        self.write_to_disk(block, replaced)
 
     def get_last_block(self) -> Block:
         """
@@ -41,44 +61,86 @@ class BlockChain:
 
         :return: Block.
         """
-        return self.blockchain[-1]
+        return self.blockchain.get_last_block()
+
+    def get_block(self, index: int) -> Block:
+        """
+        Returns the block at index, read from disk if it is not cached.
+
+        :param index: int.
+        :return: Block.
+        """
+        return self.blockchain.get_block(index)
+
+    def get_header(self, index: int) -> dict:
+        """
+        Returns the header of the block at index without decoding the block.
+
+        :param index: int.
+        :return: dict. Header as returned by Block.header().
+        """
+        return self.blockchain.get_header(index)
+
+    def verify_headers(self) -> list:
+        """
+        Checks the integrity of the chain by walking the headers only: every header has to carry the index of its
+        position and the hash of the header before it. Blocks written before headers were introduced have an empty
+        prev_hash and are not checked.
+
+        :return: list. Indices of the blocks whose header does not link to the previous one.
+        """
+        broken = []
+        previous_hash = None
+        for index, header in enumerate(self.blockchain.iter_headers()):
+            if header['index'] != index or (header['prev_hash'] and header['prev_hash'] != previous_hash):
+                broken.append(index)
+            previous_hash = Block.hash_header(header)
+        return broken
+
+    def extends_tip(self, block: Block) -> bool:
+        """
+        Checks that a block directly follows the last block of the chain: its index is the next one, its prev_hash is
+        the hash of the last header, and its Merkle root matches its transactions, whose ids match their contents.
+
+        :param block: Block.
+        :return: bool.
+        """
+        last = self.get_header(-1)
+        return block.index == last['index'] + 1 and block.prev_hash == Block.hash_header(last) \
+            and block.verify_merkle_root() and block.verify_transaction_ids()
+
+    def prove_transaction(self, index: int, unique_id: str) -> tuple:
+        """
+        Returns what a light observer needs to confirm that a transaction is part of the chain: the header of the block
+        holding it and an inclusion proof to check against that header with Block.verify_inclusion.
+
+        :param index: int. Index of the block holding the transaction.
+        :param unique_id: str. Id of the transaction.
+        :return: tuple. (header, proof), proof is None if the transaction is not in the block.
+        """
+        block = self.get_block(index)
+        return block.header(), block.inclusion_proof(unique_id)
+
+    def iter_blocks(self, start: int = 0, stop: int = None):
+        """
+        Lazily iterates over the blocks in [start, stop).
+
+        :param start: int.
+        :param stop: int. Defaults to the end of the chain.
+        :return: generator of Block objects.
+        """
+        return self.blockchain.iter_blocks(start, stop)
 
     def __str__(self) -> str:
         """
-        Overrides native string representation of a BlockChain Object.
+        Overrides native string representation of a BlockChain Object. Blocks are listed newest first.
 
         :return: str. String representation of the BlockChain
         """
-        blockchain_string = 'Node ' + self.node_id + ' Blockchain: \n'
-        stack = collections.deque()
-        for block in self.blockchain:
-            stack.append(block)
-        for i in range(0, len(stack)):
-            block = stack.pop()
-            blockchain_string += '-'*75 + '\n'
-            for k, v in block.__dict__.items():
-                if k == 'transactions':
-                    blockchain_string += k + ':\n'
-                    for tx in v:
-                        tx_short = Transaction(str(tx))
-                        tx_short_dict = tx_short.__dict__
-                        for k2, v2 in tx_short_dict.items():
-                            #"2020-05-12 18:20:25.659289"
-                            if k2 == 'timestamp':
-                                tx_short_dict[k2] = v2[11:22]
-                            elif k2 == 'unique_id':
-                                tx_short_dict[k2] = v2[:5] + '...'
-                        blockchain_string += '\t' + str(tx_short) + '\n'
-                elif k == 'signatures':
-                    v_short = copy.deepcopy(v)
-                    new_sig = {}
-                    for k2, v2 in v_short.items():
-                        new_sig[k2[:8]+'...'] = v2
-                    blockchain_string += k + ': ' + str(new_sig) + '\n'
-                else:
-                    blockchain_string += k + ': ' + str(v) + '\n'
-            blockchain_string += '-' * 75 + '\n'
-        return blockchain_string
+        # decoded from a snapshot of the log, so the whole chain neither floods the block cache nor races a truncate
+        payloads = self.blockchain.payloads()
+        return 'Node ' + self.node_id + ' Blockchain: \n' + ''.join(format_block(Block(payload.decode('utf-8')))
+                                                                   for payload in reversed(payloads))
 
     def create_or_read_file(self):
         """
@@ -88,30 +150,100 @@ class BlockChain:
         # make sure the 'files' directory exists
         if not os.path.isdir('../files'):
             os.mkdir('../files')
-        try:
-            # try to read in files from disk if they exist
-            read_file = open(self.pickle_path, 'rb')
-            self.blockchain = pickle.load(read_file)
-            read_file.close()
+        self.block_log = BlockLog(self.log_path, self.segment_size)
+        if len(self.block_log) == 0 and os.path.exists(self.pickle_path):
+            self.migrate_pickle()
+        # blocks are decoded lazily, only when they are looked up
+        self.blockchain = BlockStore(self.block_log, self.cache_size)
+        if len(self.block_log) > 0:
             # print('blockchain loaded from file')
-        except FileNotFoundError:
+            if self.incremental_text and not self.text_file_is_incremental():
+                self.rewrite_text_file()
+        else:
             # if no blockchain exists, initialize one with the genesis block
-            self.blockchain = [  # Genesis block! as the first block in the chain the hashes are predetermined.
-                Block(
-                    index=0,
-                    timestamp=str(datetime.datetime.now()),
-                    transactions=[]
-                )
-            ]
-            self.write_to_disk()
-
-    def write_to_disk(self):
-        """
-        Write self to a human readable text file and dump contents of blockchain to a pickle
+            # Genesis block! as the first block in the chain its hash is predetermined: every node has to create the
+            # same one, or no block 1 of another node links to it (prev_hash)
+            genesis = Block.from_fields(0, self.GENESIS_TIMESTAMP, [], {})
+            self.write_to_disk(genesis)
+
+    def migrate_pickle(self):
+        """
+        One time migration of a chain stored by older versions as a single pickle. Every block is appended to the block
+        log and the pickle is renamed so it is not migrated again.
+
+        :return: None
+        """
+        with open(self.pickle_path, 'rb') as read_file:
+            blocks = pickle.load(read_file)
+        for block in blocks:
+            self.block_log.append(str(block).encode('utf-8'))
+        os.replace(self.pickle_path, self.pickle_path + '.migrated')
+        print('Migrated ', len(blocks), ' blocks from pickle to block log.')
+
+    def write_to_disk(self, block: Block, replaced: bool = False):
+        """
+        Append a newly added block to the block log and to the human readable text file. The text file is only
+        rewritten as a whole when an existing block was replaced or incremental text output is off.
+
+        :param block: Block. Block that was just added to the chain.
+        :param replaced: bool. True if the block replaced an existing index.
+        :return: None
+        """
+        self.blockchain.append(block)
+        if not self.incremental_text:
+            text_file = open(self.file_path, "w")
+            text_file.write(str(self))
+            text_file.close()
+        elif replaced or not os.path.exists(self.file_path):
+            self.rewrite_text_file()
+        else:
+            text_file = open(self.file_path, "a")
+            text_file.write(format_block(block))
+            text_file.close()
+
+    def text_file_is_incremental(self) -> bool:
+        """
+        Check whether the text file on disk was written in the append-only (oldest first) format.
+
+        :return: bool.
+        """
+        if not os.path.exists(self.file_path):
+            return False
+        with open(self.file_path, "r") as text_file:
+            return text_file.readline().endswith('(oldest first): \n')
+
+    def rewrite_text_file(self):
+        """
+        Rewrite the append-only text file from the whole chain, oldest block first.
+
         :return: None
         """
         text_file = open(self.file_path, "w")
-        text_file.write(str(self))
+        text_file.write('Node ' + self.node_id + ' Blockchain (oldest first): \n')
+        for block in self.blockchain:
+            text_file.write(format_block(block))
+        text_file.close()
+
+    def request_render(self):
+        """
+        Regenerate the newest-first view of the chain, on the renderer thread if background rendering is enabled. The
+        view takes time and memory proportional to the chain, so it is only rendered when asked for, e.g. by the
+        SIGUSR1 handler of Node.py.
+
+        :return: None
+        """
+        if self.renderer is not None:
+            self.renderer.request()
+        else:
+            self.render_newest_first()
+
+    def render_newest_first(self):
+        """
+        Write the newest-first view of the chain to its own text file.
+
+        :return: None
+        """
+        text = str(self)
+        text_file = open(self.newest_first_path, "w")
+        text_file.write(text)
         text_file.close()
-        # dump to pickle
-        pickle.dump(self.blockchain, open(self.pickle_path, "wb"))
@@ -0,0 +1,230 @@
+import os, struct, mmap
+from threading import RLock
+
+
+class BlockLog:
+    """
+    Append-only, segmented on-disk log of serialized blocks. Each block is stored as one length-prefixed record in a
+    segment file, and a small fixed-width index file maps the position of a block in the chain to the segment and
+    offset its record lives at. Segments roll over once they grow past segment_size bytes.
+
+    Opening a log only looks at the size of the index file and its last entry, so it takes the same time no matter how
+    long the chain is. Index entries are read on demand and segments are memory-mapped for reading.
+
+    Layout of the log directory:
+        segment000000.log, segment000001.log, ...   records: 4 byte big-endian length + payload
+        index                                       entries: segment (4 bytes), offset (8 bytes), length (4 bytes)
+
+    Attributes
+    ----------
+    directory : str
+        directory holding the segment files and the index.
+    segment_size : int
+        size in bytes after which a new segment is started.
+    count : int
+        number of records in the log.
+
+    Methods
+    ----------
+    append(payload: bytes)
+        Appends one record to the active segment and its entry to the index. Returns the position of the record.
+    truncate(position: int)
+        Drops the record at position and every record after it.
+    read(position: int)
+        Returns the payload of the record at position.
+    entry(position: int)
+        Returns the (segment, offset, length) index entry of the record at position.
+    """
+    DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+    RECORD_HEADER = struct.Struct('>I')
+    INDEX_ENTRY = struct.Struct('>IQI')
+
+    def __init__(self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE, read_only: bool = False):
+        """
+        Opens the log in directory, creating it if it does not exist yet.
+
+        :param directory: str. Directory holding the segments and the index file.
+        :param segment_size: int. Number of bytes after which the active segment is rolled over.
+        :param read_only: bool. Open the log for reading only, e.g. from a worker process while another process owns
+        the log. Nothing is created, repaired or written; a missing directory or index raises FileNotFoundError.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_path = os.path.join(directory, 'index')
+        self.count = 0
+        self.last_entry = None
+        self.maps = {}  # segment number -> mmap of that segment
+        self.lock = RLock()
+        self.read_only = read_only
+        if not os.path.isdir(directory):
+            if read_only:
+                raise FileNotFoundError('no block log in ' + directory)
+            os.makedirs(directory)
+        self.load_index()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def segment_path(self, segment: int) -> str:
+        """
+        Returns the file path of a segment.
+
+        :param segment: int. Segment number.
+        :return: str.
+        """
+        return os.path.join(self.directory, 'segment{:06d}.log'.format(segment))
+
+    def load_index(self):
+        """
+        Opens the index file and drops any trailing entries or record bytes left behind by an interrupted append.
+
+        :return: None
+        """
+        if not os.path.exists(self.index_path):
+            if self.read_only:
+                raise FileNotFoundError('no block log index ' + self.index_path)
+            open(self.index_path, 'wb').close()
+        self.index_fd = os.open(self.index_path, os.O_RDONLY if self.read_only else os.O_RDWR)
+        self.count = os.fstat(self.index_fd).st_size // self.INDEX_ENTRY.size
+        # a record is only valid if its segment actually holds all of its bytes
+        while self.count > 0:
+            segment, offset, length = self.entry(self.count - 1)
+            path = self.segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= offset + length:
+                break
+            self.count -= 1
+        if not self.read_only:
+            self.truncate(self.count)
+
+    def entry(self, position: int) -> tuple:
+        """
+        Returns the index entry of the record at position.
+
+        :param position: int. Position of the record in the log.
+        :return: tuple. (segment, offset, length)
+        """
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError('block log position out of range')
+        if position == self.count - 1 and self.last_entry is not None:
+            return self.last_entry
+        raw = os.pread(self.index_fd, self.INDEX_ENTRY.size, position * self.INDEX_ENTRY.size)
+        return self.INDEX_ENTRY.unpack(raw)
+
+    def tail(self) -> tuple:
+        """
+        Returns the segment and offset at which the next record will be written.
+
+        :return: tuple. (segment, offset)
+        """
+        if self.count == 0:
+            return 0, 0
+        segment, offset, length = self.entry(self.count - 1)
+        return segment, offset + length
+
+    def append(self, payload: bytes) -> int:
+        """
+        Appends one record to the log and its entry to the index.
+
+        :param payload: bytes. Serialized block.
+        :return: int. Position of the new record.
+        """
+        with self.lock:
+            segment, offset = self.tail()
+            if offset >= self.segment_size:
+                segment, offset = segment + 1, 0
+            record = self.RECORD_HEADER.pack(len(payload)) + payload
+            with open(self.segment_path(segment), 'ab') as segment_file:
+                segment_file.write(record)
+            entry = (segment, offset, len(record))
+            # index entry is written after the record so a crash never leaves an entry pointing at missing bytes
+            os.pwrite(self.index_fd, self.INDEX_ENTRY.pack(*entry), self.count * self.INDEX_ENTRY.size)
+            self.count += 1
+            self.last_entry = entry
+            return self.count - 1
+
+    def truncate(self, position: int):
+        """
+        Drops the record at position and every record after it, from both the segments and the index.
+
+        :param position: int. First position to drop.
+        :return: None
+        """
+        with self.lock:
+            self.count = min(position, self.count)
+            self.last_entry = None
+            segment, offset = self.tail()
+            # mappings of the segments being cut must not outlive the bytes they map
+            for mapped in [s for s in self.maps if s >= segment]:
+                self.maps.pop(mapped).close()
+            path = self.segment_path(segment)
+            if os.path.exists(path):
+                with open(path, 'r+b') as segment_file:
+                    segment_file.truncate(offset)
+            # remove every segment that now lies past the tail
+            later = segment + 1
+            while os.path.exists(self.segment_path(later)):
+                os.remove(self.segment_path(later))
+                later += 1
+            os.ftruncate(self.index_fd, self.count * self.INDEX_ENTRY.size)
+
+    def segment_map(self, segment: int, end: int) -> mmap.mmap:
+        """
+        Returns a read-only mapping of a segment that covers at least its first end bytes. The active segment is
+        remapped when it has grown past the current mapping.
+
+        :param segment: int. Segment number.
+        :param end: int. Number of bytes the mapping has to cover.
+        :return: mmap.mmap.
+        """
+        mapped = self.maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self.segment_path(segment), 'rb') as segment_file:
+                mapped = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = mapped
+        return mapped
+
+    def read(self, position: int) -> bytes:
+        """
+        Returns the payload of the record at position.
+
+        :param position: int. Position of the record in the log.
+        :return: bytes.
+        """
+        with self.lock:
+            segment, offset, length = self.entry(position)
+            mapped = self.segment_map(segment, offset + length)
+            return mapped[offset + self.RECORD_HEADER.size:offset + length]
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self.read(position)
+
+    def close(self):
+        """
+        Closes the index file and all segment mappings.
+
+        :return: None
+        """
+        with self.lock:
+            for mapped in self.maps.values():
+                mapped.close()
+            self.maps = {}
+            os.close(self.index_fd)
+
+
+if __name__ == '__main__':
+    import shutil, tempfile
+    log_dir = tempfile.mkdtemp()
+    log = BlockLog(log_dir, segment_size=64)
+    for i in range(10):
+        log.append(('block ' + str(i)).encode())
+    print('records: ', len(log), ' segments: ', sorted(os.listdir(log_dir)))
+    log.truncate(4)
+    log.append(b'block 4 replaced')
+    log.close()
+    print([payload.decode() for payload in BlockLog(log_dir, segment_size=64)])
+    shutil.rmtree(log_dir)
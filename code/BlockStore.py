@@ -0,0 +1,213 @@
+from Block import Block
+from BlockLog import BlockLog
+from threading import RLock
+import collections, json, os
+
+
+class BlockStore:
+    """
+    Random-access, list-like view of the chain backed by a BlockLog. Blocks are decoded from the memory-mapped log
+    only when they are looked up, and only the cache_size most recently used decoded blocks stay in memory.
+
+    Attributes
+    ----------
+    log : BlockLog
+        on-disk log holding every block of the chain.
+    header_log : BlockLog
+        on-disk log holding the header of every block, kept in step with log. Walking the headers never decodes a
+        full block.
+    cache_size : int
+        maximum number of decoded blocks kept in memory.
+
+    Methods
+    ----------
+    get_block(index: int)
+        Returns the block at index, decoding it from the log if it is not cached.
+    get_last_block()
+        Returns the last block of the chain.
+    get_header(index: int)
+        Returns the header of the block at index, read from the header log.
+    iter_headers(start: int, stop: int)
+        Lazily yields the headers in [start, stop).
+    iter_blocks(start: int, stop: int)
+        Lazily yields the blocks in [start, stop).
+    payloads(start: int, stop: int)
+        Returns the encoded blocks in [start, stop) without decoding or caching them.
+    append(block: Block)
+        Appends a block to the log.
+    truncate(index: int)
+        Drops the block at index and every block after it.
+    """
+    DEFAULT_CACHE_SIZE = 1024
+
+    def __init__(self, log: BlockLog, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Constructor for a BlockStore. Nothing is read from the log until a block is looked up.
+
+        :param log: BlockLog. Log holding the chain.
+        :param cache_size: int. Maximum number of decoded blocks kept in memory.
+        """
+        self.log = log
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()  # index -> Block, least recently used first
+        self.lock = RLock()
+        self.header_log = BlockLog(os.path.join(log.directory, 'headers'), read_only=log.read_only)
+        if len(self.header_log) != len(self.log) and not log.read_only:
+            self.rebuild_headers()
+
+    def rebuild_headers(self):
+        """
+        Rewrites the header log from the blocks in the log, for chains written before headers were stored or after a
+        crash between the two appends.
+
+        :return: None
+        """
+        start = min(len(self.header_log), len(self.log))
+        self.header_log.truncate(start)
+        for index in range(start, len(self.log)):
+            block = Block(self.log.read(index).decode('utf-8'))
+            self.header_log.append(json.dumps(block.header()).encode('utf-8'))
+
+    def __len__(self) -> int:
+        return len(self.log)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.iter_blocks(*index.indices(len(self))[:2]))
+        return self.get_block(index)
+
+    def __iter__(self):
+        return self.iter_blocks()
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self.get_block(index)
+
+    def get_block(self, index: int) -> Block:
+        """
+        Returns the block at index, decoding it from the log if it is not cached.
+
+        :param index: int. Index of the block, negative values count from the end of the chain.
+        :return: Block.
+        """
+        with self.lock:
+            if index < 0:
+                index += len(self)
+            block = self.cache.get(index)
+            if block is not None:
+                self.cache.move_to_end(index)
+                return block
+            block = Block(self.log.read(index).decode('utf-8'))
+            self.remember(index, block)
+            return block
+
+    def get_last_block(self) -> Block:
+        """
+        Returns the last block of the chain.
+
+        :return: Block.
+        """
+        return self.get_block(-1)
+
+    def get_header(self, index: int) -> dict:
+        """
+        Returns the header of the block at index without decoding the block.
+
+        :param index: int. Index of the block, negative values count from the end of the chain.
+        :return: dict. Header as returned by Block.header().
+        """
+        with self.lock:
+            if index < 0:
+                index += len(self)
+            block = self.cache.get(index)
+            if block is not None:
+                return block.header()
+            return json.loads(self.header_log.read(index).decode('utf-8'))
+
+    def iter_headers(self, start: int = 0, stop: int = None):
+        """
+        Lazily yields the headers in [start, stop).
+
+        :param start: int. Index of the first block.
+        :param stop: int. Index after the last block, defaults to the end of the chain.
+        :return: generator of dicts.
+        """
+        if stop is None:
+            stop = len(self)
+        for index in range(start, stop):
+            yield self.get_header(index)
+
+    def iter_blocks(self, start: int = 0, stop: int = None):
+        """
+        Lazily yields the blocks in [start, stop), decoding each one only when it is reached.
+
+        :param start: int. Index of the first block.
+        :param stop: int. Index after the last block, defaults to the end of the chain.
+        :return: generator of Block objects.
+        """
+        if stop is None:
+            stop = len(self)
+        for index in range(start, stop):
+            yield self.get_block(index)
+
+    def payloads(self, start: int = 0, stop: int = None) -> list:
+        """
+        Returns the encoded blocks in [start, stop) as one consistent snapshot, taken under the lock so a concurrent
+        truncate cannot cut it short. Nothing is decoded or cached, so reading the whole chain leaves the cache alone.
+
+        :param start: int. Index of the first block.
+        :param stop: int. Index after the last block, defaults to the end of the chain.
+        :return: list of bytes.
+        """
+        with self.lock:
+            if stop is None:
+                stop = len(self)
+            return [self.log.read(index) for index in range(start, stop)]
+
+    def remember(self, index: int, block: Block):
+        """
+        Caches a decoded block, evicting the least recently used blocks beyond cache_size.
+
+        :param index: int. Index of the block.
+        :param block: Block. Decoded block.
+        :return: None
+        """
+        self.cache[index] = block
+        self.cache.move_to_end(index)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def append(self, block: Block):
+        """
+        Appends a block and its header to the logs and caches it, it is the most likely block to be looked up next.
+
+        :param block: Block. Block to append.
+        :return: None
+        """
+        with self.lock:
+            index = self.log.append(str(block).encode('utf-8'))
+            self.header_log.append(json.dumps(block.header()).encode('utf-8'))
+            self.remember(index, block)
+
+    def truncate(self, index: int):
+        """
+        Drops the block at index and every block after it, from the logs and the cache.
+
+        :param index: int. First index to drop.
+        :return: None
+        """
+        with self.lock:
+            self.log.truncate(index)
+            self.header_log.truncate(index)
+            for cached in [i for i in self.cache if i >= index]:
+                del self.cache[cached]
+
+    def close(self):
+        """
+        Closes the block and header logs.
+
+        :return: None
+        """
+        with self.lock:
+            self.log.close()
+            self.header_log.close()
@@ -0,0 +1,97 @@
+from threading import Thread, Event
+import json
+
+SEPARATOR = '-' * 75 + '\n'
+
+
+def format_transaction(tx) -> str:
+    """
+    Returns the short human readable form of a transaction used in the chain text file: the timestamp is cut down to
+    the time of day and the unique id to its first five characters.
+
+    :param tx: Transaction.
+    :return: str.
+    """
+    return json.dumps({
+        'to_node': tx.to_node,
+        'from_node': tx.from_node,
+        'amount': tx.amount,
+        'timestamp': tx.timestamp[11:22],  # "2020-05-12 18:20:25.659289"
+        'unique_id': tx.unique_id[:5] + '...'
+    })
+
+
+def format_block(block) -> str:
+    """
+    Returns the human readable form of a single block, as it appears in the chain text file.
+
+    :param block: Block.
+    :return: str.
+    """
+    lines = [SEPARATOR]
+    for k, v in block.__dict__.items():
+        if k.startswith('_'):
+            continue
+        if k == 'transactions':
+            lines.append(k + ':\n')
+            lines.extend('\t' + format_transaction(tx) + '\n' for tx in v)
+        elif k == 'signatures':
+            lines.append(k + ': ' + str({k2[:8] + '...': v2 for k2, v2 in v.items()}) + '\n')
+        else:
+            lines.append(k + ': ' + str(v) + '\n')
+    lines.append(SEPARATOR)
+    return ''.join(lines)
+
+
+def format_ledger_entry(entry) -> str:
+    """
+    Returns the human readable form of one ledger state, as it appears in the ledger text file.
+
+    :param entry: BalanceState or dict.
+    :return: str.
+    """
+    return str(entry) + '\n'
+
+
+class BackgroundRenderer:
+    """
+    Runs a render function on a daemon thread whenever a render is requested. Requests that arrive while a render is
+    in progress are coalesced into a single follow-up render, so callers never wait on the text output.
+
+    Methods
+    ----------
+    request()
+        Asks the renderer thread to run the render function again.
+    stop()
+        Stops the renderer thread after any render in progress.
+    """
+
+    def __init__(self, render, name: str = 'Renderer Thread'):
+        """
+        Constructor for a BackgroundRenderer. Starts the renderer thread.
+
+        :param render: callable. Function regenerating the rendered view, called without arguments.
+        :param name: str. Name of the renderer thread.
+        """
+        self.render = render
+        self.running = True
+        self.requested = Event()
+        self.thread = Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def request(self):
+        self.requested.set()
+
+    def stop(self):
+        self.running = False
+        self.requested.set()
+
+    def run(self):
+        while self.running:
+            self.requested.wait()
+            self.requested.clear()
+            if self.running:
+                try:
+                    self.render()
+                except Exception as e:  # a failed render must not stop later ones
+                    print('error in {}: {!r}'.format(self.thread.name, e))
@@ -0,0 +1,264 @@
+from Block import Block
+from BlockLog import BlockLog
+import os, pickle, time
+
+
+def block_digest(block: Block) -> str:
+    """
+    Returns the digest used to check that a checkpoint belongs to the chain it is restored against.
+
+    :param block: Block.
+    :return: str. Hex SHA-256 of the block header.
+    """
+    return block.header_hash()
+
+
+def validate_chunk(log_directory: str, start: int, stop: int) -> list:
+    """
+    Validates the blocks in [start, stop) of a block log: every transaction id has to match the hash of the
+    transaction, and every block after the genesis block has to carry enough stake. Runs in a worker process, which
+    opens the log itself so no block data has to be sent between processes.
+
+    :param log_directory: str. Directory of the block log.
+    :param start: int. Index of the first block to validate.
+    :param stop: int. Index after the last block to validate.
+    :return: list. (index, reason) for every invalid block.
+    """
+    log = BlockLog(log_directory, read_only=True)
+    invalid = []
+    try:
+        for index in range(start, stop):
+            block = Block(log.read(index).decode('utf-8'))
+            if block.index != index:
+                invalid.append((index, 'index mismatch'))
+            elif not block.verify_transaction_ids():
+                invalid.append((index, 'transaction id mismatch'))
+            elif not block.verify_merkle_root():
+                invalid.append((index, 'merkle root mismatch'))
+            elif index > 0 and not block.verify_proof_of_stake():
+                invalid.append((index, 'insufficient stake'))
+    finally:
+        log.close()
+    return invalid
+
+
+def validate_chain(blockchain, processes: int = None, chunk_size: int = None) -> list:
+    """
+    Re-validates every block of the chain, splitting the chain into chunks that are checked on a process pool.
+
+    :param blockchain: BlockChain. Chain to validate.
+    :param processes: int. Number of worker processes, defaults to the number of CPUs.
+    :param chunk_size: int. Number of blocks validated per task, defaults to a quarter of each worker's share.
+    :return: list. (index, reason) for every invalid block, in chain order.
+    """
+    length = len(blockchain.blockchain)
+    if processes == 1:
+        return validate_chunk(blockchain.log_path, 0, length)
+    if chunk_size is None:
+        chunk_size = max(1, -(-length // (4 * (processes or os.cpu_count()))))
+    from concurrent.futures import ProcessPoolExecutor  # only imported when used, it slows down startup
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(validate_chunk, blockchain.log_path, start, min(start + chunk_size, length))
+                   for start in range(0, length, chunk_size)]
+        return [invalid for future in futures for invalid in future.result()]
+
+
+class Checkpointer:
+    """
+    Periodically writes a consistent snapshot of the chain tip and the ledger balances at that tip, and restores the
+    ledger from the latest snapshot on startup by replaying only the blocks committed after it.
+
+    Attributes
+    ----------
+    path : str
+        file the latest checkpoint is stored in.
+    interval : int
+        number of blocks between two checkpoints.
+    last_index : int
+        block index of the latest checkpoint written or restored.
+
+    Methods
+    ----------
+    maybe_save(blockchain: BlockChain, ledger: Ledger)
+        Writes a checkpoint if interval blocks were committed since the last one or a fork replaced its block.
+    save(blockchain: BlockChain, ledger: Ledger)
+        Writes a checkpoint of the current tip.
+    load()
+        Returns the latest checkpoint, or None.
+    restore(blockchain: BlockChain, ledger: Ledger, validate: bool, processes: int)
+        Restores the ledger from the latest checkpoint and the chain.
+    """
+    DEFAULT_INTERVAL = 100
+
+    def __init__(self, node_id: str, interval: int = DEFAULT_INTERVAL):
+        """
+        Constructor for a Checkpointer.
+
+        :param node_id: str. Node the checkpoints belong to.
+        :param interval: int. Number of blocks between two checkpoints.
+        """
+        self.path = '../files/checkpoint' + node_id + '.pickle'
+        self.interval = interval
+        self.last_index = 0
+
+    def maybe_save(self, blockchain, ledger):
+        """
+        Writes a checkpoint if interval blocks were committed since the last one, or right away if a fork replaced the
+        block of the last checkpoint, which then points at an orphaned block. Must be called after a block was added
+        to both the chain and the ledger.
+
+        :param blockchain: BlockChain.
+        :param ledger: Ledger.
+        :return: None
+        """
+        index = blockchain.get_last_block().index
+        if index <= self.last_index or index - self.last_index >= self.interval:
+            self.save(blockchain, ledger)
+
+    def save(self, blockchain, ledger):
+        """
+        Writes a checkpoint of the current chain tip and ledger balances. The file is replaced atomically so a crash
+        never leaves a partial checkpoint behind.
+
+        :param blockchain: BlockChain.
+        :param ledger: Ledger.
+        :return: None
+        """
+        tip = blockchain.get_last_block()
+        checkpoint = {
+            'index': tip.index,
+            'digest': block_digest(tip),
+            'balances': dict(ledger.blockchain_balances.tip)
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file)
+        os.replace(temp_path, self.path)
+        self.last_index = tip.index
+
+    def load(self):
+        """
+        Returns the latest checkpoint, or None if there is none.
+
+        :return: dict. Keys 'index', 'digest' and 'balances'.
+        """
+        try:
+            with open(self.path, 'rb') as checkpoint_file:
+                return pickle.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def restore(self, blockchain, ledger, validate: bool = False, processes: int = None) -> int:
+        """
+        Restores the ledger from the latest checkpoint that matches the chain and replays the blocks after it. If no
+        checkpoint matches, the ledger is rebuilt by replaying the whole chain.
+
+        :param blockchain: BlockChain. Chain loaded from disk.
+        :param ledger: Ledger. Freshly constructed ledger.
+        :param validate: bool. Re-validate every block of the chain on a process pool first.
+        :param processes: int. Number of worker processes used for validation.
+        :return: int. Number of blocks replayed.
+        """
+        start_time = time.perf_counter()
+        if validate:
+            invalid = validate_chain(blockchain, processes)
+            if invalid:
+                print('Invalid blocks found in chain: ', invalid)
+            print('Chain validated in {:.3f}s.'.format(time.perf_counter() - start_time))
+        checkpoint = self.load()
+        first = 1
+        if checkpoint is not None:
+            index = checkpoint['index']
+            if index < len(blockchain.blockchain) and block_digest(blockchain.get_block(index)) == checkpoint['digest']:
+                ledger.restore(checkpoint['balances'], index)
+                first = index + 1
+            else:
+                print('Checkpoint does not match the chain, replaying the whole chain.')
+        replayed = ledger.replay(blockchain.iter_blocks(first))
+        if first > 1 and ledger.read_last_entry() != ledger.blockchain_balances.tip:
+            # the text file lacks the replayed blocks or was written by another chain: keep its entries up to the
+            # checkpoint if they agree with it, otherwise the ledger has to be rebuilt to write the whole file again
+            if ledger.read_entry(first - 1) == checkpoint['balances'] and ledger.write_to_disk(True, first):
+                print('Ledger file brought up to date from the checkpoint.')
+            else:
+                print('Ledger file does not match the checkpoint, replaying the whole chain.')
+                ledger.create_or_read_file()
+                first = 1
+                replayed = ledger.replay(blockchain.iter_blocks(first))
+        if first == 1:
+            ledger.write_to_disk()
+        self.last_index = first - 1
+        if replayed:
+            self.save(blockchain, ledger)
+        print('Ledger restored at block {} ({} blocks replayed) in {:.3f}s.'.format(
+            blockchain.get_last_block().index, replayed, time.perf_counter() - start_time))
+        return replayed
+
+
+if __name__ == '__main__':
+    # Benchmark: restart time of a node with a long chain, with and without a checkpoint.
+    # usage: python Checkpoint.py [blocks] [transactions per block] [processes]
+    import json, random, shutil, sys, tempfile
+    from BlockChain import BlockChain
+    from Ledger import Ledger
+    from Transaction import Transaction
+
+    n_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    tx_per_block = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    code_dir = os.getcwd()
+    bench_dir = tempfile.mkdtemp()
+    os.mkdir(os.path.join(bench_dir, 'run'))
+    os.mkdir(os.path.join(bench_dir, 'files'))
+    os.chdir(os.path.join(bench_dir, 'run'))
+    try:
+        start = time.perf_counter()
+        log = BlockLog('../files/blockchainbench_log')
+        header_log = BlockLog('../files/blockchainbench_log/headers')
+        nodes = list(Ledger.INITIAL_BALANCES)
+        prev_hash = ''
+        for i in range(n_blocks):
+            transactions = []
+            for _ in range(tx_per_block):
+                from_node, to_node = random.sample(nodes, 2)
+                transactions.append(Transaction(_to=to_node, _from=from_node, amount=0.01))
+            block = Block(index=i, transactions=transactions, prev_hash=prev_hash)
+            block.signatures = {'bench': tx_per_block}
+            log.append(str(block).encode('utf-8'))
+            header_log.append(json.dumps(block.header()).encode('utf-8'))
+            prev_hash = block.header_hash()
+        log.close()
+        header_log.close()
+        with open('../files/blockchainbench.txt', 'w') as text_file:
+            text_file.write('Node bench Blockchain (oldest first): \n')
+        print('built {} blocks in {:.1f}s'.format(n_blocks, time.perf_counter() - start))
+
+        def restart(**kwargs):
+            start = time.perf_counter()
+            ledger = Ledger('bench')
+            blockchain = BlockChain('bench', ledger)
+            Checkpointer('bench').restore(blockchain, ledger, **kwargs)
+            return time.perf_counter() - start, blockchain, ledger
+
+        cold, blockchain, ledger = restart()
+        print('cold restart (no checkpoint, full replay):  {:.3f}s'.format(cold))
+        blockchain.blockchain.close()
+        warm, blockchain, ledger = restart()
+        print('warm restart (checkpoint at tip):           {:.3f}s'.format(warm))
+        for i in range(Checkpointer.DEFAULT_INTERVAL - 1):
+            block = Block(index=n_blocks + i, transactions=[Transaction(_to='1', _from='0', amount=0.01)],
+                          prev_hash=blockchain.get_last_block().header_hash())
+            block.signatures = {'bench': 1}
+            blockchain.add_block(block)
+        blockchain.blockchain.close()
+        warm, blockchain, ledger = restart()
+        print('warm restart ({} blocks after checkpoint):   {:.3f}s'.format(Checkpointer.DEFAULT_INTERVAL - 1, warm))
+        blockchain.blockchain.close()
+        for pool_size in (1, processes):
+            start = time.perf_counter()
+            invalid = validate_chain(blockchain, pool_size)
+            print('full validation, {} processes:             {:.3f}s ({} invalid)'.format(
+                pool_size or os.cpu_count(), time.perf_counter() - start, len(invalid)))
+    finally:
+        os.chdir(code_dir)
+        shutil.rmtree(bench_dir)
@@ -0,0 +1,216 @@
+from Transport import TRANSPORTS, TcpTransport, SqsTransport
+import json
+
+
+class Cluster:
+    """
+    Membership of the network: the ids of its nodes, the endpoints every transport reaches them at and the balances
+    they start with. Everything that depends on the number of nodes (peers, election quorum, genesis sync, genesis
+    balances, rewards) is derived from it. The default cluster is the original one of the four nodes '0' to '3'.
+
+    A cluster file is JSON:
+
+        {"nodes": [{"id": "0", "host": "10.0.0.1", "port": 7000, "election_port": 7100,
+                    "queue": "https://sqs.../0.fifo", "election_queue": "https://sqs.../election0.fifo",
+                    "balance": 10}, ...]}
+
+    Only "id" is required. Nodes without host and ports listen at TcpTransport's default ports by their position in
+    the list, nodes without queues use the queue names of the original SQS setup.
+
+    Attributes
+    ----------
+    nodes : list
+        node ids, in order.
+    endpoints : dict
+        node id -> dict of the optional fields above.
+
+    Methods
+    ----------
+    peers_of(node_id: str)
+        Returns every other node.
+    quorum
+        Number of nodes forming a majority.
+    initial_balances()
+        Returns node id -> genesis balance.
+    transport(name: str, channel: str, loop)
+        Returns a transport of the given kind that reaches the nodes at their endpoints.
+    load(path: str), save(path: str), of_size(n: int), from_args(cluster: str, nodes: int)
+        Read, write and create clusters.
+    """
+    DEFAULT_SIZE = 4
+    DEFAULT_BALANCE = 10
+    DEFAULT_PATH = '../files/cluster.json'
+
+    def __init__(self, nodes: list, endpoints: dict = None):
+        """
+        Constructor for a Cluster.
+
+        :param nodes: list. Node ids.
+        :param endpoints: dict. node id -> dict with any of host, port, election_port, queue, election_queue, balance.
+        """
+        if len(set(nodes)) != len(nodes):
+            raise ValueError('duplicate node ids in cluster')
+        self.nodes = [str(node) for node in nodes]
+        self.endpoints = endpoints or {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.nodes
+
+    @classmethod
+    def of_size(cls, n: int):
+        return cls([str(node) for node in range(n)])
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH):
+        with open(path) as f:
+            members = json.load(f)['nodes']
+        return cls([member['id'] for member in members],
+                   {member['id']: {key: value for key, value in member.items() if key != 'id'} for member in members})
+
+    def save(self, path: str = DEFAULT_PATH):
+        members = [dict(id=node, **self.endpoints.get(node, {})) for node in self.nodes]
+        with open(path, 'w') as f:
+            json.dump({'nodes': members}, f, indent=2)
+
+    @classmethod
+    def from_args(cls, cluster: str = None, nodes: int = None):
+        """
+        Returns the cluster chosen on the command line: a cluster file, a number of nodes, or the default cluster.
+
+        :param cluster: str. Path of a cluster file.
+        :param nodes: int. Number of nodes, with ids '0' to str(nodes - 1).
+        :return: Cluster.
+        """
+        if cluster is not None:
+            return cls.load(cluster)
+        return cls.of_size(nodes or cls.DEFAULT_SIZE)
+
+    def peers_of(self, node_id: str) -> list:
+        return [node for node in self.nodes if node != node_id]
+
+    @property
+    def quorum(self) -> int:
+        return len(self.nodes) // 2 + 1
+
+    def initial_balances(self) -> dict:
+        return {node: self.endpoints.get(node, {}).get('balance', self.DEFAULT_BALANCE) for node in self.nodes}
+
+    def tcp_addresses(self, channel: str) -> dict:
+        """
+        Returns node id -> (host, port) the nodes listen at for a channel. Nodes without a host or port listen where
+        TcpTransport expects them by their position in the cluster, so node ids need not be numbers.
+        """
+        port_key = 'port' if channel == 'blockchain' else 'election_port'
+        addresses = {}
+        for position, node in enumerate(self.nodes):
+            endpoint = self.endpoints.get(node, {})
+            if port_key not in endpoint and position >= TcpTransport.CHANNEL_OFFSETS['election']:
+                raise ValueError('node {} needs a {}: default ports only cover the first {} nodes'.format(
+                    node, port_key, TcpTransport.CHANNEL_OFFSETS['election']))
+            default_host, default_port = TcpTransport.default_address(channel, position)
+            addresses[node] = (endpoint.get('host', default_host), endpoint.get(port_key, default_port))
+        if len(set(addresses.values())) != len(addresses):
+            raise ValueError('nodes of the cluster share a {} address'.format(channel))
+        return addresses
+
+    def queue_urls(self, channel: str) -> dict:
+        queue_key = 'queue' if channel == 'blockchain' else 'election_queue'
+        return {node: self.endpoints.get(node, {}).get(queue_key) or SqsTransport.queue_url(channel, node)
+                for node in self.nodes}
+
+    def transport(self, name: str, channel: str, loop=None):
+        """
+        Returns a transport that reaches the nodes of the cluster at their endpoints.
+
+        :param name: str. 'inprocess', 'tcp' or 'sqs'.
+        :param channel: str. 'blockchain' or 'election'.
+        :param loop: event loop of a MessagingCore.
+        :return: Transport.
+        """
+        if name == 'tcp':
+            return TcpTransport(channel, loop, addresses=self.tcp_addresses(channel))
+        if name == 'sqs':
+            return SqsTransport(channel, loop, queue_urls=self.queue_urls(channel))
+        return TRANSPORTS[name](channel, loop)
+
+
+if __name__ == '__main__':
+    # Benchmark: throughput and commit latency of real Nodes by cluster size. All nodes of a cluster run in this process
+    # over the in-process transport, with short terms and their files in a temporary directory, while a transaction
+    # generator sends transactions to every node. Commit latency is measured from the creation of a block on its
+    # leader to its commit on the first node and on the last one. At most one block is mined per term, see
+    # Node.mine_block. What the nodes print goes to nodes.log in the temporary directory.
+    # usage: python Cluster.py [terms] [term duration s] [transactions per second] [cluster sizes ...]
+    import contextlib, os, sys, tempfile, threading, time
+    from datetime import datetime
+    from Messenger import Messenger
+    from Node import Node
+    from TransactionGenerator import Tx_Generator
+    n_terms = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    term_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 50
+    sizes = [int(size) for size in sys.argv[4:]] or [4, 8, 16]
+    Messenger.verbose = False
+
+    class TimedNode(Node):
+        def __init__(self, *args, **kwargs):
+            self.commit_times = {}  # block index -> datetime it was added to the chain
+            super().__init__(*args, **kwargs)
+
+        def add_to_blockchain(self, block, leader_id):
+            super().add_to_blockchain(block, leader_id)
+            self.commit_times[block.index] = datetime.now()
+
+    def run(size):
+        cluster = Cluster(['{}-{}'.format(size, node) for node in range(size)])  # fresh in-process mailboxes
+        nodes = {}
+        threads = [threading.Thread(target=lambda node_id=node_id: nodes.__setitem__(node_id, TimedNode(
+            node_id, transport='inprocess', cluster=cluster, term_duration=term_duration))) for node_id in cluster.nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for node in nodes.values():
+            node.peers_ready.wait()
+            node.start_mining_thread()
+        generator = Tx_Generator(cluster, 'inprocess')
+        start = time.perf_counter()
+        while time.perf_counter() - start < n_terms * term_duration:
+            generator.broadcast({'contents': generator.make_tx(), 'type': 'Transaction'}, cluster.nodes)
+            time.sleep(1 / rate)
+        time.sleep(term_duration / 2)  # let the blocks of the last term commit
+        elapsed = time.perf_counter() - start
+        generator.close()
+        for node in nodes.values():
+            node.term_scheduler.stop()
+            node.messenger.close()
+            node.core.close()
+
+        chain = max((node.blockchain.blockchain for node in nodes.values()), key=len)
+        first, last = [], []
+        for index in range(1, len(chain)):
+            created = datetime.fromisoformat(chain[index].timestamp)
+            committed = [node.commit_times[index] for node in nodes.values() if index in node.commit_times]
+            first.append((min(committed) - created).total_seconds())
+            if len(committed) == size:
+                last.append((max(committed) - created).total_seconds())
+        n_transactions = sum(len(chain[index].transactions) for index in range(1, len(chain)))
+        return (size, len(chain) - 1, (len(chain) - 1) / n_terms, n_transactions / elapsed,
+                sum(first) / len(first) * 1000 if first else float('nan'),
+                sum(last) / len(last) * 1000 if last else float('nan'),
+                ' '.join(str(len(node.blockchain.blockchain)) for node in nodes.values()))
+
+    os.chdir(tempfile.mkdtemp())
+    os.mkdir('code')
+    os.chdir('code')  # nodes keep their chain, ledger and checkpoints in ../files
+    print('{} terms of {:.1f} s, {:.0f} transactions/s offered, node output in {}'.format(
+        n_terms, term_duration, rate, os.path.abspath('../nodes.log')))
+    print('nodes  blocks  blocks/term  transactions/s  commit latency first node (ms)  all nodes (ms)  chain lengths')
+    with open('../nodes.log', 'w') as log:
+        for size in sizes:
+            with contextlib.redirect_stdout(log):
+                result = run(size)
+            print('{:>5} {:>7} {:>12.2f} {:>15.1f} {:>32.1f} {:>14.1f}  {}'.format(*result))
@@ -1,63 +1,29 @@
-from time import sleep, clock
-from threading import Thread, Timer
+from TimerService import ServiceTimer, TimerService
 import random
 
 
-class ElectionTimer:
+class ElectionTimer(ServiceTimer):
 
-    def __init__(self, duration: float, target):
+    def __init__(self, duration: float, target, service: TimerService = None, dispatch=None):
         """
-        Creates a timer to reset elections every time a 'term' has elapsed.
-
-        :param duration:
-        :param target:
+        Creates a timer to start an election when no heartbeat of a leader arrived for a randomized timeout. The
+        timer runs on a TimerService instead of its own thread; it is started by restart_timer, e.g. on every
+        heartbeat, and does not run until then.
+
+        :param duration: float. Shortest timeout, timeouts are between duration and 3 * duration.
+        :param target: LeaderElection. Requests leadership when the timer elapses.
+        :param service: TimerService. Defaults to the process-wide service.
+        :param dispatch: function running the timeout elsewhere, e.g. on the event loop of a MessagingCore.
         """
+        super().__init__(service, dispatch)
         self.target = target
         self.duration = duration
-        self.running = False
-        self.restart = False
-        self.stop = False
-
-        t = Thread(
-            target=self.run,
-            name='Election Timer Thread'
-        )
-        t.start()
-
-    def kill_thread(self):
-        self.running = False
-
-    def stop_timer(self):
-        self.stop = True
-
-    def restart_timer(self):
-        self.restart = True
-        self.stop = False
 
     def new_timeout(self) -> float:
-        return self.duration + 2 * self.duration * random.random()
-
-    def run(self):
         # randomize timeouts to avoid conflicting elections
-        timeout = self.new_timeout()
-        # start the timer
-        start = clock()
-        count = 0
-        while self.running:
-            while not self.stop:
-                count += 1
-                if self.restart:
-                    timeout = self.new_timeout()
-                    start = clock()
-                    self.restart = False
+        return self.duration + 2 * self.duration * random.random()
 
-                elapsed_time = clock() - start
-                if elapsed_time > timeout:
-                    print('\nCountodwn elapsed ', timeout, ',', self.target._id, ' Starting Election       \n')
-                    self.target.request_leadership()
-                    self.restart_timer()
-                    break
-                else:
-                    if count > 200000:
-                        print('Election Timer: ', timeout - elapsed_time)
-                        count = 0
+    def on_timeout(self):
+        print('\nCountdown elapsed, node', self.target._id, 'starting election\n')
+        self.target.request_leadership()
+        self.restart_timer()
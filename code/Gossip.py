@@ -0,0 +1,296 @@
+from threading import Lock
+import collections, hashlib, random
+
+GOSSIP_ID = 'gossip_id'
+GOSSIP_FROM = 'gossip_from'
+GOSSIP_HOPS = 'gossip_hops'
+DIGEST = 'gossip_digest'
+REQUEST = 'gossip_request'
+ENVELOPE = (GOSSIP_ID, GOSSIP_FROM, GOSSIP_HOPS)
+
+
+def message_id(message: dict) -> str:
+    """
+    Returns the id of a message: a digest of its contents, so every node derives the same id for the same message
+    without coordination and a resent copy is recognized as a duplicate.
+
+    :param message: dict. str keys, str or bytes values, without gossip attributes.
+    :return: str. 32 hex characters.
+    """
+    digest = hashlib.sha256()
+    for key in sorted(message):
+        value = message[key]
+        digest.update(key.encode('utf-8') + b'\0')
+        digest.update((value if isinstance(value, bytes) else value.encode('utf-8')) + b'\0')
+    return digest.hexdigest()[:32]
+
+
+def envelope(message: dict, sender: str, hops: int = 0) -> dict:
+    """
+    Wraps a message for gossip, e.g. to inject a transaction into the network through a single node.
+
+    :param message: dict. str keys, str or bytes values.
+    :param sender: str. Node, or client, sending the message.
+    :param hops: int. Number of times the message was relayed.
+    :return: dict. The message with gossip attributes added.
+    """
+    wrapped = dict(message)
+    wrapped[GOSSIP_ID] = message_id(message)
+    wrapped[GOSSIP_FROM] = sender
+    wrapped[GOSSIP_HOPS] = str(hops)
+    return wrapped
+
+
+def is_gossip(message: dict) -> bool:
+    return GOSSIP_ID in message or message.get('type') in (DIGEST, REQUEST)
+
+
+class Gossip:
+    """
+    Gossip dissemination of block and transaction messages, in place of sending them to every peer directly. The
+    origin of a message pushes it to fanout random peers and every node relays a message to fanout random peers the
+    first time it receives it, so a message reaches all N nodes in about log(N) / log(fanout) hops while no node sends
+    more than fanout copies of it. A bounded cache of seen message ids drops copies arriving again.
+
+    Push may miss a few nodes. In 'push-pull' mode every node also calls pull_round periodically: it sends the ids of
+    the messages it recently received to a random peer, which pushes back what the node lacks and requests what it
+    lacks itself, so every message eventually reaches every node.
+
+    Attributes
+    ----------
+    node_id : str
+        this node.
+    peers : list
+        nodes messages are relayed to.
+    messenger : Messenger
+        anything with send(message, destination) and broadcast(message, destinations).
+    fanout : int
+        number of peers every node relays a message to.
+    mode : str
+        'push' or 'push-pull'.
+    max_hops : int
+        messages are not relayed further after max_hops relays, None relays until every node has seen them.
+    counters : Counter
+        originated, received, duplicates, relayed (copies sent), digests, pulled (messages sent on request) and pushed
+        (messages sent in answer to a digest).
+
+    Methods
+    ----------
+    broadcast(message: dict)
+        Disseminates a message originating at this node.
+    receive(message: dict)
+        Handles an incoming gossip message. Returns the message to process, or None.
+    pull_round()
+        Sends a digest of recent messages to a random peer, in 'push-pull' mode.
+    """
+    MODES = ('push', 'push-pull')
+    DEFAULT_FANOUT = 3
+    SEEN_SIZE = 100000
+    RECENT_SIZE = 256
+
+    def __init__(self, node_id: str, peers: list, messenger, fanout: int = DEFAULT_FANOUT, mode: str = 'push',
+                 max_hops: int = None, seen_size: int = SEEN_SIZE, recent_size: int = RECENT_SIZE):
+        """
+        Constructor for Gossip.
+
+        :param node_id: str. This node.
+        :param peers: list. Nodes messages are relayed to, without node_id.
+        :param messenger: Messenger. Sends the gossip messages, may be set after construction.
+        :param fanout: int. Number of peers every node relays a message to.
+        :param mode: str. 'push' or 'push-pull'.
+        :param max_hops: int. Maximum number of relays of a message, None for no limit.
+        :param seen_size: int. Number of message ids remembered to drop duplicates.
+        :param recent_size: int. Number of recent messages kept to answer digests and requests.
+        """
+        if mode not in self.MODES:
+            raise ValueError('unknown gossip mode: ' + str(mode))
+        self.node_id = node_id
+        self.peers = [peer for peer in peers if peer != node_id]
+        self.messenger = messenger
+        self.fanout = fanout
+        self.mode = mode
+        self.max_hops = max_hops
+        self.seen_size = seen_size
+        self.recent_size = recent_size
+        self.seen = collections.OrderedDict()  # message id -> None, oldest first
+        self.recent = collections.OrderedDict()  # message id -> message, oldest first
+        self.lock = Lock()
+        self.counters = collections.Counter()
+
+    def remember(self, gossip_id: str, message: dict) -> bool:
+        """
+        Marks a message as seen. Must be called with the lock held.
+
+        :return: bool. False if the message was seen before.
+        """
+        if gossip_id in self.seen:
+            return False
+        self.seen[gossip_id] = None
+        if len(self.seen) > self.seen_size:
+            self.seen.popitem(last=False)
+        self.recent[gossip_id] = message
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+        return True
+
+    @staticmethod
+    def handles(message: dict) -> bool:
+        return is_gossip(message)
+
+    def targets(self, exclude: str = None) -> list:
+        candidates = [peer for peer in self.peers if peer != exclude]
+        return random.sample(candidates, min(self.fanout, len(candidates)))
+
+    def broadcast(self, message: dict):
+        """
+        Disseminates a message originating at this node.
+
+        :param message: dict. str keys, str or bytes values.
+        :return: dict. peer -> Future of the sends to the first peers, see Messenger.broadcast.
+        """
+        gossip_id = message_id(message)
+        with self.lock:
+            self.remember(gossip_id, message)
+            self.counters['originated'] += 1
+        return self.relay(message, gossip_id, 0)
+
+    def relay(self, message: dict, gossip_id: str, hops: int, exclude: str = None) -> dict:
+        targets = self.targets(exclude)
+        with self.lock:
+            self.counters['relayed'] += len(targets)
+        return self.messenger.broadcast(self.wrap(message, gossip_id, hops + 1), targets)
+
+    def receive(self, message: dict):
+        """
+        Handles an incoming gossip message: answers digests and requests, drops duplicates and relays new messages.
+
+        :param message: dict. Message with gossip attributes, see is_gossip.
+        :return: dict. The message without gossip attributes if it is new and must be processed, otherwise None.
+        """
+        if message.get('type') == DIGEST:
+            self.answer_digest(message['sender'], message['ids'])
+            return None
+        if message.get('type') == REQUEST:
+            self.answer_request(message['sender'], message['ids'])
+            return None
+        gossip_id = message[GOSSIP_ID]
+        hops = int(message[GOSSIP_HOPS])
+        contents = {key: value for key, value in message.items() if key not in ENVELOPE}
+        with self.lock:
+            self.counters['received'] += 1
+            if not self.remember(gossip_id, contents):
+                self.counters['duplicates'] += 1
+                return None
+        if self.max_hops is None or hops < self.max_hops:
+            self.relay(contents, gossip_id, hops, exclude=message[GOSSIP_FROM])
+        return contents
+
+    def pull_round(self):
+        """
+        Sends the ids of the recently received messages to a random peer, which answers with what either side lacks.
+
+        :return: str. The peer, or None if there are no peers.
+        """
+        if not self.peers:
+            return None
+        peer = random.choice(self.peers)
+        with self.lock:
+            ids = ','.join(self.recent)
+            self.counters['digests'] += 1
+        self.messenger.send({'type': DIGEST, 'sender': self.node_id, 'ids': ids}, peer)
+        return peer
+
+    def answer_digest(self, peer: str, ids: str):
+        theirs = set(ids.split(',')) if ids else set()
+        with self.lock:
+            wanted = [gossip_id for gossip_id in theirs if gossip_id not in self.seen]
+            missing = [(gossip_id, message) for gossip_id, message in self.recent.items() if gossip_id not in theirs]
+            self.counters['pushed'] += len(missing)
+        for gossip_id, message in missing:
+            self.messenger.send(self.wrap(message, gossip_id, 0), peer)  # the peer relays it again
+        if wanted:
+            self.messenger.send({'type': REQUEST, 'sender': self.node_id, 'ids': ','.join(wanted)}, peer)
+
+    def answer_request(self, peer: str, ids: str):
+        with self.lock:
+            found = [(gossip_id, self.recent[gossip_id]) for gossip_id in ids.split(',') if gossip_id in self.recent]
+            self.counters['pulled'] += len(found)
+        for gossip_id, message in found:
+            self.messenger.send(self.wrap(message, gossip_id, 0), peer)
+
+    def wrap(self, message: dict, gossip_id: str, hops: int) -> dict:
+        wrapped = dict(message)
+        wrapped[GOSSIP_ID] = gossip_id
+        wrapped[GOSSIP_FROM] = self.node_id
+        wrapped[GOSSIP_HOPS] = str(hops)
+        return wrapped
+
+
+if __name__ == '__main__':
+    # Simulation: dissemination of one message from one node to N nodes over links with 1 to 10 ms latency, direct
+    # broadcast vs. gossip. Reports messages sent, the most sent by one node, nodes reached and the time until the last
+    # node received the message. Push-pull rounds run every 50 ms on every node.
+    # usage: python Gossip.py [fanout] [runs per setting]
+    import heapq, itertools, math, sys
+    fanout = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    ROUND_INTERVAL = 50
+
+    class Network:
+        def __init__(self):
+            self.events = []  # (time ms, sequence, destination, message)
+            self.sequence = itertools.count()
+            self.now = 0.0
+            self.sent = collections.Counter()  # sender -> messages sent
+
+        def endpoint(self, node_id):
+            network = self
+
+            class Endpoint:
+                def send(self, message, destination):
+                    network.sent[node_id] += 1
+                    delay = random.uniform(1, 10)
+                    heapq.heappush(network.events, (network.now + delay, next(network.sequence), destination, message))
+
+                def broadcast(self, message, destinations):
+                    for destination in destinations:
+                        self.send(message, destination)
+            return Endpoint()
+
+    def simulate(n_nodes, mode):
+        network = Network()
+        nodes = [str(node) for node in range(n_nodes)]
+        endpoints = {node: network.endpoint(node) for node in nodes}
+        gossips = {node: Gossip(node, nodes, endpoints[node], fanout, mode if mode != 'direct' else 'push')
+                   for node in nodes}
+        reached = {'0': 0.0}
+        message = {'type': 'Transaction', 'contents': 'tx ' + str(random.random())}
+        if mode == 'direct':
+            endpoints['0'].broadcast(message, nodes[1:])
+        else:
+            gossips['0'].broadcast(message)
+        next_round = ROUND_INTERVAL
+        while network.events or (mode == 'push-pull' and len(reached) < n_nodes and next_round < 5000):
+            if mode == 'push-pull' and (not network.events or network.events[0][0] > next_round):
+                network.now = next_round
+                for gossip in gossips.values():
+                    gossip.pull_round()
+                next_round += ROUND_INTERVAL
+                continue
+            network.now, _, destination, received = heapq.heappop(network.events)
+            if mode == 'direct':
+                contents = received
+            else:
+                contents = gossips[destination].receive(received)
+            if contents is not None and destination not in reached:
+                reached[destination] = network.now
+        return sum(network.sent.values()), max(network.sent.values()), len(reached), max(reached.values())
+
+    print('fanout {}, mean of {} runs'.format(fanout, runs))
+    print('nodes  mode       messages  max per node  reached  last received (ms)')
+    for n_nodes in (8, 16, 32, 64, 128):
+        for mode in ('direct', 'push', 'push-pull'):
+            results = [simulate(n_nodes, mode) for _ in range(runs)]
+            means = [sum(result[i] for result in results) / runs for i in range(4)]
+            print('{:>5}  {:9} {:>9.0f} {:>13.0f} {:>8.1f} {:>19.1f}'.format(n_nodes, mode, *means))
+        print('{:>5}  log(N)/log(fanout) = {:.1f} hops'.format(n_nodes, math.log(n_nodes) / math.log(fanout)))
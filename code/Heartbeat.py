@@ -1,57 +1,26 @@
-from time import sleep, clock
-from threading import Thread, Timer
-import random
+from TimerService import ServiceTimer, TimerService
 
 
-class Heartbeat:
+class Heartbeat(ServiceTimer):
 
-    def __init__(self, duration: float, target):
+    def __init__(self, duration: float, target, service: TimerService = None, dispatch=None):
         """
-        Class to send heartbeat messages to check liveness of nodes and their status.
+        Class to send heartbeat messages to check liveness of nodes and their status. The timer runs on a
+        TimerService instead of its own thread; it is started by restart_timer when the node becomes leader.
 
-        :param duration: Length between heartbeats
+        :param duration: Length of the election timeout, heartbeats are sent every duration / 8.
         :param target: Whoever the leader is sends the heartbeat to other nodes.
+        :param service: TimerService. Defaults to the process-wide service.
+        :param dispatch: function running the timeout elsewhere, e.g. on the event loop of a MessagingCore.
         """
+        super().__init__(service, dispatch)
         self.target = target
         self.duration = duration / 8
-        self.running = True
-        self.restart = False
-        self.stop = True
 
-        t = Thread(
-            target=self.run,
-            name='Heartbeat Thread'
-        )
-        t.start()
+    def new_timeout(self) -> float:
+        return self.duration
 
-    def kill_thread(self):
-        self.running = False
-
-    def stop_timer(self):
-        self.stop = True
-
-    def restart_timer(self):
-        self.restart = True
-        self.stop = False
-
-    def run(self):
-        # start the timer
-        start = clock()
-        count = 0
-        while self.running:
-            while not self.stop:
-                count += 1
-                if self.restart:
-                    start = clock()
-                    self.restart = False
-
-                elapsed_time = clock() - start
-                if elapsed_time > self.duration:
-                    if self.target.election_state == 'leader':
-                        # print('\nSending Heartbeat ........       \n')
-                        self.target.send_heartbeat()
-                        self.restart = True
-                    break
-                else:
-                    if count > 10000:
-                        count = 0
+    def on_timeout(self):
+        if self.target.election_state == 'leader':
+            self.target.send_heartbeat()
+            self.restart_timer()
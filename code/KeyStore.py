@@ -0,0 +1,134 @@
+from Signer import get_signer, load_signer, private_pem, load_public_key
+from datetime import datetime
+import json, os
+
+
+class KeyStore:
+    """
+    Keeps the key pair of a node, the public keys of its peers and the genesis time of the cluster in the '../files'
+    directory, so a restarted node keeps its identity, does not have to generate a key pair or wait for a key exchange
+    again, and counts its terms from the same genesis as the nodes that kept running.
+
+    Files:
+        key{node_id}.pem       private key of the node, PKCS8, readable by the owner only
+        peers{node_id}.json    node id -> {'key': public key PEM, 'signature': announced signature}
+        genesis{node_id}.txt   genesis time, str(datetime)
+
+    Attributes
+    ----------
+    key_path : str
+        file the private key is stored in.
+    peers_path : str
+        file the public keys of the peers are stored in.
+    genesis_path : str
+        file the genesis time is stored in.
+
+    Methods
+    ----------
+    load_or_create(scheme: str)
+        Returns the signer of the stored key pair, generating and storing one if there is none.
+    load_peers()
+        Returns the stored peers as node id -> (public key, signature).
+    save_peer(node_id: str, key_pem: str, signature: str)
+        Stores the public key of a peer.
+    load_genesis()
+        Returns the stored genesis time, or None.
+    save_genesis(genesis: datetime)
+        Stores the genesis time.
+    """
+
+    def __init__(self, node_id: str):
+        """
+        Constructor for a KeyStore.
+
+        :param node_id: str. Node the keys belong to.
+        """
+        self.key_path = '../files/key' + node_id + '.pem'
+        self.peers_path = '../files/peers' + node_id + '.json'
+        self.genesis_path = '../files/genesis' + node_id + '.txt'
+        self.peers = None
+
+    def load_or_create(self, scheme: str):
+        """
+        Returns the signer of the stored key pair. If there is none, or it is of another scheme, a key pair is generated
+        and stored.
+
+        :param scheme: str. 'ed25519' or 'rsa-pss'.
+        :return: RsaPssSigner or Ed25519Signer.
+        """
+        if os.path.exists(self.key_path):
+            with open(self.key_path, 'rb') as key_file:
+                signer = load_signer(key_file.read())
+            if signer.scheme == scheme:
+                return signer
+        signer = get_signer(scheme).generate()
+        if not os.path.isdir('../files'):
+            os.mkdir('../files')
+        temp_path = self.key_path + '.tmp'
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as key_file:
+            key_file.write(private_pem(signer))
+        os.replace(temp_path, self.key_path)
+        return signer
+
+    def load_peers(self) -> dict:
+        """
+        Returns the stored public keys of the peers.
+
+        :return: dict. node id -> (public key, announced signature)
+        """
+        if self.peers is None:
+            try:
+                with open(self.peers_path) as peers_file:
+                    self.peers = json.load(peers_file)
+            except FileNotFoundError:
+                self.peers = {}
+        return {node_id: (load_public_key(peer['key'].encode('utf-8')), peer['signature'])
+                for node_id, peer in self.peers.items()}
+
+    def save_peer(self, node_id: str, key_pem: str, signature: str):
+        """
+        Stores the public key of a peer, unless it is already stored.
+
+        :param node_id: str. Id of the peer.
+        :param key_pem: str. Public key PEM.
+        :param signature: str. Signature the peer announced with its key.
+        :return: None
+        """
+        if self.peers is None:
+            self.load_peers()
+        peer = {'key': key_pem, 'signature': signature}
+        if self.peers.get(node_id) == peer:
+            return
+        self.peers[node_id] = peer
+        temp_path = self.peers_path + '.tmp'
+        with open(temp_path, 'w') as peers_file:
+            json.dump(self.peers, peers_file)
+        os.replace(temp_path, self.peers_path)
+
+    def load_genesis(self) -> datetime:
+        """
+        Returns the genesis time stored by an earlier run.
+
+        :return: datetime. None if no genesis time is stored.
+        """
+        try:
+            with open(self.genesis_path) as genesis_file:
+                return datetime.fromisoformat(genesis_file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_genesis(self, genesis: datetime):
+        """
+        Stores the genesis time, unless it is already stored.
+
+        :param genesis: datetime. Start of term 1.
+        :return: None
+        """
+        if self.load_genesis() == genesis:
+            return
+        if not os.path.isdir('../files'):
+            os.mkdir('../files')
+        temp_path = self.genesis_path + '.tmp'
+        with open(temp_path, 'w') as genesis_file:
+            genesis_file.write(str(genesis))
+        os.replace(temp_path, self.genesis_path)
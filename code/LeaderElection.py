@@ -1,21 +1,29 @@
 from ElectionMessenger import Messenger
 from ElectionTimer import ElectionTimer
 from Heartbeat import Heartbeat
-import math, sys
+from Cluster import Cluster
+from concurrent.futures import Future, TimeoutError
+import sys
 from time import sleep
 
 
 class LeaderElection:
-    def __init__(self, _id: str):
+    def __init__(self, _id: str, transport='sqs', core=None, cluster: Cluster = None):
         """
         Constructor for leader election.
         Main class to elect which node becomes leader.
 
         :param _id: str. Which node this object belongs to.
+        :param transport: str or Transport. Transport of election messages, 'inprocess', 'tcp' or 'sqs'.
+        :param core: MessagingCore. Event loop to handle election messages on, shared with the node.
+        :param cluster: Cluster. Members of the network, defaults to the nodes '0' to '3'.
         """
         self._id = _id
-        self.nodes = ['0', '1', '2', '3']
-        self.peers = [node for node in self.nodes if node != self._id]
+        self.core = core
+        self.cluster = cluster or Cluster.of_size(Cluster.DEFAULT_SIZE)
+        self.nodes = self.cluster.nodes
+        self.peers = self.cluster.peers_of(self._id)
+        self.quorum = self.cluster.quorum
 
         self.term = 0
         self.election_state = 'follower'
@@ -24,11 +32,16 @@ class LeaderElection:
         self.vote_count = 0
         self.voted_for = 'null'
         self.vote_received_from = {}
+        self.outcome = None  # Future of the running campaign, see campaign
         self.reset_votes_received()
 
-        self.m = Messenger(self._id, self)
-        self.e = ElectionTimer(self.timer_length, self)
-        self.h = Heartbeat(self.timer_length, self)
+        if isinstance(transport, str):
+            transport = self.cluster.transport(transport, Messenger.channel, core.loop if core else None)
+        self.m = Messenger(self._id, self, transport=transport, core=core)
+        # with a core, timeouts are handled on its loop like the election messages changing the same state
+        dispatch = core.loop.call_soon_threadsafe if core else None
+        self.e = ElectionTimer(self.timer_length, self, dispatch=dispatch)
+        self.h = Heartbeat(self.timer_length, self, dispatch=dispatch)
 
     def reset_votes_received(self):
         """
@@ -47,6 +60,7 @@ class LeaderElection:
         """
         self.term = term
         self.election_state = 'follower'
+        self.resolve_campaign(False)
         self.vote_count = 0
         self.voted_for = 'null'
         self.reset_votes_received()
@@ -59,6 +73,7 @@ class LeaderElection:
         :return:
         """
         self.election_state = 'leader'
+        self.resolve_campaign(True)
         self.e.stop_timer()
         self.send_heartbeat()
         self.h.restart_timer()
@@ -73,19 +88,79 @@ class LeaderElection:
         self.set_follower(self.term)
         self.send_to_peers('release', 'empty')
 
-    def request_leadership(self):
+    def request_leadership(self, outcome: Future = None):
         """
         Set node to candidate status, notifying followers of its intentions.
 
+        :param outcome: Future. Resolved with True once elected, with False once back to follower, see campaign.
         :return:
         """
+        if outcome is not None and outcome.done():  # campaign given up before it started
+            return
+        self.resolve_campaign(False)
+        self.outcome = outcome
         self.term += 1
         self.election_state = 'candidate'
         self.voted_for = self._id
         self.vote_count = 1
+        self.reset_votes_received()
         self.send_to_peers(type='request_votes', contents=self._id)
+        if self.vote_count >= self.quorum:  # a cluster of one
+            self.set_leader()
         # if timer elapses during request for leadership, set to follower
 
+    def resolve_campaign(self, elected: bool):
+        if self.outcome is not None and not self.outcome.done():
+            self.outcome.set_result(elected)
+        self.outcome = None
+
+    def call(self, function, *args) -> Future:
+        """
+        Runs a method from any thread on the loop of the core, where the election messages changing the same state are
+        handled. Without a core it runs on the calling thread.
+
+        :param function: function. E.g. self.release_leadership.
+        :return: Future. Resolves to the return value of function.
+        """
+        if self.core is None:
+            future = Future()
+            future.set_result(function(*args))
+            return future
+
+        async def run():
+            return function(*args)
+        return self.core.call(run())
+
+    def campaign(self, delay: float = 0.0, timeout: float = 5.0) -> bool:
+        """
+        Requests leadership from any thread, e.g. the mining thread, and waits for the outcome of the election instead
+        of a fixed time. A campaign that is not decided within timeout is given up.
+
+        :param delay: float. Seconds to wait before requesting leadership, randomized by the caller so nodes mining in
+        the same term do not all stand at once.
+        :param timeout: float. Seconds to wait for the outcome after the request.
+        :return: bool. True if this node was elected.
+        """
+        outcome = Future()
+        if self.core is None:
+            sleep(delay)
+            self.request_leadership(outcome)
+        else:
+            self.core.loop.call_soon_threadsafe(self.core.loop.call_later, delay, self.request_leadership, outcome)
+        try:
+            return outcome.result(delay + timeout)
+        except TimeoutError:
+            self.call(self.abandon_campaign, outcome).result()
+            return outcome.result()
+
+    def abandon_campaign(self, outcome: Future):
+        if outcome.done():  # decided in the meantime
+            return
+        if self.outcome is outcome and self.election_state == 'candidate':
+            self.set_follower(self.term)
+        if not outcome.done():  # not requested yet
+            outcome.set_result(False)
+
     def send_to_peers(self, type: str, contents: str):
         """
         Send message to all other nodes.
@@ -95,8 +170,7 @@ class LeaderElection:
         :return:
         """
         msg = {'type': type, 'contents': contents, 'term': str(self.term)}
-        for peer in self.peers:
-            self.m.send(msg, peer)
+        self.m.broadcast(msg, self.peers)
 
     def send_heartbeat(self, contents: str = 'empty'):
         """
@@ -107,8 +181,17 @@ class LeaderElection:
         """
         if self.election_state == 'leader':
             msg = {'type': 'heartbeat', 'contents': contents, 'term': str(self.term)}
-            for peer in self.peers:
-                self.m.send(msg, peer)
+            self.m.broadcast(msg, self.peers)
+
+    async def handle_message(self, message: dict):
+        """
+        Handles an election message on the event loop of a MessagingCore. Election messages only change the election
+        state and send replies, so they are handled on the loop directly.
+
+        :param message: The incoming message dictionary: type and contents
+        :return:
+        """
+        self.handle_incoming_message(message)
 
     def handle_incoming_message(self, message: dict):
         """
@@ -128,7 +211,9 @@ class LeaderElection:
         elif message_type == 'vote_reply':
             self.receive_vote_reply(message)
         elif message_type == 'release':
-            # sent by leader to release all "voted for" and reset state to followers
+            # sent by leader to release all "voted for" and reset state to followers. Leadership was given up, not
+            # lost, so there is no leader to time out on until the next heartbeat.
+            self.e.stop_timer()
             self.set_follower(incoming_term)
         elif message_type == 'leader_exists' and self.election_state == 'candidate':
             self.set_follower(incoming_term)
@@ -167,7 +252,8 @@ class LeaderElection:
 
     def receive_vote_reply(self, message: dict):
         """
-        Actions to take when you receive a vote as a candidate. If you receive majority of votes, you become leader.
+        Actions to take when you receive a vote as a candidate. If a majority of the cluster voted for you, counting
+        your own vote, you become leader.
 
         :param message:
         :return:
@@ -176,21 +262,18 @@ class LeaderElection:
         incoming_term = int(message['term'])
         sender = message['sender']
         if self.election_state == 'candidate' and incoming_term == self.term:
-            self.vote_received_from[sender] = True
-            response_from_all = True
-            if vote_granted == 'True':
+            if vote_granted == 'True' and not self.vote_received_from[sender]:
                 self.vote_count += 1
-            for k, v in self.vote_received_from.items():
-                if not v:
-                    response_from_all = False
-            if self.vote_count > math.floor(len(self.peers)/2) and response_from_all:
+            self.vote_received_from[sender] = True
+            if self.vote_count >= self.quorum:
                 self.set_leader()
 
 
 if __name__ == '__main__':
     arg = sys.argv[1]
 
-    le = LeaderElection(arg)
+    le = LeaderElection(arg, sys.argv[2] if len(sys.argv) > 2 else 'sqs',
+                        cluster=Cluster.from_args(nodes=int(sys.argv[3]) if len(sys.argv) > 3 else None))
     sleep(2)
     if le._id == '1':
         le.request_leadership()
\ No newline at end of file
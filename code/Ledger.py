@@ -1,5 +1,25 @@
 from Transaction import Transaction
-import pickle, os, copy
+from TransactionBatch import TransactionBatch, iter_transfers
+from BalanceMap import BalanceState, BalanceHistory
+from ChainRenderer import format_ledger_entry
+import ast, os
+
+_numpy = False  # not imported yet
+
+
+def numpy():
+    """
+    Imports NumPy the first time a block is large enough to be verified with it, so it does not slow down startup.
+
+    :return: module. numpy, or None if it is not installed (verification then uses the pure Python path).
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as _numpy
+        except ImportError:
+            _numpy = None
+    return _numpy
 
 
 class Ledger:
@@ -10,74 +30,160 @@ class Ledger:
 
     Attributes
     ----------
-    blockchain_balances : list.
+    blockchain_balances : BalanceHistory.
         This list holds all balance states of the blockchain, each state corresponds to a new block added to the chain.
+        Consecutive states share the balances of accounts they did not touch.
 
     Methods
     ----------
-    verify_and_add_transaction(transactions: list of Transaction objects, index: int)
+    verify_transaction(transactions: list of Transaction objects, index: int)
         Takes transaction objects and applies them to the ledger at index. If any balance is negative return false.
-    add_balance_state(balance: dict, index: int)
+    verify_transaction_vectorized(transactions: list of Transaction objects, index: int)
+        Same contract as verify_transaction, computed with NumPy. Used for large blocks if NumPy is installed.
+    apply_transactions(previous: BalanceState, transactions: list of Transaction objects)
+        Returns the new balances of the accounts touched by the transactions.
+    add_balance_state(balance: BalanceState or dict, index: int)
         Adds a ledger state (in form of dictionary of peers and balances) to the ledger list at index.
     get_curr_balance_for_node(node: str)
         Returns current balance of a given node (as defined in last entry in ledger)
     get_total_currency_in_chain()
         Returns sum of all member balances (represents coin in circulation)
     create_or_read_file()
-        Check for existing Ledger on disk, else create Ledger
-    write_to_file()
-        dump ledger contents to pickle on disk
+        Initialize the Ledger with the genesis balances
+    restore(balances: dict, index: int)
+        Reset the Ledger to a checkpointed state
+    replay(blocks: iterable of Block objects)
+        Apply the transactions of already committed blocks without verifying them
+    write_to_disk(replaced: bool, index: int)
+        write ledger contents to the human readable text file
+    read_entry(index: int), read_last_entry()
+        Returns the balances written to the text file for a block index, or for the newest block
     """
+    INITIAL_BALANCES = {'0': 10, '1': 10, '2': 10, '3': 10}  # genesis balances of the default cluster
+    VECTORIZE_THRESHOLD = 256  # minimum number of transactions for which verification is vectorized
 
-    def __init__(self, node_id):
+    def __init__(self, node_id, initial_balances: dict = None):
         """
         Constructor for the Ledger. Initializes balance of genesis block to introduce init currency into blockchain.
+
+        :param node_id: str. Node the ledger belongs to.
+        :param initial_balances: dict. Genesis balances of the members of the cluster, see Cluster.initial_balances.
         """
         self.node_id = node_id
+        self.initial_balances = initial_balances or self.INITIAL_BALANCES
         self.file_path = '../files/ledger' + node_id + '.txt'
-        self.pickle_path = '../files/ledger' + node_id + '.pickle'
-        self.blockchain_balances = [{}]  # initial bc balance
+        self.blockchain_balances = BalanceHistory({})  # initial bc balance
         self.create_or_read_file()
 
     def verify_transaction(self, transactions, index):
         """
         Takes transaction objects and applies them to the ledger at index. If any balance is negative return false.
+        Only the balances of accounts touched by the transactions are computed, everything else is shared with the
+        previous state.
 
-        :param transactions: list. List of Transaction objects to verify
+        :param transactions: list. List of Transaction objects, or a TransactionBatch, to verify
         :param index: int. index at which the transactions are applied (equal to block index)
-        :return: bool, list. Return True, [new balance dict] if all valid, otherwise return false, [bad transactions] if
+        :return: bool, list. Return True, [new BalanceState] if all valid, otherwise return false, [bad transactions] if
         transactions cause any balance to go negative.
         """
-
-        change = copy.deepcopy(self.blockchain_balances[index-1])  # get previous state
-        for tx in transactions:  # apply all transactions to that state
-            if tx.from_node != 'reward':
-                change[tx.from_node] -= tx.amount
-            change[tx.to_node] += tx.amount
+        if len(transactions) >= self.VECTORIZE_THRESHOLD and numpy() is not None:
+            return self.verify_transaction_vectorized(transactions, index)
+        previous = self.blockchain_balances[index-1]  # get previous state
+        change = self.apply_transactions(previous, transactions)
+        sent_by = {}
+        for from_node, to_node, amount, unique_id in iter_transfers(transactions):
+            sent_by.setdefault(from_node, []).append(unique_id)
         all_bad_tx = []
         for node, balance in change.items():
             if balance < 0:
                 print('Found negative balance.')
-                all_bad_tx.extend([tx.unique_id for tx in transactions if tx.from_node == node])
+                all_bad_tx.extend(sent_by.get(node, []))
         if all_bad_tx:
             print('Bad transactions were found: ', all_bad_tx)
             return False, all_bad_tx
         else:
-            return True, [change]
+            return True, [previous.derive(change)]
+
+    def verify_transaction_vectorized(self, transactions, index):
+        """
+        Same contract as verify_transaction, computed with NumPy: accounts are mapped to dense integer indices, all
+        debits and credits are summed per account in one pass, and every transaction sent by an overdrawn account is
+        found with a single mask.
+
+        :param transactions: list. List of Transaction objects, or a TransactionBatch, to verify
+        :param index: int. index at which the transactions are applied (equal to block index)
+        :return: bool, list. Return True, [new BalanceState] if all valid, otherwise return false, [bad transactions].
+        """
+        np = numpy()
+        previous = self.blockchain_balances[index-1]  # get previous state
+        if isinstance(transactions, TransactionBatch):
+            accounts = transactions.accounts
+            from_ids = np.frombuffer(transactions.from_ids, dtype=np.int32)
+            to_ids = np.frombuffer(transactions.to_ids, dtype=np.int32)
+            amounts = np.frombuffer(transactions.amounts, dtype=np.float64)
+        else:
+            account_ids = {}
+            from_ids = np.fromiter((account_ids.setdefault(tx.from_node, len(account_ids)) for tx in transactions),
+                                   dtype=np.int32, count=len(transactions))
+            to_ids = np.fromiter((account_ids.setdefault(tx.to_node, len(account_ids)) for tx in transactions),
+                                 dtype=np.int32, count=len(transactions))
+            amounts = np.fromiter((tx.amount for tx in transactions), dtype=np.float64, count=len(transactions))
+            accounts = list(account_ids)
+        n_accounts = len(accounts)
+        debited = from_ids != accounts.index('reward') if 'reward' in accounts else np.ones(len(from_ids), dtype=bool)
+        balances = np.fromiter((previous.get(account, 0) for account in accounts), dtype=np.float64,
+                               count=n_accounts)
+        balances += np.bincount(to_ids, weights=amounts, minlength=n_accounts)
+        balances -= np.bincount(from_ids[debited], weights=amounts[debited], minlength=n_accounts)
+        touched = np.zeros(n_accounts, dtype=bool)
+        touched[to_ids] = True
+        touched[from_ids[debited]] = True
+        overdrawn = (balances < 0) & touched
+        if overdrawn.any():
+            print('Found negative balance.')
+            bad_positions = np.flatnonzero(overdrawn[from_ids] & debited)
+            if isinstance(transactions, TransactionBatch):
+                all_bad_tx = [transactions.unique_id(i) for i in bad_positions]
+            else:
+                all_bad_tx = [transactions[i].unique_id for i in bad_positions]
+            print('Bad transactions were found: ', all_bad_tx)
+            return False, all_bad_tx
+        change = {accounts[i]: balances[i].item() for i in np.flatnonzero(touched)}
+        return True, [previous.derive(change)]
+
+    @staticmethod
+    def apply_transactions(previous: BalanceState, transactions) -> dict:
+        """
+        Applies transactions to a balance state without modifying it.
+
+        :param previous: BalanceState. State the transactions are applied to.
+        :param transactions: list. List of Transaction objects, or a TransactionBatch.
+        :return: dict. New balances of every account touched by the transactions.
+        """
+        change = {}
+        for from_node, to_node, amount, unique_id in iter_transfers(transactions):  # apply all transactions
+            if from_node != 'reward':
+                balance = change[from_node] if from_node in change else previous.get(from_node, 0)
+                change[from_node] = balance - amount
+            balance = change[to_node] if to_node in change else previous.get(to_node, 0)
+            change[to_node] = balance + amount
+        return change
 
     def add_balance_state(self, balance, index):
         """
-        Adds a ledger state (in form of dictionary of peers and balances) to the ledger list at index.
+        Adds a ledger state to the ledger list at index. Replacing an existing index drops that state and every state
+        after it.
 
-        :param balance: dict. Dictionary of peer keys and balance values.
+        :param balance: BalanceState or dict. State derived from the previous one, or a dictionary of peer keys and
+        balance values.
         :param index: int.
         :return: None
         """
-        if index >= len(self.blockchain_balances):
-            self.blockchain_balances.append(balance)
-        else:
-            self.blockchain_balances[index] = balance
-        self.write_to_disk()
+        if not isinstance(balance, BalanceState):
+            balance = BalanceState(dict(balance))
+        replaced = index < len(self.blockchain_balances)
+        self.blockchain_balances.put(balance, index)
+        self.write_to_disk(replaced, index)
 
     def add_transactions(self, transactions: list, index):
         """
@@ -87,12 +193,8 @@ class Ledger:
         :param index: int. index at which tx are applied
         :return: None
         """
-        change = copy.deepcopy(self.blockchain_balances[index - 1])  # get previous state
-        for tx in transactions:  # apply all transactions to that state
-            if tx.from_node != 'reward':
-                change[tx.from_node] -= tx.amount
-            change[tx.to_node] += tx.amount
-        self.add_balance_state(change, index)
+        previous = self.blockchain_balances[index - 1]  # get previous state
+        self.add_balance_state(previous.derive(self.apply_transactions(previous, transactions)), index)
 
     def get_curr_balance_for_node(self, node) -> float:
         """
@@ -101,54 +203,125 @@ class Ledger:
         :param node: str. Name of node in question
         :return: float.
         """
-        return self.blockchain_balances[-1][node]
+        return self.blockchain_balances.tip[node]
 
     def get_total_currency_in_chain(self) -> float:
         """
         Returns sum of all member balances (represents coin in circulation)
         :return: float.
         """
-        _sum = 0
-        for v in self.blockchain_balances[-1].values():
-            _sum += v
-        return _sum
+        return self.blockchain_balances[-1].total
 
     def create_or_read_file(self):
         """
-        Check for existing Ledger on disk, else create Ledger.
+        Initialize the Ledger with the genesis balances and create its text file if it does not exist. Balance states
+        are not stored on disk themselves, they are restored from a checkpoint and the chain (see Checkpoint.py).
 
         :return: None
         """
         # make sure the 'files' directory exists
         if not os.path.isdir('../files'):
             os.mkdir('../files')
-        try:
-            # try to read in file from disk if it exists
-            read_file = open(self.pickle_path, 'rb')
-            self.blockchain_balances = pickle.load(read_file)
-            read_file.close()
-            print('Ledger loaded from file.')
-        except FileNotFoundError:
-            # if no ledger exists, initialize one with the initial balances
-            self.blockchain_balances = [{'0': 10, '1': 10, '2': 10, '3': 10}]
+        self.blockchain_balances = BalanceHistory(self.initial_balances)
+        if not os.path.exists(self.file_path):
             self.write_to_disk()
 
-    def write_to_disk(self):
+    def restore(self, balances: dict, index: int):
         """
-        Dump ledger contents to pickle on disk.
+        Reset the Ledger to a checkpointed state. States older than index are not held afterwards.
 
+        :param balances: dict. Balances after the block at index.
+        :param index: int. Block index of the checkpoint.
         :return: None
         """
-        # dump to pickle
-        ledger_string = 'Ledger: \n'
-        for entry in self.blockchain_balances:
-            ledger_string += str(entry) + '\n'
+        self.blockchain_balances = BalanceHistory(balances, first_index=index)
+
+    def replay(self, blocks):
+        """
+        Apply the transactions of already committed blocks in order, without verifying them or writing to disk.
 
-        text_file = open(self.file_path, "w")
-        text_file.write(ledger_string)
-        text_file.close()
+        :param blocks: iterable. Block objects following the current tip of the Ledger.
+        :return: int. Number of blocks replayed.
+        """
+        count = 0
+        for block in blocks:
+            previous = self.blockchain_balances[block.index - 1]
+            self.blockchain_balances.put(previous.derive(self.apply_transactions(previous, block.transactions)),
+                                         block.index)
+            count += 1
+        return count
 
-        pickle.dump(self.blockchain_balances, open(self.pickle_path, "wb"))
+    def write_to_disk(self, replaced: bool = True, index: int = None):
+        """
+        Write ledger contents to the human readable text file. Unless an existing entry was replaced, only the newest
+        entry is appended. A replaced entry and every entry after it are rewritten, the entries before it are kept:
+        after a checkpoint restore the ledger does not hold the states older than the checkpoint to write them again.
+
+        :param replaced: bool. True if the entries from index on have to be rewritten.
+        :param index: int. Block index of the first entry to rewrite, defaults to the first state held.
+        :return: bool. False if the text file holds fewer than index entries to keep, nothing is written then.
+        """
+        first_index = self.blockchain_balances.first_index
+        if not replaced and os.path.exists(self.file_path):
+            with open(self.file_path, "a") as text_file:
+                text_file.write(format_ledger_entry(self.blockchain_balances[-1]))
+            return True
+        index = first_index if index is None else max(index, first_index)
+        if index == 0 or not os.path.exists(self.file_path):
+            if index != 0:
+                return False
+            with open(self.file_path, "w") as text_file:
+                text_file.write('Ledger: \n')
+                for entry in self.blockchain_balances:
+                    text_file.write(format_ledger_entry(entry))
+            return True
+        with open(self.file_path, "rb+") as text_file:
+            text_file.readline()  # header
+            for _ in range(index):
+                if not text_file.readline().endswith(b'\n'):
+                    return False
+            text_file.truncate(text_file.tell())
+            for position in range(index - first_index, len(self.blockchain_balances.states)):
+                text_file.write(format_ledger_entry(self.blockchain_balances.states[position]).encode('utf-8'))
+        return True
+
+    def read_entry(self, index: int):
+        """
+        Returns the balances written to the text file for a block index.
+
+        :param index: int. Block index.
+        :return: dict. None if the text file has no entry for index.
+        """
+        if not os.path.exists(self.file_path):
+            return None
+        with open(self.file_path) as text_file:
+            text_file.readline()  # header
+            for position, line in enumerate(text_file):
+                if position == index:
+                    try:
+                        return ast.literal_eval(line.strip())
+                    except (ValueError, SyntaxError):
+                        return None
+        return None
+
+    def read_last_entry(self, block_size: int = 65536):
+        """
+        Returns the balances of the last entry of the text file, reading only its end.
+
+        :return: dict. None if the file has no complete entry.
+        """
+        if not os.path.exists(self.file_path):
+            return None
+        with open(self.file_path, 'rb') as text_file:
+            text_file.seek(0, os.SEEK_END)
+            text_file.seek(max(0, text_file.tell() - block_size))
+            lines = text_file.read().split(b'\n')
+        if len(lines) < 3 or lines[-1] != b'':  # header and one entry, ending in a newline
+            return None
+        try:
+            return ast.literal_eval(lines[-2].decode('utf-8'))
+        except (ValueError, SyntaxError, UnicodeDecodeError):
+            return None
 
 
 if __name__ == '__main__':
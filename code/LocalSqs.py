@@ -0,0 +1,136 @@
+from threading import Condition
+import collections, time, uuid
+
+
+class LocalSqs:
+    """
+    In-memory stand-in for the part of the boto3 SQS client used by SqsTransport, to run nodes and benchmarks without
+    AWS. Queues are FIFO, created on first use and identified by their URL. Batch calls enforce the SQS limits of
+    10 entries and 256KiB, receives long poll. Received messages stay in flight until deleted but are never made
+    visible again, and no deduplication is done.
+
+    Attributes
+    ----------
+    latency : float
+        seconds every call takes, to model the round trip to SQS.
+    calls : Counter
+        number of calls per method.
+    """
+    MAX_BATCH = 10
+    MAX_BATCH_BYTES = 256 * 1024
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Constructor for a LocalSqs.
+
+        :param latency: float. Seconds every call takes.
+        """
+        self.latency = latency
+        self.queues = collections.defaultdict(collections.deque)  # URL -> deque of messages
+        self.in_flight = {}  # receipt handle -> message
+        self.condition = Condition()
+        self.calls = collections.Counter()
+
+    def call(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def check_batch(entries: list):
+        if not 0 < len(entries) <= LocalSqs.MAX_BATCH:
+            raise ValueError('batch of {} entries, 1 to {} allowed'.format(len(entries), LocalSqs.MAX_BATCH))
+        size = 0
+        for entry in entries:
+            size += len(entry.get('MessageBody', ''))
+            for key, value in entry.get('MessageAttributes', {}).items():
+                size += len(key) + len(value['DataType'])
+                size += len(value['BinaryValue']) if 'BinaryValue' in value else len(value['StringValue'].encode())
+        if size > LocalSqs.MAX_BATCH_BYTES:
+            raise ValueError('batch of {} bytes, at most {} allowed'.format(size, LocalSqs.MAX_BATCH_BYTES))
+
+    def enqueue(self, QueueUrl: str, entry: dict) -> str:
+        message_id = str(uuid.uuid4())
+        self.queues[QueueUrl].append({
+            'MessageId': message_id,
+            'Body': entry['MessageBody'],
+            'MessageAttributes': entry.get('MessageAttributes', {})
+        })
+        return message_id
+
+    def send_message(self, QueueUrl: str, MessageBody: str, MessageAttributes: dict = None, **kwargs) -> dict:
+        self.call('send_message')
+        with self.condition:
+            message_id = self.enqueue(QueueUrl, {'MessageBody': MessageBody, 'MessageAttributes': MessageAttributes})
+            self.condition.notify_all()
+        return {'MessageId': message_id}
+
+    def send_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        self.call('send_message_batch')
+        self.check_batch(Entries)
+        with self.condition:
+            successful = [{'Id': entry['Id'], 'MessageId': self.enqueue(QueueUrl, entry)} for entry in Entries]
+            self.condition.notify_all()
+        return {'Successful': successful, 'Failed': []}
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, WaitTimeSeconds: int = 0,
+                        **kwargs) -> dict:
+        self.call('receive_message')
+        deadline = time.monotonic() + WaitTimeSeconds
+        with self.condition:
+            queue = self.queues[QueueUrl]
+            while not queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {}
+                self.condition.wait(remaining)
+            messages = []
+            while queue and len(messages) < MaxNumberOfMessages:
+                message = dict(queue.popleft(), ReceiptHandle=str(uuid.uuid4()))
+                self.in_flight[message['ReceiptHandle']] = message
+                messages.append(message)
+        return {'Messages': messages}
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str):
+        self.call('delete_message')
+        with self.condition:
+            if self.in_flight.pop(ReceiptHandle, None) is None:
+                raise ValueError('ReceiptHandleIsInvalid')
+
+    def delete_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        self.call('delete_message_batch')
+        self.check_batch(Entries)
+        successful, failed = [], []
+        with self.condition:
+            for entry in Entries:
+                if self.in_flight.pop(entry['ReceiptHandle'], None) is None:
+                    failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid', 'SenderFault': True})
+                else:
+                    successful.append({'Id': entry['Id']})
+        return {'Successful': successful, 'Failed': failed}
+
+
+if __name__ == '__main__':
+    # Benchmark: messages per second and API calls from node '0' to node '1' over SQS with a simulated round trip,
+    # one message per call (the previous Messenger) vs. batched calls.
+    # usage: python LocalSqs.py [messages] [latency ms]
+    import sys
+    from queue import Queue
+    from Transport import SqsTransport
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    for max_batch in (1, 10):
+        sqs = LocalSqs(latency)
+        sender = SqsTransport('blockchain', client=sqs, max_batch=max_batch)
+        receiver = SqsTransport('blockchain', client=sqs, max_batch=max_batch)
+        received = Queue()
+        receiver.start('1', received.put)
+        start = time.perf_counter()
+        for i in range(n_messages):
+            sender.send({'type': 'transaction', 'contents': str(i)}, '1')
+        in_order = all(received.get()['contents'] == str(i) for i in range(n_messages))
+        elapsed = time.perf_counter() - start
+        calls = sum(count for method, count in sqs.calls.items() if method != 'receive_message')
+        print('batch {:>2}: {:>6.0f} messages/s, {:>4} send and delete calls, {:>4} receives, in order: {}'.format(
+            max_batch, n_messages / elapsed, calls, sqs.calls['receive_message'], in_order))
+        sender.close()
@@ -0,0 +1,220 @@
+from Transaction import Transaction
+from TransactionBatch import TransactionBatch, iter_transfers
+from threading import RLock
+import collections
+
+
+class Mempool:
+    """
+    Pending transactions of a node, keyed by unique_id and kept in arrival order. Adding, looking up and removing a
+    transaction are O(1), the same transaction arriving from several senders is only kept once, and the pool never
+    holds more than capacity transactions. All methods are safe to call from the messenger and mining threads at the
+    same time.
+
+    Attributes
+    ----------
+    capacity : int
+        maximum number of pending transactions.
+    eviction : str
+        what happens when a transaction arrives at a full pool. EVICT_OLDEST drops the oldest pending transaction to
+        make room, REJECT_NEW drops the arriving one.
+    duplicates : int
+        number of transactions ignored because they were already pending.
+    evicted : int
+        number of transactions dropped because the pool was full.
+
+    Methods
+    ----------
+    add(tx: Transaction)
+        Adds a transaction unless it is already pending. Returns True if it was added.
+    add_batch(transactions: TransactionBatch)
+        Adds many transactions at once. Returns the number added.
+    remove(unique_id: str)
+        Removes a pending transaction and returns it, or None.
+    remove_all(unique_ids: iterable)
+        Removes every listed transaction that is pending. Returns the number removed.
+    remove_committed(block: Block)
+        Removes the transactions of a committed block.
+    snapshot()
+        Returns the pending transactions as a list, oldest first.
+    """
+    DEFAULT_CAPACITY = 10000
+    EVICT_OLDEST = 'oldest'
+    REJECT_NEW = 'reject'
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, eviction: str = EVICT_OLDEST):
+        """
+        Constructor for a Mempool.
+
+        :param capacity: int. Maximum number of pending transactions.
+        :param eviction: str. Mempool.EVICT_OLDEST or Mempool.REJECT_NEW.
+        """
+        if eviction not in (self.EVICT_OLDEST, self.REJECT_NEW):
+            raise ValueError('unknown eviction policy: ' + str(eviction))
+        self.capacity = capacity
+        self.eviction = eviction
+        self.transactions = collections.OrderedDict()  # unique_id -> Transaction, oldest first
+        self.lock = RLock()
+        self.duplicates = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __contains__(self, tx) -> bool:
+        """
+        :param tx: Transaction or str. Transaction or its unique_id.
+        :return: bool.
+        """
+        return (tx.unique_id if isinstance(tx, Transaction) else tx) in self.transactions
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def get(self, unique_id: str) -> Transaction:
+        return self.transactions.get(unique_id)
+
+    def add(self, tx: Transaction) -> bool:
+        """
+        Adds a transaction unless it is already pending. If the pool is full the eviction policy decides whether the
+        oldest pending transaction or the new one is dropped.
+
+        :param tx: Transaction.
+        :return: bool. True if the transaction was added.
+        """
+        with self.lock:
+            if tx.unique_id in self.transactions:
+                self.duplicates += 1
+                return False
+            if len(self.transactions) >= self.capacity:
+                self.evicted += 1
+                if self.eviction == self.REJECT_NEW:
+                    return False
+                self.transactions.popitem(last=False)
+            self.transactions[tx.unique_id] = tx
+            return True
+
+    def add_batch(self, transactions) -> int:
+        """
+        Adds many transactions under one acquisition of the lock, with the same duplicate and eviction rules as add.
+        For a TransactionBatch duplicates are found on the packed unique ids, and a Transaction object is only built
+        for every transaction that is added.
+
+        :param transactions: TransactionBatch or iterable of Transaction objects, oldest first.
+        :return: int. Number of transactions added.
+        """
+        if isinstance(transactions, TransactionBatch):
+            entries = ((transactions.unique_id(i), i) for i in range(len(transactions)))
+            build = transactions.__getitem__
+        else:
+            entries = ((tx.unique_id, tx) for tx in transactions)
+            build = None
+        added = 0
+        with self.lock:
+            for unique_id, entry in entries:
+                if unique_id in self.transactions:
+                    self.duplicates += 1
+                    continue
+                if len(self.transactions) >= self.capacity:
+                    self.evicted += 1
+                    if self.eviction == self.REJECT_NEW:
+                        continue
+                    self.transactions.popitem(last=False)
+                self.transactions[unique_id] = entry if build is None else build(entry)
+                added += 1
+        return added
+
+    def remove(self, unique_id: str) -> Transaction:
+        """
+        Removes a pending transaction.
+
+        :param unique_id: str.
+        :return: Transaction. The removed transaction, None if it was not pending.
+        """
+        with self.lock:
+            return self.transactions.pop(unique_id, None)
+
+    def remove_all(self, unique_ids) -> int:
+        """
+        Removes every listed transaction that is pending.
+
+        :param unique_ids: iterable of str.
+        :return: int. Number of transactions removed.
+        """
+        with self.lock:
+            removed = 0
+            for unique_id in unique_ids:
+                if self.transactions.pop(unique_id, None) is not None:
+                    removed += 1
+            return removed
+
+    def remove_committed(self, block) -> int:
+        """
+        Removes the transactions of a block that was added to the chain, so they are not mined a second time.
+
+        :param block: Block. Committed block.
+        :return: int. Number of transactions removed.
+        """
+        return self.remove_all(unique_id for _, _, _, unique_id in iter_transfers(block.transactions))
+
+    def snapshot(self) -> list:
+        """
+        Returns the pending transactions, oldest first. The list is a copy, so it can be used while other threads keep
+        adding and removing transactions.
+
+        :return: list of Transaction objects.
+        """
+        with self.lock:
+            return list(self.transactions.values())
+
+    def clear(self):
+        with self.lock:
+            self.transactions.clear()
+
+
+if __name__ == '__main__':
+    # Benchmark: removing a committed block's transactions from a list queue vs. the mempool.
+    # usage: python Mempool.py [pending transactions] [transactions per block]
+    import copy, sys, time
+    from Block import Block
+    n_pending = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_block = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    pending = [Transaction(_to='1', _from='0', amount=0.1) for _ in range(n_pending)]
+    block = Block(index=1, transactions=pending[:n_block])
+
+    start = time.perf_counter()
+    delete_transactions = copy.deepcopy(block.transactions)
+    queue = [x for x in pending if x not in delete_transactions]
+    list_time = time.perf_counter() - start
+
+    mempool = Mempool()
+    for tx in pending + pending[:10]:
+        mempool.add(tx)
+    start = time.perf_counter()
+    mempool.remove_committed(block)
+    mempool_time = time.perf_counter() - start
+    print('remove {} of {} pending: list {:.3f}s, mempool {:.5f}s'.format(n_block, n_pending, list_time, mempool_time))
+    print('same result: ', [tx.unique_id for tx in queue] == [tx.unique_id for tx in mempool],
+          ' duplicates ignored: ', mempool.duplicates)
+
+    # a batch arriving at a pool already holding half of it: one by one vs. add_batch
+    batch = TransactionBatch(pending)
+    single = Mempool()
+    single.add_batch(pending[:n_pending // 2])
+    start = time.perf_counter()
+    for tx in batch:
+        single.add(tx)
+    single_time = time.perf_counter() - start
+    batched = Mempool()
+    batched.add_batch(pending[:n_pending // 2])
+    start = time.perf_counter()
+    batched.add_batch(batch)
+    batch_time = time.perf_counter() - start
+    print('add a batch of {}, half pending: one by one {:.4f}s, add_batch {:.4f}s, same result: {}'.format(
+        n_pending, single_time, batch_time,
+        [tx.unique_id for tx in single] == [tx.unique_id for tx in batched] == [tx.unique_id for tx in pending]))
+
+    small = Mempool(capacity=3)
+    for tx in pending[:5]:
+        small.add(tx)
+    print('capacity 3, evicted: ', small.evicted, ' kept newest: ', small.snapshot() == pending[2:5])
@@ -0,0 +1,104 @@
+"""
+Merkle tree over transaction unique_ids. Leaves and inner nodes are hashed with different prefixes so a leaf can never
+be passed off as an inner node, and a node without a sibling is carried up to the next level unchanged instead of
+being paired with a copy of itself.
+
+A unique_id in canonical form (lowercase hex, as produced by Transaction.generateIDh) is hashed as the bytes it encodes.
+Any other id, including other spellings of the same bytes like upper case hex, is hashed as text under its own prefix,
+so two spellings of one id never share a leaf and a text id can never pass for the bytes of a hex one.
+"""
+import hashlib
+
+LEAF = b'\x00'
+NODE = b'\x01'
+TEXT_LEAF = b'\x02'
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def is_canonical(unique_id: str) -> bool:
+    """
+    Checks that an id is lowercase hex without whitespace, the only spelling hashed as the bytes it encodes.
+
+    :param unique_id: str.
+    :return: bool.
+    """
+    try:
+        return bytes.fromhex(unique_id).hex() == unique_id
+    except ValueError:
+        return False
+
+
+def leaf_hash(unique_id: str) -> bytes:
+    if is_canonical(unique_id):
+        return hashlib.sha256(LEAF + bytes.fromhex(unique_id)).digest()
+    return hashlib.sha256(TEXT_LEAF + unique_id.encode('utf-8')).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE + left + right).digest()
+
+
+def next_level(level: list) -> list:
+    paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(unique_ids: list) -> str:
+    """
+    Returns the Merkle root over a list of transaction ids.
+
+    :param unique_ids: list of str. Transaction ids, in block order.
+    :return: str. Hex digest, EMPTY_ROOT for an empty list.
+    """
+    if not unique_ids:
+        return EMPTY_ROOT
+    level = [leaf_hash(unique_id) for unique_id in unique_ids]
+    while len(level) > 1:
+        level = next_level(level)
+    return level[0].hex()
+
+
+def merkle_proof(unique_ids: list, position: int) -> list:
+    """
+    Returns the inclusion proof of the transaction at position: the sibling hashes on the path from its leaf to the
+    root. O(log n) entries.
+
+    :param unique_ids: list of str. Transaction ids, in block order.
+    :param position: int. Position of the transaction in unique_ids.
+    :return: list. (side, sibling hex digest) pairs from the leaf upwards, side is 'L' if the sibling is on the left.
+    """
+    level = [leaf_hash(unique_id) for unique_id in unique_ids]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append(('L' if sibling < position else 'R', level[sibling].hex()))
+        level = next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(unique_id: str, proof: list, root: str) -> bool:
+    """
+    Checks an inclusion proof against a Merkle root.
+
+    :param unique_id: str. Id of the transaction to check.
+    :param proof: list. Proof as returned by merkle_proof.
+    :param root: str. Merkle root from a block header.
+    :return: bool. True if the transaction is included under root.
+    """
+    current = leaf_hash(unique_id)
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        current = node_hash(sibling, current) if side == 'L' else node_hash(current, sibling)
+    return current.hex() == root
+
+
+if __name__ == '__main__':
+    ids = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(11)]
+    root = merkle_root(ids)
+    print('root: ', root)
+    print('all proofs valid: ', all(verify_proof(ids[i], merkle_proof(ids, i), root) for i in range(len(ids))))
+    print('wrong id rejected: ', not verify_proof(ids[0], merkle_proof(ids, 1), root))
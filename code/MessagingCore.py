@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+import asyncio, collections, time
+
+
+class MessagingCore:
+    """
+    One asyncio event loop per node that receives the messages of all its channels. Every Messenger of the node
+    registers its channel with the core; transports built on asyncio run on the loop of the core, and every channel
+    has a queue whose messages are handled one after another by a task on the loop. Channels are handled
+    independently, so election messages are never held up by a block being processed.
+
+    Handlers run on the loop, so the state they change is only changed by one thread. Handlers must not block the
+    loop: work that does, such as signature checks or disk I/O, is passed to run_blocking, which runs it on a small
+    pool of worker threads while the loop keeps handling the other channels.
+
+    Attributes
+    ----------
+    node_id : str
+        node the core belongs to.
+    loop : asyncio event loop
+        the loop, running on its own thread.
+    executor : ThreadPoolExecutor
+        workers for blocking work.
+    handled, latency : Counter
+        per channel, number of messages handled and total seconds from receipt to the end of their handling.
+
+    Methods
+    ----------
+    register(channel: str, handler: coroutine function)
+        Creates the queue of a channel and starts handling its messages with handler.
+    deliverer(channel: str)
+        Returns the function transports call with received messages, from any thread.
+    run_blocking(function, *args)
+        Awaitable running a blocking function on the workers.
+    call(coroutine)
+        Runs a coroutine on the loop from another thread and returns a concurrent future.
+    stats()
+        Returns the counters as a dict.
+    """
+    DEFAULT_WORKERS = 2
+
+    def __init__(self, node_id: str, workers: int = DEFAULT_WORKERS):
+        """
+        Constructor for a MessagingCore, starts the loop thread.
+
+        :param node_id: str. Node the core belongs to.
+        :param workers: int. Number of threads for blocking work.
+        """
+        self.node_id = node_id
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='Messaging Worker ' + node_id)
+        self.queues = {}  # channel -> asyncio.Queue of (receipt time, message)
+        self.tasks = {}  # channel -> Task handling the queue
+        self.handled = collections.Counter()
+        self.latency = collections.Counter()
+        self.thread = Thread(target=self.loop.run_forever, name='Messaging Core ' + node_id, daemon=True)
+        self.thread.start()
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def register(self, channel: str, handler):
+        """
+        Creates the queue of a channel and starts handling its messages.
+
+        :param channel: str. 'blockchain' or 'election'.
+        :param handler: coroutine function taking a message dict.
+        :return: None
+        """
+        async def open_channel():
+            self.queues[channel] = asyncio.Queue()
+            self.tasks[channel] = self.loop.create_task(self.handle(channel, handler))
+        self.call(open_channel()).result()
+
+    def deliverer(self, channel: str):
+        """
+        Returns the deliver callback for the transport of a channel. It only queues the message, so it never blocks the
+        transport.
+
+        :param channel: str. A registered channel.
+        :return: function taking a message dict.
+        """
+        put = self.queues[channel].put_nowait
+
+        def deliver(message: dict):
+            self.loop.call_soon_threadsafe(put, (time.perf_counter(), message))
+        return deliver
+
+    async def handle(self, channel: str, handler):
+        queue = self.queues[channel]
+        while True:
+            received, message = await queue.get()
+            try:
+                await handler(message)
+            except Exception as e:  # a bad message must not stop the channel
+                print('error handling {} message on node {}: {!r}'.format(channel, self.node_id, e))
+            self.handled[channel] += 1
+            self.latency[channel] += time.perf_counter() - received
+
+    async def run_blocking(self, function, *args):
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the core.
+
+        :return: dict. channel -> {'handled', 'mean_latency_ms', 'queued'}.
+        """
+        return {channel: {
+            'handled': self.handled[channel],
+            'mean_latency_ms': self.latency[channel] / self.handled[channel] * 1000 if self.handled[channel] else 0.0,
+            'queued': self.queues[channel].qsize()
+        } for channel in self.queues}
+
+    def close(self):
+        async def cancel():
+            for task in self.tasks.values():
+                task.cancel()
+        self.call(cancel()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    # Benchmark: election round trips between two nodes while blocks keep arriving, with a messaging thread setup per
+    # channel vs. one MessagingCore per node. Blocks take 2 ms of blocking work to process.
+    # usage: python MessagingCore.py [round trips] [transport]
+    import sys, threading
+    from queue import Queue
+    from Messenger import Messenger
+    from ElectionMessenger import Messenger as ElectionMessenger
+    from Transport import TRANSPORTS
+    round_trips = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    transport = sys.argv[2] if len(sys.argv) > 2 else 'tcp'
+
+    class Peer:
+        def __init__(self, core, replies):
+            self.core = core
+            self.replies = replies
+            self.election = None
+
+        def handle_incoming_message(self, message):
+            if message['type'] == 'Block':
+                time.sleep(0.002)
+            elif message['type'] == 'heartbeat':
+                self.election.send({'type': 'heartbeat_reply'}, message['sender'])
+            else:
+                self.replies.put(message)
+
+        async def handle_message(self, message):
+            if message['type'] == 'Block':
+                await self.core.run_blocking(self.handle_incoming_message, message)
+            else:
+                self.handle_incoming_message(message)
+
+    for pair, use_core in ((('0', '1'), False), (('2', '3'), True)):
+        replies = Queue()
+        nodes = []
+        threads = threading.active_count()
+        for node in pair:
+            core = MessagingCore(node) if use_core else None
+            peer = Peer(core, replies)
+            loop = core.loop if core else None
+            peer.blocks = Messenger(node, peer, transport=TRANSPORTS[transport]('blockchain', loop), core=core)
+            peer.election = ElectionMessenger(node, peer, transport=TRANSPORTS[transport]('election', loop), core=core)
+            nodes.append(peer)
+        threads = threading.active_count() - threads
+        start = time.perf_counter()
+        for i in range(round_trips):
+            if i % 10 == 0:
+                nodes[0].blocks.send({'type': 'Block', 'contents': bytes(2000)}, pair[1])
+            nodes[0].election.send({'type': 'heartbeat', 'sender': pair[0]}, pair[1])
+            replies.get()
+        elapsed = time.perf_counter() - start
+        print('{:15} threads for 2 nodes: {:>2}  election round trip {:.3f} ms'.format(
+            'messaging core' if use_core else 'thread per role', threads, elapsed / round_trips * 1000))
+        if use_core:
+            print('node {}:'.format(pair[1]), nodes[1].core.stats())
+            for peer in nodes:
+                peer.core.close()
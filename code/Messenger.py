@@ -1,143 +1,109 @@
-from time import sleep, clock
-from datetime import datetime
-from threading import Thread
-import boto3, botocore, random
-
-message_queue_URLs = {
-	'0': 'https://sqs.us-east-1.amazonaws.com/622058021374/0.fifo',
-	'1': 'https://sqs.us-east-1.amazonaws.com/622058021374/1.fifo',
-	'2': 'https://sqs.us-east-1.amazonaws.com/622058021374/2.fifo',
-	'3': 'https://sqs.us-east-1.amazonaws.com/622058021374/3.fifo',
-	}
+from threading import Event
+from Transport import get_transport
+
 
 class Messenger:
 	"""
-	This class is a generic message handler for the RAFT system, using hardcoded
-	SQS queues to communicate with other nodes. The nodes accessible using this
-	class are  '0', '1', '2', '3'
+	This class is a generic message handler for the RAFT system. Messages are carried
+	by a transport (see Transport.py): in-process queues, TCP or SQS queues, reaching
+	the nodes of the cluster (see Cluster.py).
 	This class requires the handle_incoming_message(message) interface
 
 	methods:
-		__init__(id, target) : constructor
-		start_incoming_message_thread() : starts a 'receive message' thread
-		listen_for_messages() : receive messages, pass to parent target
+		__init__(id, target, run, transport, core) : constructor, starts receiving messages
+		deliver(message: dict) : pass a received message to the parent target
+		handle(message: dict) : same, on the event loop of a MessagingCore
+		off() / on() : hold back / resume delivery of received messages
 
-		send(message: dict, destination: str) : <-must be formatted correctly for SQS
+		send(message: dict, destination: str) : values must be str or bytes
+		broadcast(message: dict, destinations) : send to several nodes concurrently
 	"""
+	channel = 'blockchain'
+	verbose = True
 
-	def __init__(self, id: str, target, run: bool=True):
+	def __init__(self, id: str, target, run: bool=True, transport='sqs', core=None):
 		"""
-		Messenger constructor. Takes id from list
-		'0', '1', '2', '3', '4', 'leader', 'client-blue', 'client-red'.
+		Messenger constructor. Takes the id of a node of the cluster, or of a client.
 		Constructor must be passed a reference to the class that is using it.
 		That class must implement handle_incoming_message(message: dict)
+		transport is 'inprocess', 'tcp', 'sqs' or a Transport object.
+		With a MessagingCore, messages are handled on the event loop of the core:
+		by awaiting target.handle_message(message) if the target has it, otherwise
+		by calling handle_incoming_message on a worker of the core.
 		"""
 		self.id = id #id of self in system
-		self.run = run
-		self.sqs = boto3.client('sqs') # make a new SQS object
-		self.incoming_queue_URL = message_queue_URLs[self.id] # store URL of queue for self
+		self.running = Event()
+		if run:
+			self.running.set()
 		self.target = target    # store class that is using this messenger
-
-		# start a thread to pull incoming messages from queue
-		self.incoming_message_thread = self.start_incoming_message_thread()
-		self.msg_count = 0
-		print('messenger initialized')
-
-	def start_incoming_message_thread(self):
-		"""this method threads @listen_for_messages()"""
-		t = Thread(
-			target=self.listen_for_messages,
-			name=('Incoming Message Thread'+self.id),
-			daemon=True #this thread should always be running
-			)
-		t.start()
-		return t
+		self.core = core
+		if core is None:
+			self.transport = get_transport(transport, self.channel)
+			# received messages are delivered on a single thread of the transport
+			self.transport.start(self.id, self.deliver)
+		else:
+			self.transport = get_transport(transport, self.channel, core.loop)
+			core.register(self.channel, self.handle)
+			self.transport.start(self.id, core.deliverer(self.channel))
+		if self.verbose:
+			print('messenger initialized')
+
+	@property
+	def run(self) -> bool:
+		return self.running.is_set()
 
 	def off(self):
-		self.run = False
+		self.running.clear()
 
 	def on(self):
-		self.run = True
-
-	def listen_for_messages(self):
-		''' loop that pulls messages from given SQS queue
+		self.running.set()
 
-		messages attributes are kept in dictionary form and represent the
-		message intended to be received. Messages are then passed to the
-		target class via the target.handle_incoming_message(message) interface
+	def deliver(self, message: dict):
 		'''
-		print('listening for messages')
-		while True:
-			while self.run:
-				# response stores results of receive call from SQS
-				response = self.sqs.receive_message(
-					QueueUrl=self.incoming_queue_URL,
-					MaxNumberOfMessages=1,
-					MessageAttributeNames=['All'],
-					WaitTimeSeconds=0
-				)
-
-				# check if a message was received. if no message, try again
-				if 'Messages' not in response:
-					continue
-				else:
-					message = response['Messages'][0]['MessageAttributes']
-
-				# this receipt handle is required to delete the  message from queue
-				receipt_handle = response['Messages'][0]['ReceiptHandle']
-				# delete the message after receiving
-				try:
-					self.sqs.delete_message(
-						QueueUrl=self.incoming_queue_URL,
-						ReceiptHandle=receipt_handle
-					)
-				except botocore.exceptions.ClientError:
-					print("Receipt Handle Expired")
-				# print('\n',self.id,' Received and deleted message : \n\"{}\"'.format(message))
-
-				# this calls on the holding class to handle the messages,
-
-				msg = self.reduce_message(message)
-
-				self.target.handle_incoming_message(msg)
-
-
-	def reduce_message(self, SQSmessage:dict) -> dict:
-		msg = {}
-		for key, value in SQSmessage.items():
-			msg[key] = value['StringValue']
-		return msg
-
-	def format_for_SQS(self, message:dict) -> dict:
-		SQSmsg = {}
-		for key, value in message.items():
-			SQSmsg[key] = {
-				'DataType': 'String',
-				'StringValue': value
-				}
-		return SQSmsg
+		passes a received message to the target class via the
+		target.handle_incoming_message(message) interface. While the messenger
+		is off, delivery waits and messages stay queued in the transport.
+		'''
+		self.running.wait()
+		self.target.handle_incoming_message(message)
+
+	async def handle(self, message: dict):
+		if not self.running.is_set():
+			await self.core.run_blocking(self.running.wait)
+		handle_message = getattr(self.target, 'handle_message', None)
+		if handle_message is None:
+			await self.core.run_blocking(self.target.handle_incoming_message, message)
+		else:
+			await handle_message(message)
 
 	def send(self, message: dict, destination: str):
 		'''
-		send a message to the given destination queue.
-		destination string should exist in the queue_suffixes list.
+		send a message to the given destination node. Returns a future
+		resolving to True once the transport handed the message over.
+		'''
+		future = self.transport.send(message, destination)
+		future.add_done_callback(self.report_failure(destination))
+		return future
+
+	def broadcast(self, message: dict, destinations):
+		'''
+		send a message to all destinations concurrently, the message is
+		encoded once. Returns destination -> future, pass it to
+		Transport.broadcast_results to wait for the outcome per destination.
 		'''
-		# used to uniquely identify messages:
-		self.msg_count += 1
-		# included to ensure all messages have a different non-duplication hash:
-		timestamp = str(datetime.now())
-
-		message_body = 'Message # {} from {}. {}'.format(self.msg_count, self.id, timestamp)
-		#print("message from {} to {}: ".format(self.id, destination), message)
-		SQSmsg = self.format_for_SQS(message)
-
-		# response stores confirmation data from SQS
-		response = self.sqs.send_message(
-			QueueUrl=message_queue_URLs[destination],
-			MessageAttributes=SQSmsg,
-			MessageGroupId='queue',
-			MessageBody=message_body
-		)
+		futures = self.transport.broadcast(message, destinations)
+		for destination, future in futures.items():
+			future.add_done_callback(self.report_failure(destination))
+		return futures
+
+	def report_failure(self, destination: str):
+		def done(future):
+			if future.exception() is not None:
+				print('{} message to {} failed: {!r}'.format(self.channel, destination, future.exception()))
+		return done
+
+	def close(self):
+		self.transport.close()
 
 
 if __name__ == '__main__':
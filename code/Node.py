@@ -1,86 +1,251 @@
+import time
+IMPORT_START = time.perf_counter()
 from Transaction import Transaction
 from Ledger import Ledger
 from BlockChain import BlockChain
 from LeaderElection import LeaderElection
 from Block import Block
+from BlockAssembler import BlockAssembler
+from Checkpoint import Checkpointer
+from Codec import get_codec, decode_message
+from Mempool import Mempool
 from Messenger import Messenger
-from threading import Thread
-from time import sleep
+from Cluster import Cluster
+from MessagingCore import MessagingCore
+from TermScheduler import TermScheduler
+from SignatureVerifier import SignatureVerifier
+from VerificationPool import VerificationPool
+from Signer import signature_key, split_signature
+from threading import Thread, Event, Lock
 from datetime import datetime
-from dateutil import parser as date_parser
-import json, copy, collections, random, math, sys, cryptography
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import serialization, hashes
+import argparse, collections, random, signal
+IMPORT_TIME = time.perf_counter() - IMPORT_START
+# Modules only some modes use are imported where they are used: KeyStore with fast_start, key generation without it,
+# Gossip with gossip, PEM encoding for the key exchange, worker processes with verify_processes (see VerificationPool)
+# and boto3 with the SQS transport (see Transport.SqsTransport.shared_client).
 
 # Note: all code pertaining to RSA keys and signatures was adapted from cryptography.io:
 # https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/
 
 class Node:
-
-    def __init__(self, node_id: str):
+    GOSSIP_INTERVAL = 1.0  # seconds between push-pull rounds
+    TERM_REPORT_INTERVAL = 10  # terms between term scheduler reports
+    CAMPAIGN_STAGGER = 2.0  # most seconds a node waits before requesting leadership, at most a tenth of a term
+    ELECTION_TIMEOUT = 5.0  # seconds a node waits for the outcome of its election
+
+    def __init__(self, node_id: str, codec: str = 'binary', mempool_capacity: int = Mempool.DEFAULT_CAPACITY,
+                 max_block_transactions: int = BlockAssembler.DEFAULT_MAX_TRANSACTIONS,
+                 max_block_bytes: int = BlockAssembler.DEFAULT_MAX_BYTES, priority='age', verify_workers: int = None,
+                 verify_processes: bool = False, signature_scheme: str = 'ed25519', fast_start: bool = False,
+                 transport='sqs', gossip: str = None, gossip_fanout: int = None, validate_chain: bool = False,
+                 cluster: Cluster = None, term_duration: float = 25):
         """
         Constructor for the Node class.
         Synchronizes nodes.
         Starts messaging and mining threads.
         Creates files to store data.
 
-        :param str node_id: one of '0', '1', '2', or '3', the possible nodes in network
+        :param str node_id: id of this node, a member of cluster
+        :param str codec: codec used to encode outgoing messages, 'binary' or 'json'. Incoming messages are decoded
+        with the codec named in the message.
+        :param int mempool_capacity: maximum number of pending transactions, the oldest are evicted beyond it.
+        :param int max_block_transactions: maximum number of transactions in a mined block.
+        :param int max_block_bytes: maximum size in bytes of the encoded transactions of a mined block.
+        :param priority: order in which pending transactions are mined, 'age', 'amount', 'fee' or a key function.
+        :param int verify_workers: size of the signature verification pool, defaults to the number of CPUs.
+        :param bool verify_processes: verify signatures on worker processes instead of threads.
+        :param str signature_scheme: scheme this node signs blocks with, 'ed25519' or 'rsa-pss'. Nodes using different
+        schemes can verify each other's signatures.
+        :param bool fast_start: reuse the key pair, the peer public keys and the genesis time stored in '../files' by an
+        earlier run instead of generating a key pair and waiting for the key exchange and the genesis sync. The private
+        key is stored unencrypted (PKCS8, readable by the owner only, see KeyStore), so it is off unless asked for.
+        :param transport: transport between the nodes, 'inprocess', 'tcp' or 'sqs' (see Transport.py). Used for block
+        and election messages alike, both are handled on the event loop of one MessagingCore.
+        :param str gossip: disseminate blocks and transactions by gossip instead of sending them to every peer, 'push'
+        or 'push-pull' (see Gossip.py). None sends directly.
+        :param int gossip_fanout: number of peers every node relays a gossiped message to, defaults to
+        Gossip.DEFAULT_FANOUT.
+        :param bool validate_chain: re-validate every block of the chain on disk on a process pool before the ledger is
+        restored (see Checkpoint.validate_chain).
+        :param Cluster cluster: members of the network and their endpoints, defaults to the nodes '0' to '3'. Peers,
+        genesis sync, genesis balances, rewards and the election quorum are derived from it.
+        :param float term_duration: seconds per term, at most one block is mined per term. All nodes must agree on it.
         """
+        self.startup_times = collections.OrderedDict([('imports', IMPORT_TIME)])
+        self.startup_mark = time.perf_counter()
         self.node_id = node_id
+        self.cluster = cluster or Cluster.of_size(Cluster.DEFAULT_SIZE)
+        if node_id not in self.cluster:
+            raise ValueError('node {} is not a member of the cluster'.format(node_id))
+        self.codec = get_codec(codec)
         self.file_path = '../files/blockchain' + node_id + '.txt'
-        self.ledger = Ledger(node_id)
-        self.blockchain = BlockChain(self.node_id, self.ledger)
+        self.ledger = Ledger(node_id, self.cluster.initial_balances())
+        # the newest-first view of the chain is rendered on request (SIGUSR1), on a background thread
+        self.blockchain = BlockChain(self.node_id, self.ledger, background_render=True)
+        self.checkpointer = Checkpointer(self.node_id)
+        self.checkpointer.restore(self.blockchain, self.ledger, validate=validate_chain)
+        self.mark_startup('ledger and chain load')
         self.probability = 0.1
-        self.term_duration = 25
-        self.le = LeaderElection(self.node_id)
-        self.leader_counts = {'0': 0, '1': 0, '2': 0, '3': 0}
+        self.term_duration = term_duration
+        self.core = MessagingCore(self.node_id)
+        self.le = LeaderElection(self.node_id, transport, self.core, self.cluster)
+        self.mark_startup('leader election start')
+        self.leader_counts = {node: 0 for node in self.cluster.nodes}
         # self.elected_boolean = False
 
-        self.peers = [peer for peer in ['0', '1', '2', '3'] if peer != self.node_id]
-        self.transaction_queue = []
+        self.peers = self.cluster.peers_of(self.node_id)
+        self.mempool = Mempool(mempool_capacity)
+        self.assembler = BlockAssembler(max_block_transactions, max_block_bytes, priority, self.codec)
 
         self.received_blocks = collections.deque()
         self.secret_message = b'SECRET TUNNEL!'
         self.nodes_online = []
 
         self.all_public_keys = {}
-        self.private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
-        self.sig = self.private_key.sign(
-            self.secret_message,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        ).hex()
-        self.peer_signatures = {}
-        self.all_public_keys[self.node_id] = self.private_key.public_key()
-        self.messenger = Messenger(self.node_id, self)
-        self.sync_nodes()
+        if fast_start:
+            from KeyStore import KeyStore
+            self.key_store = KeyStore(node_id)
+            self.signer = self.key_store.load_or_create(signature_scheme)
+        else:
+            from Signer import get_signer
+            self.key_store = None
+            self.signer = get_signer(signature_scheme).generate()
+        self.private_key = self.signer.private_key
+        # signature of the static message, announced with the public key to identify this node
+        self.sig = self.signer.sign(self.secret_message)
+        self.all_public_keys[self.node_id] = self.signer.public_key
+        self.verifier = SignatureVerifier()
+        self.verifier.register(self.node_id, self.all_public_keys[self.node_id])
+        self.peers_ready = Event()  # set once the public keys of all peers are known
+        if fast_start:
+            for peer, (public_key, sig) in self.key_store.load_peers().items():
+                self.register_peer(peer, public_key, sig)
+        self.mark_startup('key load')
+        self.verification_pool = VerificationPool(self.verifier, verify_workers, verify_processes)
         self.genesis_time = 'not set'
+        self.genesis_ready = Event()  # set once all nodes are online and the genesis time is known
+        self.sync_lock = Lock()  # sync messages are handled on the event loop while the constructor syncs
+        if fast_start and self.key_store.load_genesis() is not None:
+            self.set_genesis(self.key_store.load_genesis())
         self.term = 0
+        self.term_scheduler = TermScheduler(self.term_duration, 'Mining Thread ' + self.node_id)
+        self.term_scheduler.register(self.start_term)
+        self.term_scheduler.register(self.report_terms)
+        self.gossip = None
+        if gossip:
+            from Gossip import Gossip
+            self.gossip = Gossip(self.node_id, self.peers, None, gossip_fanout or Gossip.DEFAULT_FANOUT, gossip)
+        # with gossip, messages are held until the gossip can relay them through the messenger
+        self.messenger = Messenger(self.node_id, self, run=self.gossip is None, core=self.core,
+                                   transport=self.cluster.transport(transport, Messenger.channel, self.core.loop))
+        if self.gossip is not None:
+            self.gossip.messenger = self.messenger
+            self.messenger.on()
+            if self.gossip.mode == 'push-pull':
+                self.core.loop.call_soon_threadsafe(self.gossip_round)
+        self.sync_nodes()
+        self.mark_startup('messenger start and sync request')
+
+    def mark_startup(self, step: str):
+        """
+        Records how long a startup step took since the previous one.
+
+        :param step: str. Name of the step that just finished.
+        :return: None
+        """
+        now = time.perf_counter()
+        self.startup_times[step] = now - self.startup_mark
+        self.startup_mark = now
+
+    def startup_report(self) -> str:
+        """
+        Returns the startup timing breakdown recorded by mark_startup.
+
+        :return: str.
+        """
+        lines = ['{:<35}{:>8.3f}s'.format(step, seconds) for step, seconds in self.startup_times.items()]
+        lines.append('{:<35}{:>8.3f}s'.format('total', sum(self.startup_times.values())))
+        return 'Node ' + self.node_id + ' startup:\n' + '\n'.join(lines)
+
+    def register_peer(self, peer: str, public_key, sig: str):
+        """
+        Adds the public key of a node, received in a key message or loaded from the key store.
+
+        :param peer: str. Id of the node.
+        :param public_key: RSAPublicKey or Ed25519PublicKey.
+        :param sig: str. Signature of the static message the node announced with its key. It only identifies the key
+        message, blocks must carry signatures of their own header (see sign_block).
+        :return: None
+        """
+        self.all_public_keys[peer] = public_key
+        self.verifier.register(peer, public_key)
+        if len(self.all_public_keys) > len(self.peers):
+            self.peers_ready.set()
 
     def sync_nodes(self):
         """
         Method to synchronize all nodes for receiving and sending messages over the queue.
         Blockchain cannot start until all nodes are live and have generated their private/public key pairs.
+        A node that already knows the genesis time, e.g. from its key store, announces it instead of its start time.
         """
         start_time = datetime.now()
-        self.nodes_online.append(start_time)
-        self.send_blockchain_msg(type='sync', contents={'start_time': str(start_time)})
+        self.node_online(start_time)
+        self.send_blockchain_msg(type='sync', contents=self.sync_contents(start_time))
 
-        public_key_string = self.all_public_keys[self.node_id].public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ).decode("utf-8")
+        from Signer import public_pem
+        public_key_string = public_pem(self.all_public_keys[self.node_id]).decode("utf-8")
         self.send_blockchain_msg(type='key',
                                  contents={'key': public_key_string, 'sender': self.node_id, 'signature': self.sig})
 
+    def sync_contents(self, start_time: datetime = None) -> dict:
+        """
+        Returns the contents of a sync message: the sender, its start time if given and the genesis time if known.
+
+        :param start_time: datetime. Time this node came online.
+        :return: dict.
+        """
+        contents = {'sender': self.node_id}
+        if start_time is not None:
+            contents['start_time'] = str(start_time)
+        if self.genesis_time != 'not set':
+            contents['genesis_time'] = str(self.genesis_time)
+        return contents
+
+    def node_online(self, start_time: datetime = None, genesis_time: datetime = None) -> bool:
+        """
+        Records that a node came online, this one included, with its start time, or with the genesis time if it knows
+        it already. The genesis is the latest start time once every node of the cluster is online, or the first genesis
+        time announced, and it never changes once set.
+
+        :param start_time: datetime. Time the node came online.
+        :param genesis_time: datetime. Genesis time the node announced.
+        :return: bool. False if the genesis time was set before.
+        """
+        with self.sync_lock:
+            if self.genesis_time != 'not set':
+                return False
+            if genesis_time is None:
+                self.nodes_online.append(start_time)
+                if len(self.nodes_online) < len(self.cluster):
+                    return True
+                genesis_time = max(self.nodes_online)
+            self.set_genesis(genesis_time)
+            return True
+
+    def set_genesis(self, genesis_time: datetime):
+        """
+        Sets the genesis time the terms are counted from and lets the mining thread start. It is stored with the keys,
+        so a warm restart counts from the same genesis as the nodes that kept running.
+
+        :param genesis_time: datetime. Start of term 1.
+        :return: None
+        """
+        self.genesis_time = genesis_time
+        print('genesis time = ', self.genesis_time)
+        if self.key_store is not None:
+            self.key_store.save_genesis(genesis_time)
+        self.genesis_ready.set()
+
     def start_mining_thread(self) -> Thread:
         """
         Starts the thread that continually mines new blocks to add to the chain.
@@ -97,21 +262,27 @@ class Node:
 
     def mining_thread(self):
         """
-        Waits to start mining until all nodes are initialized.
-        Calculates current term based on genesis time and timestamp.
-        Starts mining a block every time a new term begins (e.g. every 20 or 25 seconds)
+        Waits to start mining until all nodes are initialized, then mines a block every time a new term begins (e.g.
+        every 20 or 25 seconds). Terms are counted from the genesis time on a monotonic clock, and the thread sleeps
+        between them (see TermScheduler).
         :return:
         """
-        while True:
-            if self.genesis_time != 'not set':
-                term = self.term
-                time_diff = datetime.now() - self.genesis_time
-                time_diff = time_diff.seconds
-                new_term = math.ceil(time_diff / self.term_duration)
-                if new_term > term:
-                    # reset all flags
-                    self.term = new_term
-                    self.mine_block()
+        self.genesis_ready.wait()
+        self.term_scheduler.run(self.genesis_time)
+
+    def start_term(self, term: int):
+        """
+        Called by the term scheduler at the start of every term.
+
+        :param term: int. The term that started.
+        :return: None
+        """
+        self.term = term
+        self.mine_block()
+
+    def report_terms(self, term: int):
+        if term % self.TERM_REPORT_INTERVAL == 0:
+            print('terms on node', self.node_id, self.term_scheduler.stats())
 
     def mine_block(self):
         """
@@ -120,32 +291,56 @@ class Node:
         Generates a block with a certain probability, if a block was generated, the node requests leadership.
         Leadership is granted through the RAFT algorithm, which has been slightly adjusted to suit this purpose.
         Whichever node was elected sends generated block to all other nodes for verification and signing.
+
+        Runs on the mining thread, while election messages are handled on the loop of the core: leadership is requested
+        and released on the loop (see LeaderElection.campaign), and the thread only waits for the outcome, so the term
+        scheduler is held up for the election rather than a fixed time.
         """
-        sleep(random.random() * 2)
         mined_probability = random.random()
 
-        if mined_probability > self.probability and len(self.transaction_queue) != 0:
-            tx_to_mine = self.transaction_queue
+        if mined_probability > self.probability and len(self.mempool) != 0:
             new_index = self.blockchain.get_last_block().index + 1
-            verify_boolean, change_or_bad_tx = self.ledger.verify_transaction(tx_to_mine, new_index)
-            while not verify_boolean:
-                self.transaction_queue = [tx for tx in self.transaction_queue if tx.unique_id not in change_or_bad_tx]
-                verify_boolean, change_or_bad_tx = self.ledger.verify_transaction(tx_to_mine, new_index)
-            new_block = Block(index=new_index, transactions=tx_to_mine)
+            # only a bounded, prioritized part of the mempool goes into the block, the rest waits for the next term.
+            # Selection checks every transaction against the balances changed by the ones admitted before it, so the
+            # block is valid once built. Only transactions the sender cannot afford on the tip are dropped, those
+            # overdrawing after others of this block wait for a later one.
+            tx_to_mine, bad_tx = self.assembler.select(self.mempool.snapshot(),
+                                                       self.ledger.blockchain_balances[new_index - 1])
+            if bad_tx:
+                print('Bad transactions were found: ', bad_tx)
+                self.mempool.remove_all(bad_tx)
+            new_block = Block(index=new_index, transactions=tx_to_mine,
+                              prev_hash=self.blockchain.get_last_block().header_hash())
             to_node = self.peers[random.randrange(len(self.peers))]
 
-            self.le.request_leadership()
-            sleep(5)
-            if self.le.election_state != 'leader':
+            stagger = min(self.CAMPAIGN_STAGGER, self.term_duration / 10)
+            if not self.le.campaign(random.random() * stagger, self.ELECTION_TIMEOUT):
                 return
-            sleep(.5)
             print('I have been elected as leader.')
             self.send_peer_msg(type='Block',
-                               contents={'block': str(new_block), 'leader_id': self.node_id, 'term': self.term,
-                                         'history': json.dumps([self.node_id])}, peer=to_node)
+                               contents={'block': new_block, 'leader_id': self.node_id, 'term': self.term,
+                                         'history': [self.node_id]}, peer=to_node)
             print(self.node_id, " has mined and sent a block to ", to_node)
 
-            self.le.release_leadership()
+            self.le.call(self.le.release_leadership).result()
+
+    async def handle_message(self, msg: dict):
+        """
+        Handles an incoming message on the event loop of the MessagingCore. Blocks (signature checks, disk writes) and
+        keys (disk writes) are handled on a worker of the core, the other messages on the loop directly. Gossiped
+        messages are relayed first and only handled the first time they arrive.
+
+        :param msg: dict. Message attributes represented as string key value pairs.
+        :return: None
+        """
+        if self.gossip is not None and self.gossip.handles(msg):
+            msg = self.gossip.receive(msg)
+            if msg is None:
+                return
+        if msg['type'] in ('Block', 'key'):
+            await self.core.run_blocking(self.handle_incoming_message, msg)
+        else:
+            self.handle_incoming_message(msg)
 
     def handle_incoming_message(self, msg: dict):
         """
@@ -156,46 +351,42 @@ class Node:
         :return: None
         """
 
-        if msg['type'] == 'Transaction':  # if transaction append to tx queue
-            contents = msg['contents']
-            self.transaction_queue.append(Transaction(contents))
+        if msg['type'] == 'Transaction':  # if transaction add to mempool, duplicates are ignored
+            self.mempool.add(decode_message(msg))
 
         elif msg['type'] == 'Block' and self.genesis_time != 'not set':  # if block process and reset mine function if valid
-            msg_dict = json.loads(msg['contents'])
-            incoming_block = Block(msg_dict['block'])
+            msg_dict = decode_message(msg)
+            incoming_block = msg_dict['block']
             leader_id = msg_dict['leader_id']
-            block_term = int(msg_dict['term'])
-            block_history = json.loads(msg_dict['history'])
+            block_term = msg_dict['term']
+            block_history = msg_dict['history']
             # print("\nIncoming Block received: \n", incoming_block, block_term, leader_id, '\n incoming term : ', block_term)
             self.process_incoming_block(block=incoming_block, term=block_term, leader_id=leader_id,
                                         block_history=block_history)
 
         elif msg['type'] == 'sync':
-            msg_dict = json.loads(msg['contents'])
-            start_time = date_parser.parse(msg_dict['start_time'])
-            self.nodes_online.append(start_time)
-            if len(self.nodes_online) > 3:
-                # print("synched!")
-                self.genesis_time = max(self.nodes_online)
-                print('genesis time = ', self.genesis_time)
+            msg_dict = decode_message(msg)
+            if 'genesis_time' in msg_dict:
+                self.node_online(genesis_time=datetime.fromisoformat(msg_dict['genesis_time']))
+            elif not self.node_online(datetime.fromisoformat(msg_dict['start_time'])) and 'sender' in msg_dict:
+                # a node (re)started after the genesis was set is told the genesis instead of moving it
+                self.send_peer_msg(self.sync_contents(), 'sync', msg_dict['sender'])
 
         elif msg['type'] == 'key':
-            msg_dict = json.loads(msg['contents'])
+            msg_dict = decode_message(msg)
             sender = msg_dict['sender']
             sig = msg_dict['signature']
             key_string = msg_dict['key'].encode("utf-8")
 
-            incoming_public_key = serialization.load_pem_public_key(
-                key_string,
-                backend=default_backend()
-            )
-            self.all_public_keys[sender] = incoming_public_key
-            self.peer_signatures[sig] = sender
+            from Signer import load_public_key
+            self.register_peer(sender, load_public_key(key_string), sig)
+            if self.key_store is not None:
+                self.key_store.save_peer(sender, msg_dict['key'], sig)
 
     def add_to_blockchain(self, block, leader_id):
         """
         Method to add a block to the blockchain after it has been verified.
-        Deletes block transactions from transaction queue to avoid double transactions.
+        Deletes block transactions from the mempool to avoid double transactions.
         Keeps track of whichever node generated a block to determine whether generation rate exceeds probability.
 
         :param block: The block to be added, contains transactions to be removed
@@ -204,46 +395,63 @@ class Node:
         """
         self.blockchain.add_block(block)
         self.ledger.add_transactions(block.transactions, block.index)
+        self.checkpointer.maybe_save(self.blockchain, self.ledger)
         if self.node_id == leader_id:
             print("leader ", self.node_id, "added block to blockchain")
         else:
             print("follower ", self.node_id, "added block to blockchain")
         self.leader_counts[leader_id] += 1
-        # if the block is valid, then we need to remove all transactions from our own tx queue
-        delete_transactions = copy.deepcopy(block.transactions)
-        self.transaction_queue = [x for x in self.transaction_queue if x not in delete_transactions]
+        # if the block is valid, then we need to remove all transactions from our own mempool
+        self.mempool.remove_committed(block)
+
+    def sign_block(self, block: Block) -> str:
+        """
+        Signs the header digest of a block, so the signature is only valid for this block.
+
+        :param block: Block. Block to sign.
+        :return: str. Key to store the signature under in Block.signatures, naming this node as the signer.
+        """
+        return signature_key(self.node_id, self.signer.sign(bytes.fromhex(block.header_hash())))
+
+    def has_signed(self, block: Block) -> bool:
+        """
+        Checks whether this node already signed a block.
+
+        :param block: Block.
+        :return: bool.
+        """
+        return any(split_signature(sig)[0] == self.node_id for sig in block.signatures)
 
     def verify_all_signatures(self, block: Block) -> bool:
         """
-        Verifies encoded signatures by using a secret message.
-        This ensures the message came from one of the known, i.e., trustworthy nodes, by decoding using saved public keys.
+        Verifies the signatures of a block against the header digest it was signed over.
+        This ensures the message came from one of the known, i.e., trustworthy nodes. Every signature is checked only
+        against the public key of the node that registered it, and signatures verified before are served from a cache.
 
-        :param block:
-        :return:
+        :param block: Block. Block whose signatures are checked.
+        :return: bool. True if every signature is valid.
         """
-        signatures = block.signatures
-        valid_sig_count = 0
-        for sig in signatures.keys():
-            for public_key in self.all_public_keys.values():
-                # print('what is this key: ', type(public_key), public_key)
-                try:
-                    public_key.verify(
-                        bytes.fromhex(sig),
-                        self.secret_message,
-                        padding.PSS(
-                            mgf=padding.MGF1(hashes.SHA256()),
-                            salt_length=padding.PSS.MAX_LENGTH
-                        ),
-                        hashes.SHA256()
-                    )
-                    valid_sig_count += 1
-                    print("signature validated!")
-                except cryptography.exceptions.InvalidSignature:
-                    pass
-        if len(signatures) == valid_sig_count:
-            return True
-        else:
-            return False
+        return self.verify_all_signatures_async(block).result()
+
+    def verify_all_signatures_async(self, block: Block):
+        """
+        Fans the signature checks of a block out to the verification pool without waiting for them.
+
+        :param block: Block. Block whose signatures are checked.
+        :return: Future. Resolves to True if every signature is valid.
+        """
+        return self.verification_pool.submit_block(block)
+
+    def verify_chain_signatures(self, start: int = 1, stop: int = None) -> list:
+        """
+        Checks the signatures of a range of blocks already in the chain on the verification pool.
+
+        :param start: int. Index of the first block, the genesis block carries no signatures.
+        :param stop: int. Index after the last block, defaults to the end of the chain.
+        :return: list. Indices of the blocks with an invalid signature.
+        """
+        results = self.verification_pool.verify_blocks(self.blockchain.iter_blocks(start, stop))
+        return [index for index, valid in results if not valid]
 
     def process_incoming_block(self, block: Block, term: int, leader_id: str, block_history: list):
         """
@@ -256,86 +464,130 @@ class Node:
         :param block_history: List of nodes that have signed the block
         :return: None
         """
-        # process block returns true if it is valid and added to blockchain and ledger
-        if term == self.term and block.index == self.blockchain.get_last_block().index + 1:  # and self.verify_all_signatures(block):
-            # if node is a follower
-            if self.node_id != leader_id:
-                # Check if there is enough stake
-                if block.verify_proof_of_stake():
-                    self.add_to_blockchain(block, leader_id)
-
-                else:
-                    # verify transactions through ledger
-                    valid_boolean, change_or_bad_tx = self.ledger.verify_transaction(block.transactions, block.index)
-                    # Check node that sent the block does not exceed generation rate. Otherwise, no block is added.
-                    # This prevents a node from sending too many blocks (i.e., taking control of the chain).
-                    if (self.leader_counts[leader_id] / self.term) < self.probability:
-                        if valid_boolean and self.sig not in block.signatures.keys():
-                            print('Signing block with stake: ', sum([tx.amount for tx in block.transactions]) / 2 + .1)
-                            block.signatures[self.sig] = sum([tx.amount for tx in block.transactions]) / 2 + .1
-                            block_history.append(self.node_id)
-                            contents = {'block': str(block), 'leader_id': leader_id, 'term': str(term),
-                                        'history': json.dumps(block_history)}
-
-                            if block.verify_proof_of_stake():
-                                self.send_peer_msg(type='Block', contents=contents, peer=leader_id)
-                            else:
-                                options = [peer for peer in self.peers if peer not in block_history]
-                                to_node = options[random.randrange(len(options))]
-                                self.send_peer_msg(type='Block', contents=contents, peer=to_node)
-            # Node is leader
+        # process block returns true if it is valid and added to blockchain and ledger. Runs on a worker of the core, so
+        # waiting for the signature checks does not hold up the loop; a block with a forged or unknown signature is
+        # dropped before its stake is counted or this node signs it.
+        if term != self.term or not self.blockchain.extends_tip(block):
+            return
+        if not self.verify_all_signatures(block):
+            print('Rejected block', block.index, 'from', leader_id, 'with an invalid signature')
+            return
+        # if node is a follower
+        if self.node_id != leader_id:
+            # Check if there is enough stake
+            if block.verify_proof_of_stake():
+                self.add_to_blockchain(block, leader_id)
+
             else:
-                # Check if there is enough stake
-                if block.verify_proof_of_stake():
-                    self.add_to_blockchain(block, leader_id)
-                    rewardees = [self.peer_signatures[sig] for sig in block.signatures.keys()]
-                    rewardees.append(self.node_id)
-                    print('Reward these hard working folx: ', rewardees)
-                    for peer in rewardees:
-                        reward_tx = str(Transaction(_to=peer, _from='reward', amount=1))
-                        for destination in ['0', '1', '2', '3']:
-                            self.messenger.send({'type': 'Transaction', 'contents': reward_tx}, destination)
-
-                # if stake was sufficient, block will be complete, otherwise block will go get more signatures
-                else:
-                    print("leader ", self.node_id, "needs more signatures")
-                self.send_blockchain_msg(type='Block',
-                                         contents={'block': str(block), 'leader_id': leader_id, 'term': term,
-                                                   'history': json.dumps(block_history)})
+                # verify transactions through ledger
+                valid_boolean, change_or_bad_tx = self.ledger.verify_transaction(block.transactions, block.index)
+                # Check node that sent the block does not exceed generation rate. Otherwise, no block is added.
+                # This prevents a node from sending too many blocks (i.e., taking control of the chain).
+                if (self.leader_counts[leader_id] / self.term) < self.probability:
+                    if valid_boolean and not self.has_signed(block):
+                        stake = sum([tx.amount for tx in block.transactions]) / 2 + .1
+                        print('Signing block with stake: ', stake)
+                        block.add_signature(self.sign_block(block), stake)
+                        block_history.append(self.node_id)
+                        contents = {'block': block, 'leader_id': leader_id, 'term': term,
+                                    'history': block_history}
+
+                        if block.verify_proof_of_stake():
+                            self.send_peer_msg(type='Block', contents=contents, peer=leader_id)
+                        else:
+                            options = [peer for peer in self.peers if peer not in block_history]
+                            to_node = options[random.randrange(len(options))]
+                            self.send_peer_msg(type='Block', contents=contents, peer=to_node)
+        # Node is leader
+        else:
+            # Check if there is enough stake
+            if block.verify_proof_of_stake():
+                self.add_to_blockchain(block, leader_id)
+                rewardees = [split_signature(sig)[0] for sig in block.signatures.keys()]
+                rewardees.append(self.node_id)
+                print('Reward these hard working folx: ', rewardees)
+                for peer in rewardees:
+                    reward_msg = self.codec.encode_message('Transaction', Transaction(_to=peer, _from='reward',
+                                                                                      amount=1))
+                    if self.gossip is not None:
+                        self.gossip.broadcast(reward_msg)
+                        self.handle_incoming_message(reward_msg)
+                    else:
+                        self.messenger.broadcast(reward_msg, self.cluster.nodes)
+
+            # if stake was sufficient, block will be complete, otherwise block will go get more signatures
+            else:
+                print("leader ", self.node_id, "needs more signatures")
+            self.send_blockchain_msg(type='Block',
+                                     contents={'block': block, 'leader_id': leader_id, 'term': term,
+                                               'history': block_history})
 
     def send_blockchain_msg(self, contents: dict, type: str):
         """
         sends msgs to all peers
 
-        :param contents: str. Newly mined blocks or new transactions in JSON string representation.
+        :param contents: dict. Newly mined blocks or new transactions, encoded with the node's codec.
         :param type: str. indicates type of msg. 'Block' or 'Transaction'
+        :return: dict. peer -> Future of the send, see Messenger.broadcast
+        """
+        # send block to all known peers at once, or to the first peers of the gossip
+        msg_dict = self.codec.encode_message(type, contents)
+        if self.gossip is not None:
+            return self.gossip.broadcast(msg_dict)
+        return self.messenger.broadcast(msg_dict, self.peers)
+
+    def gossip_round(self):
+        """
+        Runs a push-pull round of the gossip and schedules the next one, on the event loop of the MessagingCore.
+
         :return: None
         """
-        # send block to all known peers
-        msg_dict = {'contents': json.dumps(contents), 'type': type}
-        for peer in self.peers:
-            self.messenger.send(msg_dict, peer)
+        self.gossip.pull_round()
+        self.core.loop.call_later(self.GOSSIP_INTERVAL, self.gossip_round)
 
     def send_peer_msg(self, contents: dict, type: str, peer: str):
         """
         sends msgs to specific peer
 
-        :param contents: str. ANYTHING YOU DAMN PLEASE
+        :param contents: dict. ANYTHING YOU DAMN PLEASE, encoded with the node's codec.
         :param type: str. indicates type of msg. 'Block' or 'Transaction'
         :param peer: str. destination
         :return: None
         """
-        msg_dict = {'contents': json.dumps(contents), 'type': type}
+        msg_dict = self.codec.encode_message(type, contents)
         self.messenger.send(msg_dict, peer)
 
 
 if __name__ == '__main__':
-    arg = sys.argv[1]
-    n = Node(arg)
+    # usage: python Node.py <node id> [transport] [--cluster cluster.json | --nodes N] [--gossip push|push-pull]
+    #                       [--fast-start] [--validate-chain]
+    # kill -USR1 <pid> renders the chain newest first to ../files/blockchain<node id>_newest_first.txt
+    parser = argparse.ArgumentParser(description='Runs a node of the blockchain.')
+    parser.add_argument('node_id')
+    parser.add_argument('transport', nargs='?', default='sqs', choices=['sqs', 'tcp', 'inprocess'])
+    parser.add_argument('--cluster', help='cluster file listing the members and their endpoints, see Cluster.py')
+    parser.add_argument('--nodes', type=int, help="cluster of the nodes '0' to str(NODES - 1), default 4")
+    parser.add_argument('--gossip', choices=('push', 'push-pull'),
+                        help='disseminate blocks and transactions by gossip, see Gossip.MODES')
+    parser.add_argument('--fast-start', action='store_true',
+                        help="keep the key pair (unencrypted) and the peer keys in ../files to restart without a key "
+                             "exchange")
+    parser.add_argument('--validate-chain', action='store_true',
+                        help='re-validate every block of the chain on disk in parallel before restoring the ledger')
+    args = parser.parse_args()
+    n = Node(args.node_id, transport=args.transport, gossip=args.gossip, fast_start=args.fast_start,
+             validate_chain=args.validate_chain, cluster=Cluster.from_args(args.cluster, args.nodes))
 
     print('constructors finished')
-
-    while len(n.all_public_keys) < 4:
-        continue
-    sleep(1)
-    n.start_mining_thread()
+    if hasattr(signal, 'SIGUSR1'):  # kill -USR1 <pid> writes the newest-first view of the chain
+        signal.signal(signal.SIGUSR1, lambda signum, frame: n.blockchain.request_render())
+
+    # wait for the key exchange without spinning, a warm restart already knows every peer's key
+    n.peers_ready.wait()
+    n.mark_startup('peer sync')
+    mining = n.start_mining_thread()
+    n.mark_startup('mining thread started')
+    print(n.startup_report())
+    # stay in the main thread: once it returns, interpreter shutdown stops the worker pool of the MessagingCore and
+    # blocks and keys could no longer be handled
+    mining.join()
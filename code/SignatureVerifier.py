@@ -0,0 +1,204 @@
+from Signer import verify as verify_signature, split_signature
+from threading import Lock
+import collections, hashlib
+
+
+class SignatureVerifier:
+    """
+    Verifies block signatures against the public keys of known nodes. Every signature is stored as 'node_id:hex' over
+    the header digest of its block (see Signer.py), so it is checked against the key of that one node instead of all
+    of them; signatures without a signer id are rejected. Signatures that verified once are remembered in a bounded LRU
+    cache keyed by (signer, digest of message and signature). A block seen again on a later hop of signature collection
+    costs one dictionary lookup per signature.
+
+    Attributes
+    ----------
+    public_keys : dict
+        node id -> public key of that node.
+    cache_size : int
+        maximum number of verified signatures remembered.
+    verifications, cache_hits, cache_misses, unknown_signers, failures : int
+        counters, see stats().
+
+    Methods
+    ----------
+    register(node_id: str, public_key)
+        Adds the public key of a node.
+    verify(signature: str, message: bytes)
+        Checks one signature against the key of its signer.
+    resolve(signature: str, message: bytes), check(public_key, message: bytes, signature: str), remember(key, valid)
+        The steps of verify, for callers that run the check elsewhere, e.g. on a VerificationPool.
+    verify_block(block: Block)
+        Checks every signature of a block.
+    stats()
+        Returns the counters as a dict.
+    """
+    DEFAULT_CACHE_SIZE = 4096
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Constructor for a SignatureVerifier.
+
+        :param cache_size: int. Maximum number of verified signatures remembered.
+        """
+        self.public_keys = {}
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()  # (signer, digest) -> True, least recently used first
+        self.lock = Lock()
+        self.verifications = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.unknown_signers = 0
+        self.failures = 0
+        self.last_block_verifications = 0
+
+    def register(self, node_id: str, public_key):
+        """
+        Adds the public key of a node.
+
+        :param node_id: str. Id of the node.
+        :param public_key: RSAPublicKey or Ed25519PublicKey. Public key of the node.
+        :return: None
+        """
+        with self.lock:
+            self.public_keys[node_id] = public_key
+
+    @staticmethod
+    def digest(message: bytes, signature: str) -> str:
+        return hashlib.sha256(message + bytes.fromhex(signature)).hexdigest()
+
+    def resolve(self, signature: str, message: bytes):
+        """
+        Looks a signature up without verifying it.
+
+        :param signature: str. Key of Block.signatures, 'node_id:hex'.
+        :param message: bytes. Signed message, the header digest of the block.
+        :return: None if the signature names no signer or an unknown one, True if the signature verified before,
+        otherwise (public key, cache key, message, hex signature) to verify it with.
+        """
+        signer, signature = split_signature(signature)
+        try:
+            key = (signer, self.digest(message, signature))
+        except ValueError:  # not a hex signature
+            key = None
+        with self.lock:
+            public_key = self.public_keys.get(signer)
+            if public_key is None:
+                self.unknown_signers += 1
+                return None
+            if key is None:
+                self.failures += 1
+                return None
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return True
+            self.cache_misses += 1
+        return public_key, key, message, signature
+
+    def remember(self, key: tuple, valid: bool) -> bool:
+        """
+        Records the outcome of a verification. Only successful verifications are cached, a signature that failed is
+        checked again the next time it is seen.
+
+        :param key: tuple. Cache key returned by resolve.
+        :param valid: bool. Outcome of the verification.
+        :return: bool. valid
+        """
+        with self.lock:
+            self.verifications += 1
+            if not valid:
+                self.failures += 1
+                return False
+            self.cache[key] = True
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return True
+
+    @staticmethod
+    def check(public_key, message: bytes, signature: str) -> bool:
+        """
+        Runs the verification of a signature. cryptography releases the GIL while verifying, so checks on several
+        threads run in parallel.
+
+        :param public_key: RSAPublicKey or Ed25519PublicKey.
+        :param message: bytes. Signed message.
+        :param signature: str. Hex signature.
+        :return: bool.
+        """
+        return verify_signature(public_key, message, signature)
+
+    def verify(self, signature: str, message: bytes) -> bool:
+        """
+        Checks one signature against the public key of its signer.
+
+        :param signature: str. Key of Block.signatures.
+        :param message: bytes. Signed message, the header digest of the block.
+        :return: bool. True if the signature was made by its signer.
+        """
+        resolved = self.resolve(signature, message)
+        if resolved is None or resolved is True:
+            return resolved is True
+        public_key, key, message, signature = resolved
+        return self.remember(key, self.check(public_key, message, signature))
+
+    def verify_block(self, block) -> bool:
+        """
+        Checks every signature of a block.
+
+        :param block: Block.
+        :return: bool. True if every signature was made by its registered signer.
+        """
+        verifications = self.verifications
+        digest = bytes.fromhex(block.header_hash())
+        valid = all([self.verify(signature, digest) for signature in block.signatures])
+        self.last_block_verifications = self.verifications - verifications
+        return valid
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the verifier.
+
+        :return: dict. verifications (signature checks run), last_block_verifications, cache_hits, cache_misses,
+        hit_rate, unknown_signers and failures.
+        """
+        with self.lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'verifications': self.verifications,
+                'last_block_verifications': self.last_block_verifications,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+                'unknown_signers': self.unknown_signers,
+                'failures': self.failures
+            }
+
+
+if __name__ == '__main__':
+    # Benchmark: verifying a block with 3 signatures on 4 hops, all keys tried vs. signer index and cache.
+    import time
+    from Block import Block
+    from Signer import get_signer, signature_key
+    block = Block(index=1)
+    digest = bytes.fromhex(block.header_hash())
+    verifier = SignatureVerifier()
+    signers = {node: get_signer('rsa-pss').generate() for node in '0123'}
+    for node, signer in signers.items():
+        verifier.register(node, signer.public_key)
+        if node != '0':
+            block.add_signature(signature_key(node, signer.sign(digest)), 1)
+    all_keys = [signer.public_key for signer in signers.values()]
+
+    def all_keys_verify(block):
+        valid = 0
+        for sig in block.signatures:
+            for public_key in all_keys:
+                valid += verify_signature(public_key, digest, split_signature(sig)[1])
+        return valid == len(block.signatures)
+
+    for name, verify in (('all keys', all_keys_verify), ('indexed', verifier.verify_block)):
+        start = time.perf_counter()
+        results = [verify(block) for _ in range(4)]
+        print('{:8} 4 hops: {:.2f} ms, all valid: {}'.format(name, (time.perf_counter() - start) * 1000, all(results)))
+    print(verifier.stats())
@@ -0,0 +1,175 @@
+"""
+Signature schemes a node can sign blocks with. Every signer signs the header digest of a block (Block.header_hash), so
+a signature is bound to the block it was made for. In Block.signatures a signature is stored as 'node_id:signature hex',
+so it names its signer and can be checked against that one node's key.
+"""
+import cryptography
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, ed25519
+from cryptography.hazmat.primitives import serialization, hashes
+
+
+class RsaPssSigner:
+    """
+    RSA-PSS with SHA-256 and 2048 bit keys, the scheme nodes used originally. Kept for compatibility.
+    """
+    scheme = 'rsa-pss'
+
+    def __init__(self, private_key):
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+
+    @classmethod
+    def generate(cls):
+        return cls(rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend()))
+
+    @staticmethod
+    def pss():
+        return padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def sign(self, data: bytes) -> str:
+        """
+        :param data: bytes. Data to sign, e.g. a block header digest.
+        :return: str. Hex signature.
+        """
+        return self.private_key.sign(data, self.pss(), hashes.SHA256()).hex()
+
+    @classmethod
+    def verify(cls, public_key, data: bytes, signature: str):
+        public_key.verify(bytes.fromhex(signature), data, cls.pss(), hashes.SHA256())
+
+
+class Ed25519Signer:
+    """
+    Ed25519. Key generation and signing are far faster than RSA-PSS and signatures are 64 instead of 256 bytes.
+    Verification is slower than RSA with its small public exponent, see the benchmark below.
+    """
+    scheme = 'ed25519'
+
+    def __init__(self, private_key):
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+
+    @classmethod
+    def generate(cls):
+        return cls(ed25519.Ed25519PrivateKey.generate())
+
+    def sign(self, data: bytes) -> str:
+        """
+        :param data: bytes. Data to sign, e.g. a block header digest.
+        :return: str. Hex signature.
+        """
+        return self.private_key.sign(data).hex()
+
+    @staticmethod
+    def verify(public_key, data: bytes, signature: str):
+        public_key.verify(bytes.fromhex(signature), data)
+
+
+SIGNERS = {signer.scheme: signer for signer in (RsaPssSigner, Ed25519Signer)}
+
+
+def get_signer(scheme: str = 'ed25519'):
+    """
+    Returns the signer class of a scheme.
+
+    :param scheme: str. 'rsa-pss' or 'ed25519'.
+    :return: RsaPssSigner or Ed25519Signer.
+    """
+    return SIGNERS[scheme]
+
+
+def verify(public_key, data: bytes, signature: str) -> bool:
+    """
+    Checks a signature with the scheme of public_key.
+
+    :param public_key: RSAPublicKey or Ed25519PublicKey.
+    :param data: bytes. Signed data.
+    :param signature: str. Hex signature.
+    :return: bool.
+    """
+    signer = Ed25519Signer if isinstance(public_key, ed25519.Ed25519PublicKey) else RsaPssSigner
+    try:
+        signer.verify(public_key, data, signature)
+        return True
+    except (cryptography.exceptions.InvalidSignature, ValueError):
+        return False
+
+
+def private_pem(signer) -> bytes:
+    """
+    Returns the private key of a signer as unencrypted PKCS8 PEM, to store it.
+
+    :param signer: RsaPssSigner or Ed25519Signer.
+    :return: bytes.
+    """
+    return signer.private_key.private_bytes(encoding=serialization.Encoding.PEM,
+                                            format=serialization.PrivateFormat.PKCS8,
+                                            encryption_algorithm=serialization.NoEncryption())
+
+
+def load_signer(pem: bytes):
+    """
+    Returns a signer for a stored private key, of the scheme of the key.
+
+    :param pem: bytes. PEM as returned by private_pem.
+    :return: RsaPssSigner or Ed25519Signer.
+    """
+    private_key = serialization.load_pem_private_key(pem, password=None, backend=default_backend())
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return Ed25519Signer(private_key)
+    return RsaPssSigner(private_key)
+
+
+def public_pem(public_key) -> bytes:
+    return public_key.public_bytes(encoding=serialization.Encoding.PEM,
+                                   format=serialization.PublicFormat.SubjectPublicKeyInfo)
+
+
+def load_public_key(pem: bytes):
+    return serialization.load_pem_public_key(pem, backend=default_backend())
+
+
+def signature_key(node_id: str, signature: str) -> str:
+    """
+    Returns the key a signature is stored under in Block.signatures.
+
+    :param node_id: str. Signing node.
+    :param signature: str. Hex signature.
+    :return: str. 'node_id:signature'
+    """
+    return node_id + ':' + signature
+
+
+def split_signature(key: str) -> tuple:
+    """
+    Splits a key of Block.signatures into signer and signature.
+
+    :param key: str. Key of Block.signatures.
+    :return: tuple. (node_id, hex signature). node_id is None for a key without signer id, which is not a valid block
+    signature.
+    """
+    node_id, separator, signature = key.partition(':')
+    return (node_id, signature) if separator else (None, key)
+
+
+if __name__ == '__main__':
+    # Benchmark: sign and verify throughput of every scheme on the block signing path (header digest).
+    # usage: python Signer.py [operations]
+    import sys, time
+    from Block import Block
+    from Transaction import Transaction
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    block = Block(index=1, transactions=[Transaction(_to='1', _from='0', amount=1) for _ in range(100)])
+    for scheme, signer_class in SIGNERS.items():
+        signer = signer_class.generate()
+        start = time.perf_counter()
+        for _ in range(operations):
+            signature = signer.sign(bytes.fromhex(block.header_hash()))
+        sign_rate = operations / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(operations):
+            valid = verify(signer.public_key, bytes.fromhex(block.header_hash()), signature)
+        verify_rate = operations / (time.perf_counter() - start)
+        print('{:8} sign {:>8.0f} ops/s  verify {:>8.0f} ops/s  signature {} bytes, valid: {}'.format(
+            scheme, sign_rate, verify_rate, len(signature) // 2, valid))
@@ -0,0 +1,173 @@
+from threading import Event, Lock, Thread
+from datetime import datetime
+import math, time
+
+
+class TermScheduler:
+    """
+    Runs callbacks at the start of every term. Terms are term_duration seconds long and numbered from 1, term 1
+    starting at the genesis time all nodes agreed on, so every node starts a term at the same moment.
+
+    The genesis time is converted to the monotonic clock once, and every term boundary is computed from it and the
+    term number rather than by adding up sleeps, so neither the time callbacks take nor changes of the system clock
+    make terms drift. Between boundaries the thread sleeps.
+
+    Callbacks run one after another on the thread of the scheduler. When they run longer than a term, the terms whose
+    start passed in the meantime are skipped and counted as missed, and the next callbacks get the current term.
+
+    Attributes
+    ----------
+    term_duration : float
+        seconds per term.
+    term : int
+        the current term, 0 before term 1 started.
+    started, missed : int
+        number of terms started and skipped.
+    jitter : list
+        seconds every started term began after its boundary, for the latest JITTER_SIZE terms. All nodes compute the
+        same boundaries from the same genesis time, so the jitter of the nodes is their offset from each other (plus
+        the offset of their system clocks when genesis was converted).
+
+    Methods
+    ----------
+    register(callback)
+        Runs callback(term) at the start of every term.
+    run(genesis: datetime)
+        Runs terms on the calling thread until stop() is called.
+    start(genesis: datetime)
+        Runs terms on a new thread.
+    current_term()
+        Returns the term at this moment.
+    stats()
+        Returns the term counts and the jitter.
+    """
+    JITTER_SIZE = 1000
+
+    def __init__(self, term_duration: float, name: str = 'Term Scheduler'):
+        self.term_duration = term_duration
+        self.name = name
+        self.callbacks = []
+        self.anchor = None  # monotonic time of genesis
+        self.term = 0
+        self.started = 0
+        self.missed = 0
+        self.jitter = []
+        self.lock = Lock()
+        self.stopped = Event()
+
+    def register(self, callback):
+        """
+        Registers a callback for the start of every term, e.g. block production.
+
+        :param callback: function taking the term number.
+        :return: None
+        """
+        self.callbacks.append(callback)
+
+    def anchor_to(self, genesis: datetime):
+        """
+        Converts the genesis time to the monotonic clock. Uses total_seconds, timedelta.seconds drops the days.
+        """
+        self.anchor = time.monotonic() - (datetime.now() - genesis).total_seconds()
+
+    def current_term(self) -> int:
+        if self.anchor is None:
+            return 0
+        elapsed = time.monotonic() - self.anchor
+        return math.floor(elapsed / self.term_duration) + 1 if elapsed >= 0 else 0
+
+    def boundary(self, term: int) -> float:
+        return self.anchor + (term - 1) * self.term_duration
+
+    def run(self, genesis: datetime):
+        """
+        Runs the callbacks at the start of every term, from the current one on, until stop() is called.
+
+        :param genesis: datetime. Start of term 1, agreed on by all nodes.
+        :return: None
+        """
+        self.anchor_to(genesis)
+        next_term = max(self.current_term(), 1)
+        while not self.stopped.wait(max(0.0, self.boundary(next_term) - time.monotonic())):
+            now = time.monotonic()
+            term = max(math.floor((now - self.anchor) / self.term_duration) + 1, next_term)
+            with self.lock:
+                self.missed += term - next_term
+                self.started += 1
+                self.jitter.append(now - self.boundary(term))
+                del self.jitter[:-self.JITTER_SIZE]
+                self.term = term
+            for callback in self.callbacks:
+                try:
+                    callback(term)
+                except Exception as e:  # a failing callback must not stop the terms
+                    print('error in term {} callback on {}: {!r}'.format(term, self.name, e))
+            next_term = term + 1
+
+    def start(self, genesis: datetime) -> Thread:
+        t = Thread(target=self.run, args=(genesis,), name=self.name, daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self.stopped.set()
+
+    def stats(self) -> dict:
+        """
+        Returns the term counts and how late terms started.
+
+        :return: dict. term, started, missed, mean_jitter_ms, max_jitter_ms.
+        """
+        with self.lock:
+            jitter = list(self.jitter)
+            return {'term': self.term, 'started': self.started, 'missed': self.missed,
+                    'mean_jitter_ms': sum(jitter) / len(jitter) * 1000 if jitter else 0.0,
+                    'max_jitter_ms': max(jitter) * 1000 if jitter else 0.0}
+
+
+if __name__ == '__main__':
+    # Benchmark: N nodes in one process with the same genesis time and short terms. Every node produces a "block" per
+    # term taking a random 0 to 40% of the term, and node '0' stalls for 2.5 terms once. Reports the CPU used, the
+    # spread of term starts across nodes and the missed terms, next to the CPU of the polling loop it replaces.
+    # usage: python TermScheduler.py [term duration s] [terms] [nodes]
+    import collections, random, sys
+    from datetime import timedelta
+    term_duration = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+    n_terms = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    n_nodes = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    genesis = datetime.now() + timedelta(seconds=0.05)
+    starts = collections.defaultdict(list)  # term -> monotonic start times on the nodes but '0', reported on its own
+
+    def produce(node, term):
+        if node != '0':
+            starts[term].append(time.monotonic())
+        time.sleep(random.uniform(0, 0.4) * term_duration)
+        if node == '0' and term == 5:
+            time.sleep(2.5 * term_duration)
+
+    schedulers = {}
+    for node in map(str, range(n_nodes)):
+        schedulers[node] = TermScheduler(term_duration, 'Term Scheduler ' + node)
+        schedulers[node].register(lambda term, node=node: produce(node, term))
+    cpu, wall = time.process_time(), time.perf_counter()
+    for scheduler in schedulers.values():
+        scheduler.start(genesis)
+    time.sleep((genesis - datetime.now()).total_seconds() + n_terms * term_duration)
+    for scheduler in schedulers.values():
+        scheduler.stop()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    spreads = [max(times) - min(times) for times in starts.values() if len(times) > 1]
+    print('{} nodes, {} terms of {:.0f} ms'.format(n_nodes, n_terms, term_duration * 1000))
+    print('CPU {:.1f} ms in {:.1f} s ({:.2%} of one core)'.format(cpu * 1000, wall, cpu / wall))
+    print('term start spread across nodes: mean {:.3f} ms, max {:.3f} ms'.format(
+        sum(spreads) / len(spreads) * 1000, max(spreads) * 1000))
+    for node in ('0', '1'):
+        print('node', node, schedulers[node].stats())
+
+    # the loop the scheduler replaces: recompute the term without sleeping
+    cpu, wall = time.process_time(), time.perf_counter()
+    polls = 0
+    while time.perf_counter() - wall < 1:
+        math.ceil((datetime.now() - genesis).total_seconds() / term_duration)
+        polls += 1
+    print('polling loop: {:.0%} of one core, {} polls/s'.format((time.process_time() - cpu) / 1, polls))
@@ -0,0 +1,252 @@
+from threading import Condition, Lock, Thread
+import heapq, itertools, time
+
+
+class Timeout:
+    """
+    A callback scheduled on a TimerService. Cancelled timeouts stay in the heap of the service until they come up or
+    the heap is compacted, cancelling is O(1).
+    """
+    __slots__ = ('deadline', 'callback', 'cancelled')
+
+    def __init__(self, deadline: float, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+
+class TimerService:
+    """
+    One thread running the timeouts of any number of timers, in place of a thread per timer polling the clock. The
+    timeouts are kept in a heap ordered by deadline, and the thread sleeps on a condition variable until the earliest
+    deadline, or until a timeout with an earlier deadline is scheduled. An idle service uses no CPU, and a timeout
+    fires as soon as the thread wakes up after its deadline.
+
+    Callbacks run on the thread of the service, so they must be short; a callback that does more, or changes state
+    owned by another thread, passes the work on (see ServiceTimer).
+
+    Attributes
+    ----------
+    name : str
+        name of the thread.
+    fired, cancelled : int
+        number of timeouts fired and cancelled.
+    lateness : float
+        total seconds timeouts fired after their deadline, max_lateness the most any one fired late.
+
+    Methods
+    ----------
+    schedule(delay: float, callback)
+        Runs callback() after delay seconds, returns a Timeout.
+    cancel(timeout: Timeout)
+        Keeps a timeout from firing.
+    shared()
+        Returns the process-wide service.
+    close()
+        Stops the thread, pending timeouts never fire.
+    """
+    COMPACT_SIZE = 64
+    shared_service = None
+    shared_lock = Lock()
+
+    def __init__(self, name: str = 'Timer Service'):
+        self.name = name
+        self.heap = []  # (deadline, sequence, Timeout)
+        self.sequence = itertools.count()  # orders timeouts with the same deadline
+        self.condition = Condition()
+        self.running = True
+        self.fired = 0
+        self.cancelled = 0
+        self.stale = 0  # cancelled timeouts still in the heap
+        self.lateness = 0.0
+        self.max_lateness = 0.0
+        self.thread = Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def shared(cls):
+        with cls.shared_lock:
+            if cls.shared_service is None or not cls.shared_service.running:
+                cls.shared_service = cls()
+            return cls.shared_service
+
+    def schedule(self, delay: float, callback) -> Timeout:
+        """
+        Schedules a callback.
+
+        :param delay: float. Seconds from now.
+        :param callback: function without arguments.
+        :return: Timeout. Handle to cancel it.
+        """
+        timeout = Timeout(time.monotonic() + delay, callback)
+        with self.condition:
+            heapq.heappush(self.heap, (timeout.deadline, next(self.sequence), timeout))
+            if self.heap[0][2] is timeout:  # the thread sleeps until a later deadline
+                self.condition.notify()
+        return timeout
+
+    def cancel(self, timeout: Timeout):
+        with self.condition:
+            if timeout.cancelled:
+                return
+            timeout.cancelled = True
+            self.cancelled += 1
+            self.stale += 1
+            if len(self.heap) > self.COMPACT_SIZE and self.stale > len(self.heap) // 2:
+                # timers restarted often, like election timers on every heartbeat, leave many cancelled timeouts
+                self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+                heapq.heapify(self.heap)
+                self.stale = 0
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.heap or self.heap[0][2].cancelled
+                                        or self.heap[0][0] > time.monotonic()):
+                    if self.heap and self.heap[0][2].cancelled:
+                        heapq.heappop(self.heap)
+                        self.stale -= 1
+                    elif self.heap:
+                        self.condition.wait(self.heap[0][0] - time.monotonic())
+                    else:
+                        self.condition.wait()
+                if not self.running:
+                    return
+                deadline, _, timeout = heapq.heappop(self.heap)
+                timeout.cancelled = True  # fired, cancelling it is a no-op from now on
+                late = time.monotonic() - deadline
+                self.fired += 1
+                self.lateness += late
+                self.max_lateness = max(self.max_lateness, late)
+            try:
+                timeout.callback()
+            except Exception as e:  # a failing callback must not stop the other timers
+                print('error in timer callback on {}: {!r}'.format(self.name, e))
+
+    def pending(self) -> int:
+        with self.condition:
+            return sum(1 for entry in self.heap if not entry[2].cancelled)
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+
+class ServiceTimer:
+    """
+    A timer that can be started, stopped and restarted, running on a TimerService. Subclasses set the length of every
+    timeout in new_timeout and what happens when it elapses in on_timeout.
+
+    on_timeout runs on the thread of the service, or is passed to dispatch if one is given, e.g.
+    loop.call_soon_threadsafe of a MessagingCore so it runs on the thread that handles the messages changing the same
+    state. A timeout that is stopped or restarted after it fired but before on_timeout ran is dropped.
+
+    Methods
+    ----------
+    restart_timer()
+        Starts the timer with a new timeout, dropping a running one.
+    stop_timer()
+        Stops the timer.
+    active
+        Whether the timer is running.
+    """
+
+    def __init__(self, service: TimerService = None, dispatch=None):
+        """
+        :param service: TimerService. Defaults to the process-wide service.
+        :param dispatch: function taking a function and its argument, runs on_timeout, e.g. loop.call_soon_threadsafe.
+        """
+        self.service = service or TimerService.shared()
+        self.dispatch = dispatch
+        self.timeout = None
+        self.generation = 0  # incremented by every start and stop, tells a stale timeout from the current one
+        self.lock = Lock()
+
+    def new_timeout(self) -> float:
+        raise NotImplementedError
+
+    def on_timeout(self):
+        raise NotImplementedError
+
+    @property
+    def active(self) -> bool:
+        return self.timeout is not None
+
+    def restart_timer(self):
+        with self.lock:
+            if self.timeout is not None:
+                self.service.cancel(self.timeout)
+            self.generation += 1
+            generation = self.generation
+            self.timeout = self.service.schedule(self.new_timeout(), lambda: self.elapsed(generation))
+
+    def stop_timer(self):
+        with self.lock:
+            if self.timeout is not None:
+                self.service.cancel(self.timeout)
+                self.timeout = None
+            self.generation += 1
+
+    def elapsed(self, generation: int):
+        if self.dispatch is None:
+            self.fire(generation)
+        else:
+            self.dispatch(self.fire, generation)
+
+    def fire(self, generation: int):
+        with self.lock:
+            if generation != self.generation:  # stopped or restarted in the meantime
+                return
+            self.timeout = None
+        self.on_timeout()
+
+
+if __name__ == '__main__':
+    # Benchmark: CPU time and firing accuracy of election and heartbeat timers on one service. Every node runs an
+    # election timer restarted by every heartbeat (3 to 9 s timeouts, so it never fires) and one node a heartbeat timer
+    # firing every 0.375 s, the setup of a cluster with a leader. A thread per timer polling the clock, as the timers
+    # did before, keeps one core busy per timer.
+    # usage: python TimerService.py [seconds] [nodes]
+    import random, sys
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n_nodes = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    service = TimerService('Benchmark Timers')
+
+    class Election(ServiceTimer):
+        def new_timeout(self):
+            return 3 + 6 * random.random()
+
+        def on_timeout(self):
+            raise AssertionError('election timer fired although heartbeats arrived')
+
+    class Beat(ServiceTimer):
+        def __init__(self, followers):
+            super().__init__(service)
+            self.followers = followers
+            self.beats = 0
+
+        def new_timeout(self):
+            return 0.375
+
+        def on_timeout(self):
+            self.beats += 1
+            for follower in self.followers:
+                follower.restart_timer()
+            self.restart_timer()
+
+    followers = [Election(service) for _ in range(n_nodes - 1)]
+    for follower in followers:
+        follower.restart_timer()
+    beat = Beat(followers)
+    beat.restart_timer()
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print('{} nodes, {:.1f} s: {} heartbeats, {} timeouts restarted, {} pending'.format(
+        n_nodes, wall, beat.beats, service.cancelled, service.pending()))
+    print('CPU {:.1f} ms ({:.2%} of one core)'.format(cpu * 1000, cpu / wall))
+    print('lateness: mean {:.3f} ms, max {:.3f} ms'.format(service.lateness / max(service.fired, 1) * 1000,
+                                                        service.max_lateness * 1000))
+    service.close()
@@ -13,6 +13,9 @@ class Transaction:
         the node the amount of currency is being transferred from.
     amount : str
         the amount of currency being transferred
+    fee : float
+        fee offered to the miner, used to prioritize the transaction when blocks are packed. Only part of the JSON
+        representation (and with it the unique_id) when it is not 0, so ids of transactions without a fee are unchanged.
     timestamp: str
         timestamp of when the transaction was created
     unique_id: str
@@ -24,9 +27,20 @@ class Transaction:
         return a JSON string representation of the transaction attributes but not the unique_id
     generateIDh()
         return a hash representation of the JSON form of the transaction attributes to use as a unique_id
+    to_dict()
+        return the attributes as a dict, in the order of the JSON representation
+    invalidate()
+        drop the cached JSON representation after an attribute was changed
 
+    Transactions use __slots__ to keep per-object memory small. Large numbers of transactions can be held in a
+    TransactionBatch instead (see TransactionBatch.py).
+
+    A transaction is treated as immutable once created: its JSON representation is computed on the first str() and
+    cached. Code that changes an attribute afterwards has to call invalidate().
     """
-    def __init__(self, json_string = '', _to: str = '', _from: str = '', amount: float = 0.0):
+    __slots__ = ('to_node', 'from_node', 'amount', 'fee', 'timestamp', 'unique_id', '_json')
+
+    def __init__(self, json_string = '', _to: str = '', _from: str = '', amount: float = 0.0, fee: float = 0):
         """
         Transaction constructor. Takes a JSON string or a set of variables to init instance variables
 
@@ -34,22 +48,49 @@ class Transaction:
         :param _to: str. Used if JSON string parameter not used.
         :param _from: str. Used if JSON string parameter not used.
         :param amount: str. Used if JSON string parameter not used.
+        :param fee: float. Used if JSON string parameter not used.
         """
+        self._json = None
         # if a json string parameter is given, use that to construct the object
         if json_string != '':
             json_obj = json.loads(json_string)
             self.to_node = json_obj['to_node']
             self.from_node = json_obj['from_node']
             self.amount = json_obj['amount']
+            self.fee = json_obj.get('fee', 0)
             self.timestamp = json_obj['timestamp']
             self.unique_id = json_obj['unique_id']
         else:  # else use given parameters to construct new tx
             self.to_node = _to
             self.from_node = _from
             self.amount = amount
+            self.fee = fee
             self.timestamp = str(datetime.datetime.now())
             self.unique_id = self.generateIDh()  # hash of to, from, amount, timestamp
 
+    @classmethod
+    def from_fields(cls, to_node: str, from_node: str, amount: float, timestamp: str, unique_id: str, fee: float = 0):
+        """
+        Construct a transaction from already decoded attributes, e.g. by a codec, without parsing JSON or hashing.
+
+        :param to_node: str.
+        :param from_node: str.
+        :param amount: float.
+        :param timestamp: str.
+        :param unique_id: str.
+        :param fee: float.
+        :return: Transaction.
+        """
+        tx = cls.__new__(cls)
+        tx.to_node = to_node
+        tx.from_node = from_node
+        tx.amount = amount
+        tx.fee = fee
+        tx.timestamp = timestamp
+        tx.unique_id = unique_id
+        tx._json = None
+        return tx
+
     def txHeaderToJSON(self) -> str:
         """
         return a JSON string representation of the transaction attributes but not the unique_id
@@ -62,6 +103,8 @@ class Transaction:
             'amount': self.amount,
             'timestamp': self.timestamp
         }
+        if self.fee:
+            self_dict['fee'] = self.fee
         return json.dumps(self_dict)
 
     def generateIDh(self) -> str:
@@ -73,12 +116,58 @@ class Transaction:
         hashMe = self.txHeaderToJSON()
         return hashlib.sha256(hashMe.encode()).hexdigest()
 
+    def to_dict(self) -> dict:
+        """
+        return the attributes as a dict, in the order of the JSON representation
+
+        :return: dict
+        """
+        self_dict = {
+            'to_node': self.to_node,
+            'from_node': self.from_node,
+            'amount': self.amount,
+            'timestamp': self.timestamp,
+            'unique_id': self.unique_id
+        }
+        if self.fee:
+            self_dict['fee'] = self.fee
+        return self_dict
+
     def __str__(self) -> str:
         """
-        override of the string representation. Return the JSON representation of the object attributes.
+        override of the string representation. Return the JSON representation of the object attributes, cached after
+        the first call.
         :return: str.
         """
-        return json.dumps(self.__dict__)
+        if self._json is None:
+            self._json = json.dumps(self.to_dict())
+        return self._json
+
+    def invalidate(self):
+        """
+        Drop the cached JSON representation. Must be called after an attribute of the transaction was changed.
+
+        :return: None
+        """
+        self._json = None
+
+    def __getstate__(self) -> dict:
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled transaction, including ones pickled before __slots__ was introduced.
+
+        :param state: dict or tuple. Attribute dict, or (dict, slot dict) as pickled by default for slotted objects.
+        :return: None
+        """
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **(state[1] or {}))
+        self._json = None
+        self.fee = 0
+        for k, v in state.items():
+            if k != '_json':
+                setattr(self, k, v)
 
     def __eq__(self, _in) -> bool:
         """
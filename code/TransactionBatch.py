@@ -0,0 +1,216 @@
+from Transaction import Transaction
+from array import array
+import datetime, json
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def timestamp_to_ns(timestamp: str) -> int:
+    """
+    Converts a transaction timestamp ("2020-05-12 18:20:25.659289") to nanoseconds since the epoch.
+
+    :param timestamp: str.
+    :return: int.
+    """
+    return (datetime.datetime.fromisoformat(timestamp) - EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+def ns_to_timestamp(ns: int) -> str:
+    """
+    Converts nanoseconds since the epoch back to a transaction timestamp, in the format of str(datetime).
+
+    :param ns: int.
+    :return: str.
+    """
+    return str(EPOCH + datetime.timedelta(microseconds=ns // 1000))
+
+
+class TransactionBatch:
+    """
+    Columnar container for many transactions. Instead of one Python object per transaction, every attribute is kept in
+    a packed column: account names are interned to integer ids, amounts are float64, unique ids are packed 32 byte
+    digests and timestamps are nanoseconds since the epoch.
+
+    A batch behaves like a read-only list of Transaction objects: indexing and iteration build Transaction objects on
+    demand, so a batch can be used wherever a list of transactions is expected (Block.transactions,
+    Ledger.verify_transaction, the mempool). Hot paths can read the columns directly through transfers().
+
+    Attributes
+    ----------
+    accounts : list
+        account names, indexed by account id.
+    from_ids, to_ids : array
+        sending and receiving account id of every transaction.
+    amounts : array
+        amount of every transaction.
+    fees : array
+        fee of every transaction.
+    int_amounts : bytearray
+        bit INT_AMOUNT for amounts and bit INT_FEE for fees that were ints, so JSON output (and with it the transaction
+        hash) is unchanged.
+    ids : bytearray
+        unique_id of every transaction as 32 raw bytes.
+    timestamps : array
+        timestamp of every transaction in nanoseconds since the epoch.
+
+    Methods
+    ----------
+    append(tx: Transaction)
+        Adds a transaction to the end of the batch.
+    transfers()
+        Yields (from_node, to_node, amount, unique_id) for every transaction without building Transaction objects.
+    to_dicts()
+        Returns the transactions as a list of dicts, as produced by Transaction.to_dict().
+    """
+    ID_SIZE = 32
+    INT_AMOUNT = 1
+    INT_FEE = 2
+
+    def __init__(self, transactions=()):
+        """
+        Constructor for a TransactionBatch.
+
+        :param transactions: iterable of Transaction objects to add to the batch.
+        """
+        self.accounts = []
+        self.account_ids = {}
+        self.from_ids = array('i')
+        self.to_ids = array('i')
+        self.amounts = array('d')
+        self.fees = array('d')
+        self.int_amounts = bytearray()
+        self.ids = bytearray()
+        self.timestamps = array('q')
+        self.extend(transactions)
+
+    def account_id(self, account: str) -> int:
+        """
+        Returns the integer id of an account, interning it if it was not seen before.
+
+        :param account: str. Account name, e.g. '0' or 'reward'.
+        :return: int.
+        """
+        account_id = self.account_ids.get(account)
+        if account_id is None:
+            account_id = self.account_ids[account] = len(self.accounts)
+            self.accounts.append(account)
+        return account_id
+
+    def append(self, tx: Transaction):
+        """
+        Adds a transaction to the end of the batch.
+
+        :param tx: Transaction.
+        :return: None
+        """
+        unique_id = bytes.fromhex(tx.unique_id)
+        if len(unique_id) != self.ID_SIZE:
+            raise ValueError('unique_id must be a 64 character hex digest')
+        ns = timestamp_to_ns(tx.timestamp)
+        if ns_to_timestamp(ns) != tx.timestamp:
+            raise ValueError('timestamp is not in the str(datetime) format: ' + tx.timestamp)
+        self.from_ids.append(self.account_id(tx.from_node))
+        self.to_ids.append(self.account_id(tx.to_node))
+        self.amounts.append(tx.amount)
+        self.fees.append(tx.fee)
+        self.int_amounts.append(isinstance(tx.amount, int) * self.INT_AMOUNT | isinstance(tx.fee, int) * self.INT_FEE)
+        self.ids += unique_id
+        self.timestamps.append(ns)
+
+    def extend(self, transactions):
+        for tx in transactions:
+            self.append(tx)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def amount(self, i: int):
+        return int(self.amounts[i]) if self.int_amounts[i] & self.INT_AMOUNT else self.amounts[i]
+
+    def fee(self, i: int):
+        return int(self.fees[i]) if self.int_amounts[i] & self.INT_FEE else self.fees[i]
+
+    def unique_id(self, i: int) -> str:
+        return self.ids[i * self.ID_SIZE:(i + 1) * self.ID_SIZE].hex()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return TransactionBatch(self[j] for j in range(*i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('transaction batch index out of range')
+        return Transaction.from_fields(self.accounts[self.to_ids[i]], self.accounts[self.from_ids[i]], self.amount(i),
+                                       ns_to_timestamp(self.timestamps[i]), self.unique_id(i), self.fee(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __contains__(self, tx) -> bool:
+        return self.index_of(tx.unique_id) >= 0
+
+    def index_of(self, unique_id: str) -> int:
+        """
+        Returns the position of the transaction with unique_id, or -1.
+
+        :param unique_id: str.
+        :return: int.
+        """
+        raw = bytes.fromhex(unique_id)
+        position = self.ids.find(raw)
+        while position >= 0 and position % self.ID_SIZE:
+            position = self.ids.find(raw, position + 1)
+        return position // self.ID_SIZE if position >= 0 else -1
+
+    def transfers(self):
+        """
+        Yields (from_node, to_node, amount, unique_id) for every transaction without building Transaction objects.
+
+        :return: generator of tuples.
+        """
+        accounts = self.accounts
+        for i in range(len(self)):
+            yield accounts[self.from_ids[i]], accounts[self.to_ids[i]], self.amounts[i], self.unique_id(i)
+
+    def total_amount(self) -> float:
+        return sum(self.amounts)
+
+    def to_dicts(self) -> list:
+        """
+        Returns the transactions as a list of dicts, as produced by Transaction.to_dict().
+
+        :return: list.
+        """
+        return [tx.to_dict() for tx in self]
+
+    def __str__(self) -> str:
+        return json.dumps(self.to_dicts())
+
+
+def iter_transfers(transactions):
+    """
+    Yields (from_node, to_node, amount, unique_id) for a TransactionBatch or any iterable of Transaction objects.
+
+    :param transactions: TransactionBatch or list of Transaction objects.
+    :return: generator of tuples.
+    """
+    if isinstance(transactions, TransactionBatch):
+        return transactions.transfers()
+    return ((tx.from_node, tx.to_node, tx.amount, tx.unique_id) for tx in transactions)
+
+
+if __name__ == '__main__':
+    import random, tracemalloc
+    nodes = ['0', '1', '2', '3']
+    tracemalloc.start()
+    transactions = [Transaction(_to=random.choice(nodes), _from=random.choice(nodes), amount=round(random.uniform(0.1, 2), 2))
+                    for _ in range(50000)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    batch = TransactionBatch(transactions)
+    batch_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('50000 transactions: list {:.1f} MB, batch {:.1f} MB'.format(list_bytes / 1e6, batch_bytes / 1e6))
+    print('round trip equal: ', batch.to_dicts() == [tx.to_dict() for tx in transactions])
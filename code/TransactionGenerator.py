@@ -1,65 +1,84 @@
-from datetime import datetime
 from time import sleep
 from Transaction import Transaction
-import boto3, random
-
-message_queue_URLs = {
-    '0': 'https://sqs.us-east-1.amazonaws.com/622058021374/0.fifo',
-    '1': 'https://sqs.us-east-1.amazonaws.com/622058021374/1.fifo',
-    '2': 'https://sqs.us-east-1.amazonaws.com/622058021374/2.fifo',
-    '3': 'https://sqs.us-east-1.amazonaws.com/622058021374/3.fifo',
-}
+from Gossip import envelope
+from Cluster import Cluster
+from Transport import broadcast_results
+import argparse, random
 
 
 class Tx_Generator:
-    def __init__(self):
-        self.nodes = ['0', '1', '2', '3']
-        self.sqs = boto3.client('sqs')  # make a new SQS object
+    """
+    Sends random transactions to the nodes of a cluster, over the same transport the nodes use for their block messages
+    ('sqs', 'tcp', or 'inprocess' for nodes running in the same process). boto3 is only imported by the SQS transport.
+    """
+
+    def __init__(self, cluster: Cluster = None, transport: str = 'sqs', loop=None):
+        """
+        :param cluster: Cluster. Nodes to send to and their endpoints, defaults to the nodes '0' to '3'.
+        :param transport: str. 'sqs', 'tcp' or 'inprocess', see Transport.py.
+        :param loop: event loop of a MessagingCore to run the transport on, e.g. of a node in the same process.
+        """
+        cluster = cluster or Cluster.of_size(Cluster.DEFAULT_SIZE)
+        self.nodes = cluster.nodes
+        self.transport = cluster.transport(transport, 'blockchain', loop)
         self.msg_count = 0
 
     def make_tx(self) -> str:
-        from_node = self.nodes[random.randrange(4)]
-        to_node = self.nodes[random.randrange(4)]
-        while to_node == from_node:
-            to_node = self.nodes[random.randrange(4)]
+        from_node, to_node = random.sample(self.nodes, 2)
 
         amount = round(random.uniform(0.1, 2), 2)
 
         return str(Transaction(_from=str(from_node), _to=str(to_node), amount=amount))
 
-    def format_for_SQS(self, message: dict) -> dict:
-        SQSmsg = {}
-        for key, value in message.items():
-            SQSmsg[key] = {
-                'DataType': 'String',
-                'StringValue': value
-            }
-        return SQSmsg
-
     def send(self, message: dict, destination: str):
-        # used to uniquely identify messages:
+        """
+        Sends a message to a node without waiting for the transport.
+
+        :param message: dict. Message attributes, e.g. {'contents': str(tx), 'type': 'Transaction'}.
+        :param destination: str. Node id.
+        :return: Future. Resolves to True once the transport handed the message over.
+        """
         self.msg_count += 1
-        # included to ensure all messages have a different non-duplication hash:
-        timestamp = str(datetime.now())
-        message_body = 'Message # {} from tx Generator. {}'.format(self.msg_count, timestamp)
-        SQSmsg = self.format_for_SQS(message)
+        return self.transport.send(message, destination)
+
+    def broadcast(self, message: dict, destinations) -> dict:
+        """
+        Sends a message to several nodes and waits until the transport handed it over to all of them.
+
+        :param message: dict. Message attributes.
+        :param destinations: iterable of node ids.
+        :return: dict. destination -> True or the exception the send failed with, see broadcast_results.
+        """
+        destinations = list(destinations)
+        self.msg_count += len(destinations)
+        return broadcast_results(self.transport.broadcast(message, destinations))
 
-        # response stores confirmation data from SQS
-        response = self.sqs.send_message(
-            QueueUrl=message_queue_URLs[destination],
-            MessageAttributes=SQSmsg,
-            MessageGroupId='queue',
-            MessageBody=message_body
-        )
+    def close(self):
+        self.transport.close()
 
 
 if __name__ == '__main__':
-    txg = Tx_Generator()
+    # usage: python TransactionGenerator.py [direct|gossip] [--transport sqs|tcp] [--cluster cluster.json | --nodes N]
+    # with gossip, every transaction is sent to one random node, which gossips it to the others (nodes started with
+    # Node(gossip='push') or 'push-pull'). Use the transport the nodes were started with.
+    parser = argparse.ArgumentParser(description='Sends random transactions to the nodes.')
+    parser.add_argument('mode', nargs='?', choices=['direct', 'gossip'], default='direct')
+    parser.add_argument('--transport', choices=['sqs', 'tcp'], default='sqs')
+    parser.add_argument('--cluster')
+    parser.add_argument('--nodes', type=int)
+    args = parser.parse_args()
+    gossip = args.mode == 'gossip'
+    txg = Tx_Generator(Cluster.from_args(args.cluster, args.nodes), args.transport)
     while True:
         tx = txg.make_tx()
         msg_dict = {'contents': str(tx), 'type': 'Transaction'}
+        if gossip:
+            sleep(random.uniform(0.1, 1))
+            txg.send(envelope(msg_dict, 'generator'), random.choice(txg.nodes))
+            sleep(10)
+            continue
         for node in txg.nodes:
-            not_this_node = txg.nodes[random.randrange(4)]
+            not_this_node = random.choice(txg.nodes)
             if node == not_this_node:
                 continue
             else:
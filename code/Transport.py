@@ -0,0 +1,748 @@
+"""
+Transports carry the messages of a Messenger between nodes. A message is a dict of str or bytes values, addressed to a
+node id on a channel ('blockchain' for Node messages, 'election' for LeaderElection messages). Every transport delivers
+the messages addressed to a node, in order, to a single callback on one thread, like the original SQS listener.
+
+    InProcessTransport  nodes in one Python process, one queue per node and channel
+    TcpTransport        nodes on one machine or network, length-prefixed frames over asyncio TCP streams
+    SqsTransport        the original AWS SQS FIFO queues
+"""
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import Thread, Lock, Condition
+from datetime import datetime
+import asyncio, collections, queue, struct, time
+
+CHANNELS = ('blockchain', 'election')
+FRAME_HEADER = struct.Struct('>I')
+FIELD_HEADER = struct.Struct('>cHI')
+
+
+def encode_frame(message: dict) -> bytes:
+    """
+    Encodes a message as a length-prefixed frame.
+
+    :param message: dict. str keys, str or bytes values.
+    :return: bytes. 4 byte length + fields, every field: type ('s' or 'b'), key length, value length, key, value.
+    """
+    body = bytearray()
+    for key, value in message.items():
+        key = key.encode('utf-8')
+        if isinstance(value, bytes):
+            kind = b'b'
+        else:
+            kind, value = b's', value.encode('utf-8')
+        body += FIELD_HEADER.pack(kind, len(key), len(value))
+        body += key
+        body += value
+    return FRAME_HEADER.pack(len(body)) + bytes(body)
+
+
+def decode_frame(body: bytes) -> dict:
+    """
+    Decodes the body of a frame written by encode_frame, without its length prefix.
+
+    :param body: bytes.
+    :return: dict.
+    """
+    message = {}
+    pos = 0
+    while pos < len(body):
+        kind, key_length, value_length = FIELD_HEADER.unpack_from(body, pos)
+        pos += FIELD_HEADER.size
+        key = body[pos:pos + key_length].decode('utf-8')
+        pos += key_length
+        value = body[pos:pos + value_length]
+        pos += value_length
+        message[key] = value.decode('utf-8') if kind == b's' else bytes(value)
+    return message
+
+
+class Transport:
+    """
+    Interface of a transport. Received messages are put into inbox and handed to the deliver callback by a dispatch
+    thread, so a slow handler never blocks the receiving side of the transport. Transports built on asyncio can run on
+    the event loop of a MessagingCore instead of their own and then pass received messages to deliver directly.
+
+    Methods
+    ----------
+    start(address: str, deliver: function)
+        Starts receiving the messages addressed to address, deliver(message: dict) is called for each of them.
+    send(message: dict, destination: str)
+        Sends a message to the node destination. Returns a future resolving to True once the message was handed over.
+    broadcast(message: dict, destinations: iterable)
+        Sends a message to several nodes at once. Returns destination -> future, see broadcast_results.
+    close()
+        Stops receiving and releases the resources of the transport.
+    """
+    name = None
+
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop = None):
+        """
+        :param channel: str. 'blockchain' or 'election'.
+        :param loop: event loop of a MessagingCore, used by transports built on asyncio.
+        """
+        self.channel = channel
+        self.loop = loop
+        self.address = None
+        self.deliver = None
+        self.inbox = queue.Queue()
+
+    def start(self, address: str, deliver):
+        self.address = address
+        self.deliver = deliver
+        Thread(target=self.dispatch, name='Dispatch Thread ' + self.channel + address, daemon=True).start()
+
+    def dispatch(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                return
+            self.deliver(message)
+
+    def receive(self, message: dict):
+        self.inbox.put(message)
+
+    def send(self, message: dict, destination: str) -> Future:
+        raise NotImplementedError
+
+    def broadcast(self, message: dict, destinations) -> dict:
+        return {destination: self.send(message, destination) for destination in destinations}
+
+    def close(self):
+        self.inbox.put(None)
+
+
+def completed(result=True) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def broadcast_results(futures: dict, timeout: float = None) -> dict:
+    """
+    Waits for the sends of a broadcast.
+
+    :param futures: dict. destination -> Future, as returned by Transport.broadcast.
+    :param timeout: float. Seconds to wait at most, None waits until every send completed.
+    :return: dict. destination -> True if the message was handed over, otherwise the exception it failed with, a
+    TimeoutError for sends still pending after timeout.
+    """
+    wait(futures.values(), timeout)
+    results = {}
+    for destination, future in futures.items():
+        if not future.done():
+            results[destination] = TimeoutError('still sending to ' + destination)
+        else:
+            results[destination] = future.exception() or future.result()
+    return results
+
+
+class InProcessTransport(Transport):
+    """
+    Transport between nodes running in the same process. Every node and channel has a mailbox that exists from the
+    first message sent to it, so nothing is lost if a node starts after its peers sent it messages. A node running a
+    MessagingCore has its messages passed straight to the core instead, without a dispatch thread.
+    """
+    name = 'inprocess'
+    mailboxes = {}  # (channel, address) -> queue.Queue, shared by all nodes of the process
+    endpoints = {}  # (channel, address) -> deliver callback of a node receiving on a MessagingCore
+    mailboxes_lock = Lock()
+
+    @classmethod
+    def mailbox(cls, channel: str, address: str) -> queue.Queue:
+        with cls.mailboxes_lock:
+            return cls.mailboxes.setdefault((channel, address), queue.Queue())
+
+    def start(self, address: str, deliver):
+        if self.loop is None:
+            self.inbox = self.mailbox(self.channel, address)
+            super().start(address, deliver)
+            return
+        self.address = address
+        self.deliver = deliver
+        with self.mailboxes_lock:
+            mailbox = self.mailboxes.pop((self.channel, address), None)
+            while mailbox is not None and not mailbox.empty():
+                deliver(mailbox.get())
+            self.endpoints[(self.channel, address)] = deliver
+
+    def send(self, message: dict, destination: str) -> Future:
+        with self.mailboxes_lock:
+            deliver = self.endpoints.get((self.channel, destination))
+            if deliver is not None:
+                deliver(dict(message))
+                return completed()
+        self.mailbox(self.channel, destination).put(dict(message))
+        return completed()
+
+    def close(self):
+        if self.loop is None:
+            super().close()
+        else:
+            with self.mailboxes_lock:
+                self.endpoints.pop((self.channel, self.address), None)
+
+
+class TcpTransport(Transport):
+    """
+    Transport over TCP, built on asyncio streams running on a background event loop. Every node listens on its own
+    address; messages are sent as length-prefixed frames over one persistent connection per destination. Messages to a
+    node that is not reachable yet stay in a bounded outbox and are sent once it accepts connections, in order.
+    Destinations are served concurrently, at most max_in_flight at a time, and a broadcast encodes its message once.
+
+    Attributes
+    ----------
+    addresses : dict
+        node id -> (host, port), see Cluster.tcp_addresses. Nodes not listed must have numeric ids, they listen on host
+        DEFAULT_HOST, port base_port + channel offset + id.
+    """
+    name = 'tcp'
+    DEFAULT_HOST = '127.0.0.1'
+    DEFAULT_PORT = 7000
+    CHANNEL_OFFSETS = {'blockchain': 0, 'election': 100}
+    RETRY_INTERVAL = 0.2  # seconds before reconnecting after a failed connect or write, doubled on every further failure
+    MAX_RETRY_INTERVAL = 5.0
+    MAX_FRAME = 16 * 1024 * 1024  # bytes of a frame body, longer frames are refused on both ends
+    MAX_OUTBOX = 10000
+    MAX_IN_FLIGHT = 16
+
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop = None, addresses: dict = None,
+                 base_port: int = DEFAULT_PORT, max_in_flight: int = MAX_IN_FLIGHT):
+        """
+        :param channel: str. 'blockchain' or 'election'.
+        :param loop: event loop of a MessagingCore. Without one the transport runs its own loop thread and delivers
+        received messages on a dispatch thread.
+        :param addresses: dict. node id -> (host, port), overrides the default addresses.
+        :param base_port: int. Port of node '0' on the blockchain channel.
+        :param max_in_flight: int. Maximum number of destinations connected to or written to at the same time.
+        """
+        super().__init__(channel, loop)
+        self.addresses = addresses or {}
+        self.base_port = base_port
+        self.max_in_flight = max_in_flight
+        self.in_flight = None  # Semaphore, created on the loop
+        self.writers = {}  # destination -> (StreamReader, StreamWriter), the reader only tells when the peer closed
+        self.outboxes = {}  # destination -> deque of (frame, Future) not sent yet
+        self.flushers = {}  # destination -> Task sending its outbox
+        self.connections = {}  # Task reading an accepted connection -> its StreamWriter
+        self.server = None
+        self.shared_loop = loop is not None
+        if not self.shared_loop:
+            self.loop = asyncio.new_event_loop()
+            Thread(target=self.loop.run_forever, name='TCP Transport Thread ' + channel, daemon=True).start()
+
+    @classmethod
+    def default_address(cls, channel: str, position: int, base_port: int = DEFAULT_PORT) -> tuple:
+        """
+        Returns the address a node listens at unless it is configured.
+
+        :param channel: str. 'blockchain' or 'election'.
+        :param position: int. Position of the node in its cluster, below CHANNEL_OFFSETS['election'].
+        :param base_port: int. Port of the first node on the blockchain channel.
+        :return: tuple. (host, port)
+        """
+        return cls.DEFAULT_HOST, base_port + cls.CHANNEL_OFFSETS[channel] + position
+
+    def address_of(self, node_id: str) -> tuple:
+        if node_id in self.addresses:
+            return self.addresses[node_id]
+        if not node_id.isdigit():
+            raise ValueError('no address for node {}, pass the addresses of its cluster (see Cluster.tcp_addresses)'
+                             .format(node_id))
+        return self.default_address(self.channel, int(node_id), self.base_port)
+
+    def start(self, address: str, deliver):
+        if self.shared_loop:
+            self.address = address
+            self.deliver = deliver
+        else:
+            super().start(address, deliver)
+        host, port = self.address_of(address)
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle_connection, host, port), self.loop).result()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                length, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                if length > self.MAX_FRAME:  # corrupt or hostile, nothing after it can be framed either
+                    print('closing connection to {} on {}: frame of {} bytes'.format(
+                        self.address, self.channel, length))
+                    break
+                self.receive(decode_frame(await reader.readexactly(length)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    def receive(self, message: dict):
+        if self.shared_loop:
+            self.deliver(message)
+        else:
+            super().receive(message)
+
+    def send(self, message: dict, destination: str) -> Future:
+        """
+        Queues a message for destination and returns without waiting for the network.
+
+        :param message: dict. str keys, str or bytes values.
+        :param destination: str. Node id.
+        :return: Future. Resolves to True once the message was written to the connection to destination.
+        """
+        return self.broadcast(message, (destination,))[destination]
+
+    def broadcast(self, message: dict, destinations) -> dict:
+        """
+        Queues a message for several destinations, encoded once.
+
+        :param message: dict. str keys, str or bytes values.
+        :param destinations: iterable of node ids.
+        :return: dict. destination -> Future, see send.
+        """
+        frame = encode_frame(message)
+        futures = {destination: Future() for destination in destinations}
+        if len(frame) - FRAME_HEADER.size > self.MAX_FRAME:
+            for future in futures.values():
+                future.set_exception(ValueError('frame of {} bytes exceeds MAX_FRAME'.format(len(frame))))
+            return futures
+        self.loop.call_soon_threadsafe(self.enqueue, frame, futures)
+        return futures
+
+    def enqueue(self, frame: bytes, futures: dict):
+        for destination, future in futures.items():
+            outbox = self.outboxes.get(destination)
+            if outbox is None:
+                outbox = self.outboxes[destination] = collections.deque()
+            if len(outbox) >= self.MAX_OUTBOX:
+                outbox.popleft()[1].set_exception(OverflowError('outbox to {} full'.format(destination)))
+            outbox.append((frame, future))
+            if destination not in self.flushers:
+                self.flushers[destination] = self.loop.create_task(self.flush(destination))
+
+    async def flush(self, destination: str):
+        """
+        Sends the outbox of destination, connecting and reconnecting as needed, until it is empty. After a failed
+        connect or write it waits RETRY_INTERVAL, doubled on every further failure up to MAX_RETRY_INTERVAL.
+
+        :param destination: str. Node id.
+        :return: None
+        """
+        outbox = self.outboxes[destination]
+        if self.in_flight is None:
+            self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        delay = self.RETRY_INTERVAL
+        try:
+            while outbox:
+                async with self.in_flight:
+                    reader, writer = self.writers.get(destination, (None, None))
+                    if reader is not None and reader.at_eof():
+                        # the peer closed the connection, e.g. it restarted: a write would still succeed locally and
+                        # the frames would be lost
+                        writer.close()
+                        del self.writers[destination]
+                        writer = None
+                    if writer is None:
+                        try:
+                            reader, writer = await asyncio.open_connection(*self.address_of(destination))
+                        except OSError:
+                            writer = None
+                        else:
+                            self.writers[destination] = reader, writer
+                    if writer is not None:
+                        entries = list(outbox)
+                        outbox.clear()
+                        try:
+                            writer.write(b''.join([frame for frame, _ in entries]))
+                            await writer.drain()
+                        except OSError:
+                            writer.close()
+                            del self.writers[destination]
+                            outbox.extendleft(reversed(entries))
+                        else:
+                            for _, future in entries:
+                                future.set_result(True)
+                            delay = self.RETRY_INTERVAL
+                            continue
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, self.MAX_RETRY_INTERVAL)
+        finally:
+            del self.flushers[destination]
+
+    def close(self):
+        async def shutdown():
+            if self.server is not None:
+                self.server.close()
+            for task in self.flushers.values():
+                task.cancel()
+            for writer in self.connections.values():
+                writer.close()  # ends handle_connection with an IncompleteReadError
+            await asyncio.gather(*self.flushers.values(), *self.connections, return_exceptions=True)
+            for _, writer in self.writers.values():
+                writer.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        if not self.shared_loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            super().close()
+
+
+class SqsTransport(Transport):
+    """
+    Transport over the original, hardcoded AWS SQS FIFO queues, one queue per node and channel. boto3 is only imported
+    when this transport is used; any client with the same methods can be passed instead, e.g. LocalSqs.
+
+    SQS is used in batches: the listener long polls for up to max_batch messages per receive and acknowledges them with
+    one delete_message_batch, and sent messages are coalesced per destination for send_window seconds into
+    send_message_batch calls of up to max_batch messages and MAX_BATCH_BYTES. Messages keep their order per destination,
+    destinations are sent to concurrently by up to max_in_flight threads. All transports of a process share one boto3
+    client and its connection pool.
+
+    Attributes
+    ----------
+    calls : Counter
+        API calls made by this transport and messages sent and received, see the LocalSqs benchmark.
+    """
+    name = 'sqs'
+    QUEUE_PREFIXES = {
+        'blockchain': 'https://sqs.us-east-1.amazonaws.com/622058021374/',
+        'election': 'https://sqs.us-east-1.amazonaws.com/622058021374/election'
+    }
+    MAX_BATCH = 10  # SQS limit of messages per batch call
+    MAX_BATCH_BYTES = 256 * 1024  # SQS limit of the payload of a batch call
+    WAIT_TIME = 20  # seconds of long polling, the SQS maximum
+    SEND_WINDOW = 0.005
+    MAX_IN_FLIGHT = 8
+    RETRY_INTERVAL = 0.5  # seconds before receiving again after a failed call, doubled on every further failure
+    MAX_RETRY_INTERVAL = 30.0
+    shared_clients = []  # the boto3 client of the process, created on first use
+    shared_clients_lock = Lock()
+
+    @classmethod
+    def queue_url(cls, channel: str, node_id: str) -> str:
+        """
+        Returns the URL of the queue of a node in the original SQS setup, e.g. .../election2.fifo.
+        """
+        return cls.QUEUE_PREFIXES[channel] + node_id + '.fifo'
+
+    @classmethod
+    def shared_client(cls):
+        """
+        Returns the boto3 SQS client shared by all transports of the process. boto3 clients are thread safe; its pool
+        has a connection for every listener and concurrent send of a node's transports.
+        """
+        with cls.shared_clients_lock:
+            if not cls.shared_clients:
+                import boto3, botocore.config
+                config = botocore.config.Config(max_pool_connections=2 * (cls.MAX_IN_FLIGHT + 1))
+                cls.shared_clients.append(boto3.client('sqs', config=config))  # make a new SQS object
+            return cls.shared_clients[0]
+
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop = None, queue_urls: dict = None, client=None,
+                 max_batch: int = MAX_BATCH, wait_time: int = WAIT_TIME, send_window: float = SEND_WINDOW,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        """
+        :param channel: str. 'blockchain' or 'election'.
+        :param loop: unused, boto3 calls block so SQS is served by its own threads.
+        :param queue_urls: dict. node id -> queue URL, nodes not listed use the queue names of the original setup.
+        :param client: SQS client, defaults to the boto3 client shared by the process.
+        :param max_batch: int. Maximum number of messages per receive and send call, 1 to 10.
+        :param wait_time: int. Seconds a receive waits for messages.
+        :param send_window: float. Seconds outgoing messages are collected before they are sent.
+        :param max_in_flight: int. Maximum number of destinations sent to at the same time.
+        """
+        super().__init__(channel, loop)
+        self.sqs = client if client is not None else self.shared_client()
+        self.queue_urls = queue_urls or {}
+        self.max_batch = max_batch
+        self.wait_time = wait_time
+        self.send_window = send_window
+        self.msg_count = 0
+        self.outboxes = collections.OrderedDict()  # destination -> list of (batch entry, Future)
+        self.outbox_condition = Condition()
+        self.sending = 0  # entries taken from the outboxes and not sent yet
+        self.closed = False
+        self.calls = collections.Counter()
+        self.calls_lock = Lock()
+        self.senders = ThreadPoolExecutor(max_in_flight, thread_name_prefix='Outgoing Message Thread ' + channel)
+        Thread(target=self.send_batches, name='Outgoing Message Thread ' + channel, daemon=True).start()
+
+    def url_of(self, node_id: str) -> str:
+        return self.queue_urls.get(node_id) or self.queue_url(self.channel, node_id)
+
+    def start(self, address: str, deliver):
+        """
+        Starts the thread that pulls messages from the queue of address and delivers them.
+        """
+        self.address = address
+        self.deliver = deliver
+        Thread(target=self.listen_for_messages, name='Incoming Message Thread' + address, daemon=True).start()
+
+    def listen_for_messages(self):
+        ''' loop that pulls messages from the SQS queue of this node
+
+        messages attributes are kept in dictionary form and represent the
+        message intended to be received. A receive waits up to wait_time
+        seconds for messages, so an idle node makes one call per wait_time.
+        '''
+        incoming_queue_URL = self.url_of(self.address)
+        retry_interval = self.RETRY_INTERVAL
+        while not self.closed:
+            messages = None
+            try:
+                # response stores results of receive call from SQS
+                response = self.sqs.receive_message(
+                    QueueUrl=incoming_queue_URL,
+                    MaxNumberOfMessages=self.max_batch,
+                    MessageAttributeNames=['All'],
+                    WaitTimeSeconds=self.wait_time
+                )
+                self.calls['receive_message'] += 1
+
+                # check if messages were received. if not, poll again
+                messages = response.get('Messages')
+                if not messages:
+                    retry_interval = self.RETRY_INTERVAL
+                    continue
+                self.calls['received'] += len(messages)
+
+                # delete the messages after receiving, the receipt handles identify them in the queue
+                response = self.sqs.delete_message_batch(
+                    QueueUrl=incoming_queue_URL,
+                    Entries=[{'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+                             for i, message in enumerate(messages)]
+                )
+                self.calls['delete_message_batch'] += 1
+                for failed in response.get('Failed', []):
+                    print("Receipt Handle Expired", failed.get('Code', ''))
+                retry_interval = self.RETRY_INTERVAL
+            except Exception as e:  # the client raises for throttling, connection and permission errors
+                # a failure must not stop the listener, or the node silently stops receiving
+                self.calls['receive_errors'] += 1
+                print('Receiving from {} failed, retrying in {:.1f} s: {!r}'.format(incoming_queue_URL,
+                                                                                    retry_interval, e))
+                time.sleep(retry_interval)
+                retry_interval = min(2 * retry_interval, self.MAX_RETRY_INTERVAL)
+            # messages whose delete failed come back after their visibility timeout, the duplicate is dropped by the
+            # node (mempool and gossip ids), so they are delivered now rather than lost
+            for message in messages or ():
+                self.deliver(self.reduce_message(message['MessageAttributes']))
+
+    @staticmethod
+    def reduce_message(SQSmessage: dict) -> dict:
+        msg = {}
+        for key, value in SQSmessage.items():
+            msg[key] = value['StringValue'] if 'StringValue' in value else value['BinaryValue']
+        return msg
+
+    @staticmethod
+    def format_for_SQS(message: dict) -> dict:
+        '''str values are sent as String attributes, bytes values (binary codec) as Binary attributes'''
+        SQSmsg = {}
+        for key, value in message.items():
+            if isinstance(value, bytes):
+                SQSmsg[key] = {'DataType': 'Binary', 'BinaryValue': value}
+            else:
+                SQSmsg[key] = {'DataType': 'String', 'StringValue': value}
+        return SQSmsg
+
+    @staticmethod
+    def entry_size(entry: dict) -> int:
+        """
+        Returns the size SQS counts for a batch entry: body plus attribute names, types and values.
+        """
+        size = len(entry['MessageBody'])
+        for key, value in entry['MessageAttributes'].items():
+            size += len(key) + len(value['DataType'])
+            size += len(value['BinaryValue']) if 'BinaryValue' in value else len(value['StringValue'].encode('utf-8'))
+        return size
+
+    def send(self, message: dict, destination: str) -> Future:
+        """
+        Queues a message for the next batch to destination and returns without waiting for SQS.
+
+        :param message: dict. str keys, str or bytes values.
+        :param destination: str. Node id.
+        :return: Future. Resolves to True once SQS accepted the message.
+        """
+        return self.broadcast(message, (destination,))[destination]
+
+    def broadcast(self, message: dict, destinations) -> dict:
+        """
+        Queues a message for the next batches to several destinations, converted to SQS attributes once.
+
+        :param message: dict. str keys, str or bytes values.
+        :param destinations: iterable of node ids.
+        :return: dict. destination -> Future, see send.
+        """
+        attributes = self.format_for_SQS(message)
+        futures = {}
+        with self.outbox_condition:
+            for destination in destinations:
+                # used to uniquely identify messages:
+                self.msg_count += 1
+                # included to ensure all messages have a different non-duplication hash:
+                timestamp = str(datetime.now())
+                message_body = 'Message # {} from {}. {}'.format(self.msg_count, self.address, timestamp)
+                entry = {
+                    'Id': str(self.msg_count),
+                    'MessageAttributes': attributes,
+                    'MessageGroupId': 'queue',
+                    'MessageBody': message_body
+                }
+                futures[destination] = Future()
+                self.outboxes.setdefault(destination, []).append((entry, futures[destination]))
+            self.outbox_condition.notify_all()
+        return futures
+
+    def batches(self, entries: list):
+        """
+        Splits the entries for one destination into batches within the SQS limits, in order.
+        """
+        batch, size = [], 0
+        for entry, future in entries:
+            entry_size = self.entry_size(entry)
+            if batch and (len(batch) == self.max_batch or size + entry_size > self.MAX_BATCH_BYTES):
+                yield batch
+                batch, size = [], 0
+            batch.append((entry, future))
+            size += entry_size
+        if batch:
+            yield batch
+
+    def send_batches(self):
+        """
+        Loop that sends the queued messages. Once a message is queued it waits send_window seconds so messages sent
+        shortly after it share its batch calls, unless a full batch is waiting already. The batches of every
+        destination are sent in order, the destinations concurrently.
+        """
+        while True:
+            with self.outbox_condition:
+                while not self.outboxes:
+                    if self.closed:
+                        return
+                    self.outbox_condition.wait()
+                deadline = time.monotonic() + self.send_window
+                while not self.closed and all(len(entries) < self.max_batch for entries in self.outboxes.values()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.outbox_condition.wait(remaining)
+                outboxes, self.outboxes = self.outboxes, collections.OrderedDict()
+                self.sending = sum(len(entries) for entries in outboxes.values())
+            if len(outboxes) == 1:
+                self.send_destination(*outboxes.popitem())
+            else:
+                wait([self.senders.submit(self.send_destination, destination, entries)
+                      for destination, entries in outboxes.items()])
+            with self.outbox_condition:
+                self.sending = 0
+                self.outbox_condition.notify_all()
+
+    def send_destination(self, destination: str, entries: list):
+        for batch in self.batches(entries):
+            self.send_batch(destination, batch)
+
+    def send_batch(self, destination: str, batch: list):
+        """
+        Sends one batch and resolves the futures of its messages.
+        """
+        futures = {entry['Id']: future for entry, future in batch}
+        try:
+            response = self.sqs.send_message_batch(QueueUrl=self.url_of(destination),
+                                                   Entries=[entry for entry, _ in batch])
+        except Exception as e:  # the client raises for throttling, connection and permission errors
+            print('Messages to {} not sent: {!r}'.format(destination, e))
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        with self.calls_lock:
+            self.calls['send_message_batch'] += 1
+            self.calls['sent'] += len(response.get('Successful', []))
+        for successful in response.get('Successful', []):
+            futures[successful['Id']].set_result(True)
+        for failed in response.get('Failed', []):
+            print('Message {} to {} not sent: {}'.format(failed['Id'], destination, failed.get('Code', '')))
+            futures[failed['Id']].set_exception(RuntimeError(failed.get('Code', 'send failed')))
+
+    def flush(self):
+        """
+        Waits until every queued message was handed to SQS.
+        """
+        with self.outbox_condition:
+            while self.outboxes or self.sending:
+                self.outbox_condition.wait()
+
+    def close(self):
+        self.flush()
+        with self.outbox_condition:
+            self.closed = True
+            self.outbox_condition.notify_all()
+        self.senders.shutdown(wait=False)
+
+
+TRANSPORTS = {transport.name: transport for transport in (InProcessTransport, TcpTransport, SqsTransport)}
+
+
+def get_transport(transport, channel: str, loop: asyncio.AbstractEventLoop = None) -> Transport:
+    """
+    Returns a transport for a channel.
+
+    :param transport: str or Transport. 'inprocess', 'tcp' or 'sqs', or an already constructed transport.
+    :param channel: str. 'blockchain' or 'election'.
+    :param loop: event loop of a MessagingCore to run the transport on.
+    :return: Transport.
+    """
+    if isinstance(transport, Transport):
+        return transport
+    return TRANSPORTS[transport](channel, loop)
+
+
+if __name__ == '__main__':
+    # Benchmark: round trip latency between two nodes, per local transport.
+    # usage: python Transport.py [round trips]
+    import sys
+    round_trips = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payload = {'type': 'Block', 'contents': bytes(2000), 'codec': 'binary'}
+    for name in ('inprocess', 'tcp'):
+        ping, pong = get_transport(name, 'blockchain'), get_transport(name, 'blockchain')
+        replies = queue.Queue()
+        pong.start('1', lambda message: pong.send(message, '0'))
+        ping.start('0', replies.put)
+        start = time.perf_counter()
+        for _ in range(round_trips):
+            ping.send(payload, '1')
+            reply = replies.get()
+        elapsed = time.perf_counter() - start
+        print('{:9} round trip {:.3f} ms, equal: {}'.format(name, elapsed / round_trips * 1000, reply == payload))
+        ping.close()
+        pong.close()
+
+    # Broadcast latency by number of peers: SQS with a simulated 5 ms round trip, one destination at a time (the
+    # previous behaviour) vs. max_in_flight destinations at a time, and TCP.
+    from LocalSqs import LocalSqs
+    broadcasts = 20
+    print('peers  sqs 1 in flight  sqs 8 in flight  tcp (ms per broadcast)')
+    for n_peers in (3, 7, 15, 31, 63):
+        peers = [str(node) for node in range(1, n_peers + 1)]
+        latencies = []
+        for max_in_flight in (1, 8):
+            sender = SqsTransport('blockchain', client=LocalSqs(0.005), queue_urls={node: node for node in peers},
+                                  send_window=0, max_in_flight=max_in_flight)
+            start = time.perf_counter()
+            for _ in range(broadcasts):
+                results = broadcast_results(sender.broadcast(payload, peers))
+            latencies.append((time.perf_counter() - start) / broadcasts * 1000)
+            sender.close()
+        receivers = [TcpTransport('blockchain', base_port=7600) for _ in peers]
+        for node, receiver in zip(peers, receivers):
+            receiver.start(node, lambda message: None)
+        sender = TcpTransport('blockchain', base_port=7600)
+        start = time.perf_counter()
+        for _ in range(broadcasts):
+            results = broadcast_results(sender.broadcast(payload, peers))
+        latencies.append((time.perf_counter() - start) / broadcasts * 1000)
+        for transport in receivers + [sender]:
+            transport.close()
+        print('{:>5} {:>16.1f} {:>16.1f} {:>5.2f}   all sent: {}'.format(n_peers, *latencies,
+                                                                       all(r is True for r in results.values())))
@@ -0,0 +1,188 @@
+from SignatureVerifier import SignatureVerifier
+from Signer import verify as verify_signature, public_pem, load_public_key
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+import os
+
+_loaded_keys = {}  # PEM -> public key, per worker process
+
+
+def verify_pem(pem: bytes, message: bytes, signature: str) -> bool:
+    """
+    Checks a signature in a worker process. Key objects cannot be sent between processes, so the key is sent as PEM and
+    loaded once per process.
+
+    :param pem: bytes. PEM encoded public key.
+    :param message: bytes. Signed message.
+    :param signature: str. Hex signature.
+    :return: bool.
+    """
+    public_key = _loaded_keys.get(pem)
+    if public_key is None:
+        public_key = _loaded_keys[pem] = load_public_key(pem)
+    return verify_signature(public_key, message, signature)
+
+
+def all_valid(futures: list) -> Future:
+    """
+    Combines the futures of single signature checks into one future.
+
+    :param futures: list of Future objects resolving to bool.
+    :return: Future. Resolves to True once every check passed, to False as soon as all are done and any failed.
+    """
+    combined = Future()
+    if not futures:
+        combined.set_result(True)
+        return combined
+    remaining = [len(futures)]
+    lock = Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            combined.set_result(all([future.result() for future in futures]))
+        except Exception as e:
+            combined.set_exception(e)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+class VerificationPool:
+    """
+    Runs the signature checks of a SignatureVerifier on a pool of workers, so a block with many signers does not hold
+    up the thread that received it and the signatures of a block are checked in parallel. Threads are used by default,
+    cryptography releases the GIL while verifying; processes can be used instead. Cached signatures are
+    answered without touching the pool.
+
+    Attributes
+    ----------
+    verifier : SignatureVerifier
+        public keys and cache of verified signatures.
+    workers : int
+        number of worker threads or processes.
+    use_processes : bool
+        whether the pool runs processes instead of threads.
+
+    Methods
+    ----------
+    submit_block(block: Block)
+        Fans the signature checks of a block out to the pool. Returns a future resolving to True if all are valid.
+    verify_blocks(blocks: iterable)
+        Checks the signatures of many blocks at once, e.g. a range of historical blocks.
+    shutdown()
+        Stops the workers.
+    """
+
+    def __init__(self, verifier: SignatureVerifier, workers: int = None, use_processes: bool = False):
+        """
+        Constructor for a VerificationPool.
+
+        :param verifier: SignatureVerifier. Verifier whose keys and cache are used.
+        :param workers: int. Number of workers, defaults to the number of CPUs.
+        :param use_processes: bool. Use worker processes instead of threads.
+        """
+        self.verifier = verifier
+        self.workers = workers or os.cpu_count()
+        self.use_processes = use_processes
+        if use_processes:
+            from concurrent.futures import ProcessPoolExecutor  # only imported when used, it slows down startup
+            self.executor = ProcessPoolExecutor(self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='Verification Thread')
+        self.pems = {}  # signer -> (public key, PEM), for process workers
+
+    def submit(self, signature: str, message: bytes) -> Future:
+        """
+        Schedules the check of one signature.
+
+        :param signature: str. Key of Block.signatures.
+        :param message: bytes. Signed message, the header digest of the block.
+        :return: Future. Resolves to True if the signature is valid.
+        """
+        resolved = self.verifier.resolve(signature, message)
+        if resolved is None or resolved is True:
+            future = Future()
+            future.set_result(resolved is True)
+            return future
+        public_key, key, message, signature = resolved
+        if self.use_processes:
+            signer = key[0]
+            cached = self.pems.get(signer)
+            if cached is None or cached[0] is not public_key:
+                cached = self.pems[signer] = (public_key, public_pem(public_key))
+            pem = cached[1]
+            check = self.executor.submit(verify_pem, pem, message, signature)
+        else:
+            check = self.executor.submit(verify_signature, public_key, message, signature)
+        result = Future()
+
+        def checked(done: Future):
+            if done.exception() is not None:
+                result.set_exception(done.exception())
+            else:
+                result.set_result(self.verifier.remember(key, done.result()))
+
+        check.add_done_callback(checked)
+        return result
+
+    def submit_block(self, block) -> Future:
+        """
+        Fans the signature checks of a block out to the pool.
+
+        :param block: Block.
+        :return: Future. Resolves to True if every signature of the block is valid.
+        """
+        digest = bytes.fromhex(block.header_hash())
+        return all_valid([self.submit(signature, digest) for signature in block.signatures])
+
+    def verify_blocks(self, blocks) -> list:
+        """
+        Checks the signatures of many blocks at once. Every check is submitted before waiting for the first result, so
+        the pool stays busy across block boundaries.
+
+        :param blocks: iterable of Block objects, e.g. BlockChain.iter_blocks(start, stop).
+        :return: list. (block index, bool) for every block, in order.
+        """
+        futures = [(block.index, self.submit_block(block)) for block in blocks]
+        return [(index, future.result()) for index, future in futures]
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+if __name__ == '__main__':
+    # Benchmark: signature verification throughput by pool size, with the cache disabled so every check runs.
+    # usage: python VerificationPool.py [blocks] [signatures per block] [scheme]
+    import sys, time
+    from Block import Block
+    from Signer import get_signer, signature_key
+    n_blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_signers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    scheme = sys.argv[3] if len(sys.argv) > 3 else 'rsa-pss'
+    verifier = SignatureVerifier(cache_size=0)
+    block = Block(index=1)
+    for node in range(n_signers):
+        signer = get_signer(scheme).generate()
+        verifier.register(str(node), signer.public_key)
+        block.add_signature(signature_key(str(node), signer.sign(bytes.fromhex(block.header_hash()))), 1)
+    blocks = [block] * n_blocks
+
+    start = time.perf_counter()
+    valid = all(verifier.verify_block(b) for b in blocks)
+    serial = n_blocks * n_signers / (time.perf_counter() - start)
+    print('serial               {:>8.0f} signatures/s, all valid: {}'.format(serial, valid))
+    for use_processes in (False, True):
+        for workers in sorted({1, 2, 4, os.cpu_count()}):
+            pool = VerificationPool(verifier, workers, use_processes)
+            start = time.perf_counter()
+            valid = all(result for _, result in pool.verify_blocks(blocks))
+            rate = n_blocks * n_signers / (time.perf_counter() - start)
+            pool.shutdown()
+            print('{:9} x {:<2}        {:>8.0f} signatures/s ({:.1f}x), all valid: {}'.format(
+                'processes' if use_processes else 'threads', workers, rate, rate / serial, valid))
+    print('cpus: ', os.cpu_count())
@@ -0,0 +1,4 @@
+import os, sys
+
+# the modules import each other by their flat names from code/, as when they are run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code'))
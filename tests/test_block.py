@@ -0,0 +1,71 @@
+import json
+from Block import Block
+from Transaction import Transaction
+
+
+def make_block():
+    return Block(index=1, transactions=[Transaction(_to='1', _from='2', amount=2.5),
+                                        Transaction(_to='3', _from='2', amount=4.1)], prev_hash='ab' * 32)
+
+
+def test_encoding_round_trips_and_is_cached():
+    block = make_block()
+    encoded = str(block)
+    cached = block._encoded
+    assert cached is not None
+    assert str(block) == encoded and block._encoded is cached  # the second call reuses the cached parts
+    assert str(Block(encoded)) == encoded
+    assert Block(encoded).header_hash() == block.header_hash()
+
+
+def test_add_signature_changes_the_encoding_but_not_the_header():
+    block = make_block()
+    before, header_hash = str(block), block.header_hash()
+    block.add_signature('0:' + 'cd' * 64, 1.5)
+    after = str(block)
+    assert after != before
+    assert json.loads(after)['signatures'] == {'0:' + 'cd' * 64: 1.5}
+    assert json.loads(after)['transactions'] == json.loads(before)['transactions']
+    assert block.header_hash() == header_hash  # signatures are not part of the header
+
+
+def test_changed_attributes_are_stale_until_invalidate():
+    block = make_block()
+    before, header_hash = str(block), block.header_hash()
+    block.timestamp = 'changed'
+    block.prev_hash = 'ef' * 32
+    assert str(block) == before and block.header_hash() == header_hash
+    block.invalidate()
+    decoded = json.loads(str(block))
+    assert decoded['timestamp'] == 'changed' and decoded['prev_hash'] == 'ef' * 32
+    assert block.header_hash() != header_hash
+    assert block.header_hash() == Block.hash_header(block.header())
+
+
+def test_invalidate_refreezes_and_recomputes_the_merkle_root():
+    block = make_block()
+    root = block.merkle_root
+    block.transactions = list(block.transactions) + [Transaction(_to='0', _from='1', amount=1)]
+    block.invalidate()
+    assert isinstance(block.transactions, tuple)
+    assert block.merkle_root != root and block.verify_merkle_root()
+    assert len(json.loads(str(block))['transactions']) == 3
+
+
+def test_block_invalidate_drops_the_transaction_encodings():
+    block = make_block()
+    str(block)
+    tx = block.transactions[0]
+    tx.amount = 99
+    block.invalidate()
+    assert json.loads(json.loads(str(block))['transactions'][0])['amount'] == 99
+
+
+def test_transaction_invalidate():
+    tx = Transaction(_to='1', _from='0', amount=2)
+    before = str(tx)
+    tx.amount = 99
+    assert str(tx) == before
+    tx.invalidate()
+    assert json.loads(str(tx))['amount'] == 99
+    assert str(Transaction(str(tx))) == str(tx)
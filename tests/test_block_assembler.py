@@ -0,0 +1,92 @@
+import random
+import pytest
+from Block import Block
+from BlockAssembler import BlockAssembler, encoded_size
+from Codec import get_codec
+from Transaction import Transaction
+
+BALANCES = {'0': 10, '1': 10, '2': 10, '3': 10}
+
+
+def pending(n, seed=0):
+    rng = random.Random(seed)
+    return [Transaction(_to=rng.choice('0123'), _from=rng.choice('0123'), amount=0.01, fee=rng.choice([0, 0.01, 0.05]))
+            for _ in range(n)]
+
+
+def block_message_size(codec, transactions):
+    empty = len(codec.encode_message('Block', {'block': Block.from_fields(1, 'now', [], {})})['contents'])
+    full = len(codec.encode_message('Block', {'block': Block.from_fields(1, 'now', transactions, {})})['contents'])
+    return full - empty
+
+
+@pytest.mark.parametrize('codec', ['json', 'binary'])
+def test_size_is_measured_in_the_message_as_sent(codec):
+    codec = get_codec(codec)
+    transactions = pending(50)
+    measured = sum(encoded_size(tx, codec) for tx in transactions)
+    assert abs(block_message_size(codec, transactions) - measured) <= 2  # the last transaction has no separator
+
+
+@pytest.mark.parametrize('codec', ['json', 'binary'])
+def test_selection_stays_within_max_bytes(codec):
+    assembler = BlockAssembler(max_transactions=10000, max_bytes=20000, codec=codec)
+    selected, _ = assembler.select(pending(2000))
+    assert block_message_size(assembler.codec, selected) <= assembler.max_bytes
+    assert block_message_size(assembler.codec, selected + pending(1, seed=1)) > assembler.max_bytes - 300
+
+
+def test_json_size_counts_both_escape_levels():
+    tx = pending(1)[0]
+    assert encoded_size(tx, get_codec('json')) > len(str(tx)) + 2 * str(tx).count('"')
+
+
+def test_max_transactions():
+    selected, _ = BlockAssembler(max_transactions=7).select(pending(100))
+    assert len(selected) == 7
+
+
+def test_a_large_candidate_is_skipped_for_smaller_ones():
+    small = pending(3)
+    large = Transaction.from_fields('1', '0', 0.01, small[0].timestamp, 'x' * 500)
+    budget = sum(encoded_size(tx) for tx in small) + 10
+    selected, _ = BlockAssembler(max_bytes=budget).select([small[0], large] + small[1:])
+    assert selected == small
+
+
+@pytest.mark.parametrize('priority, key', [('age', None), ('fee', lambda tx: -tx.fee), ('amount', lambda tx: -tx.amount)])
+def test_priority_order(priority, key):
+    candidates = pending(30)
+    selected, _ = BlockAssembler(max_transactions=30, priority=priority).select(candidates)
+    assert selected == (candidates if key is None else sorted(candidates, key=key))
+
+
+def test_solvency_admits_in_order_and_keeps_order_dependent_rejects_pending():
+    spend = [Transaction(_to='1', _from='2', amount=6), Transaction(_to='3', _from='2', amount=6),
+             Transaction(_to='1', _from='2', amount=3), Transaction(_to='1', _from='2', amount=11)]
+    selected, invalid = BlockAssembler().select(spend, BALANCES)
+    assert selected == [spend[0], spend[2]]
+    assert invalid == [spend[3].unique_id]
+
+
+def test_received_amounts_fund_later_spends():
+    spend = [Transaction(_to='0', _from='1', amount=10), Transaction(_to='2', _from='0', amount=15)]
+    selected, invalid = BlockAssembler().select(spend, BALANCES)
+    assert selected == spend and invalid == []
+
+
+def test_rewards_are_not_checked():
+    reward = Transaction(_to='0', _from='reward', amount=50)
+    assert BlockAssembler().select([reward], BALANCES) == ([reward], [])
+
+
+def test_no_balances_skips_the_solvency_check():
+    spend = [Transaction(_to='1', _from='2', amount=100)]
+    assert BlockAssembler().select(spend) == (spend, [])
+
+
+def test_skipped_by_size_does_not_change_the_balances():
+    large = Transaction.from_fields('1', '2', 10, pending(1)[0].timestamp, 'x' * 500)
+    small = Transaction(_to='3', _from='2', amount=10)
+    selected, invalid = BlockAssembler(max_bytes=encoded_size(small) + 10).select([large, small], BALANCES)
+    assert selected == [small] and invalid == []
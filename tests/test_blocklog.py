@@ -0,0 +1,120 @@
+import os
+import pytest
+from BlockLog import BlockLog
+
+
+def fill(log, n, prefix='block '):
+    return [log.append((prefix + str(i)).encode()) for i in range(n)]
+
+
+def test_round_trip_across_segments_and_reopen(tmp_path):
+    log = BlockLog(str(tmp_path), segment_size=64)
+    assert fill(log, 20) == list(range(20))
+    assert len(os.listdir(str(tmp_path))) > 2  # several segments and the index
+    assert log.read(7) == b'block 7'
+    assert log.read(-1) == b'block 19'
+    log.close()
+    reopened = BlockLog(str(tmp_path), segment_size=64)
+    assert [payload.decode() for payload in reopened] == ['block ' + str(i) for i in range(20)]
+    reopened.close()
+
+
+def test_empty_payload(tmp_path):
+    log = BlockLog(str(tmp_path))
+    log.append(b'')
+    log.append(b'after')
+    assert log.read(0) == b'' and log.read(1) == b'after'
+    log.close()
+
+
+@pytest.mark.parametrize('position', [20, -21])
+def test_read_out_of_range(tmp_path, position):
+    log = BlockLog(str(tmp_path), segment_size=64)
+    fill(log, 20)
+    with pytest.raises(IndexError):
+        log.read(position)
+    log.close()
+
+
+def test_truncate_drops_records_and_later_segments(tmp_path):
+    log = BlockLog(str(tmp_path), segment_size=64)
+    fill(log, 20)
+    log.read(19)  # maps the last segment, truncating must drop the mapping
+    log.truncate(4)
+    assert len(log) == 4
+    segment, offset = log.tail()
+    assert not os.path.exists(log.segment_path(segment + 1))
+    assert os.path.getsize(log.segment_path(segment)) == offset
+    assert log.append(b'block 4 replaced') == 4
+    log.close()
+    reopened = BlockLog(str(tmp_path), segment_size=64)
+    assert [payload.decode() for payload in reopened] == ['block 0', 'block 1', 'block 2', 'block 3',
+                                                           'block 4 replaced']
+    reopened.close()
+
+
+def test_truncate_to_zero_and_past_the_end(tmp_path):
+    log = BlockLog(str(tmp_path), segment_size=64)
+    fill(log, 5)
+    log.truncate(10)
+    assert len(log) == 5
+    log.truncate(0)
+    assert len(log) == 0 and log.tail() == (0, 0)
+    assert os.path.getsize(log.index_path) == 0
+    log.append(b'again')
+    assert list(log) == [b'again']
+    log.close()
+
+
+def test_torn_index_entry_is_dropped(tmp_path):
+    log = BlockLog(str(tmp_path))
+    fill(log, 3)
+    log.close()
+    with open(os.path.join(str(tmp_path), 'index'), 'ab') as index:
+        index.write(b'\x00' * (BlockLog.INDEX_ENTRY.size - 5))  # crash in the middle of writing an entry
+    reopened = BlockLog(str(tmp_path))
+    assert len(reopened) == 3
+    assert os.path.getsize(reopened.index_path) == 3 * BlockLog.INDEX_ENTRY.size
+    assert reopened.append(b'block 3') == 3
+    assert list(reopened) == [b'block 0', b'block 1', b'block 2', b'block 3']
+    reopened.close()
+
+
+def test_entry_pointing_past_its_segment_is_dropped(tmp_path):
+    log = BlockLog(str(tmp_path))
+    fill(log, 3)
+    segment, offset, length = log.entry(2)
+    log.close()
+    with open(BlockLog(str(tmp_path), read_only=True).segment_path(segment), 'r+b') as segment_file:
+        segment_file.truncate(offset + length - 1)  # the record was cut short, its index entry made it to disk
+    reopened = BlockLog(str(tmp_path))
+    assert len(reopened) == 2
+    assert reopened.tail() == (segment, offset)
+    assert reopened.append(b'block 2') == 2
+    assert list(reopened) == [b'block 0', b'block 1', b'block 2']
+    reopened.close()
+
+
+def test_read_only_does_not_repair(tmp_path):
+    log = BlockLog(str(tmp_path))
+    fill(log, 2)
+    log.close()
+    index_path = os.path.join(str(tmp_path), 'index')
+    with open(index_path, 'ab') as index:
+        index.write(b'\x00' * 3)
+    size = os.path.getsize(index_path)
+    reader = BlockLog(str(tmp_path), read_only=True)
+    assert list(reader) == [b'block 0', b'block 1']
+    reader.close()
+    assert os.path.getsize(index_path) == size
+
+
+def test_read_only_never_creates_anything(tmp_path):
+    missing = tmp_path / 'missing'
+    with pytest.raises(FileNotFoundError):
+        BlockLog(str(missing), read_only=True)
+    assert not missing.exists()
+    (tmp_path / 'empty').mkdir()
+    with pytest.raises(FileNotFoundError):
+        BlockLog(str(tmp_path / 'empty'), read_only=True)
+    assert list((tmp_path / 'empty').iterdir()) == []
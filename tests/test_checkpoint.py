@@ -0,0 +1,60 @@
+import pytest
+from Block import Block
+from BlockChain import BlockChain
+from Checkpoint import Checkpointer, block_digest
+from Ledger import Ledger
+from Transaction import Transaction
+
+BALANCES = {'0': 100, '1': 100}
+
+
+@pytest.fixture
+def node_dir(tmp_path, monkeypatch):
+    (tmp_path / 'code').mkdir()
+    monkeypatch.chdir(tmp_path / 'code')  # chain, ledger and checkpoint live in ../files
+    return tmp_path
+
+
+def commit(chain, ledger, checkpointer, index, amount=1):
+    block = Block(index=index, transactions=[Transaction(_to='1', _from='0', amount=amount)],
+                  prev_hash=chain.get_block(index - 1).header_hash())
+    chain.add_block(block)
+    ledger.add_transactions(block.transactions, block.index)
+    checkpointer.maybe_save(chain, ledger)
+    return block
+
+
+def test_checkpoint_every_interval(node_dir):
+    ledger = Ledger('0', BALANCES)
+    chain, checkpointer = BlockChain('0', ledger), Checkpointer('0', interval=3)
+    for index in range(1, 6):
+        commit(chain, ledger, checkpointer, index)
+    assert checkpointer.last_index == 3
+    assert checkpointer.load()['index'] == 3 and checkpointer.load()['balances'] == {'0': 97, '1': 103}
+
+
+def test_fork_below_the_checkpoint_writes_a_new_one(node_dir):
+    ledger = Ledger('0', BALANCES)
+    chain, checkpointer = BlockChain('0', ledger), Checkpointer('0', interval=3)
+    for index in range(1, 5):
+        commit(chain, ledger, checkpointer, index)
+    assert checkpointer.load()['index'] == 3
+    fork = commit(chain, ledger, checkpointer, 2, amount=5)  # replaces blocks 2 to 4
+    checkpoint = checkpointer.load()
+    assert checkpoint['index'] == 2 and checkpoint['digest'] == block_digest(fork)
+    assert checkpoint['balances'] == {'0': 94, '1': 106}
+    assert checkpointer.last_index == 2
+
+
+def test_restart_restores_from_the_checkpoint(node_dir, capsys):
+    ledger = Ledger('0', BALANCES)
+    chain, checkpointer = BlockChain('0', ledger), Checkpointer('0', interval=3)
+    for index in range(1, 6):
+        commit(chain, ledger, checkpointer, index)
+    chain.blockchain.close()
+    ledger = Ledger('0', BALANCES)
+    chain = BlockChain('0', ledger)
+    replayed = Checkpointer('0', interval=3).restore(chain, ledger, validate=True, processes=1)
+    assert replayed == 2  # blocks 4 and 5
+    assert dict(ledger.blockchain_balances.tip) == {'0': 95, '1': 105}
+    assert 'Chain validated' in capsys.readouterr().out
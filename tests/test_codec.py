@@ -0,0 +1,131 @@
+import pytest
+from Block import Block
+from Codec import HAS_FEE, HAS_SIGNER, RAW_HEX, BinaryCodec, Reader, decode_message, get_codec, write_varint
+from Transaction import Transaction
+
+binary = BinaryCodec()
+
+
+def same_transaction(a, b):
+    return a.to_dict() == b.to_dict() and type(a.amount) is type(b.amount) and type(a.fee) is type(b.fee)
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 2 ** 32, 2 ** 63 - 1])
+def test_varint_round_trip(value):
+    out = bytearray()
+    write_varint(out, value)
+    assert Reader(bytes(out)).varint() == value
+
+
+@pytest.mark.parametrize('value', [0, -1, 1, -64, 64, -2 ** 40, 2 ** 40, 0.0, -2.5, 1e-9, 1.25])
+def test_number_round_trip(value):
+    out = bytearray()
+    binary.write_value(out, value)
+    decoded = binary.read_value(Reader(bytes(out)))
+    assert decoded == value and type(decoded) is type(value)
+
+
+def test_transaction_without_fee():
+    tx = Transaction(_to='1', _from='0', amount=2)
+    payload = binary.encode_transaction(tx)
+    assert payload[0] == RAW_HEX  # no HAS_FEE
+    assert same_transaction(binary.decode_transaction(payload), tx)
+
+
+@pytest.mark.parametrize('fee', [1, 0.05])
+def test_transaction_with_fee(fee):
+    tx = Transaction(_to='1', _from='0', amount=1.5, fee=fee)
+    payload = binary.encode_transaction(tx)
+    assert payload[0] == RAW_HEX | HAS_FEE
+    decoded = binary.decode_transaction(payload)
+    assert same_transaction(decoded, tx)
+    assert decoded.generateIDh() == tx.unique_id
+
+
+@pytest.mark.parametrize('unique_id', ['not hex', 'ABCDEF', 'abc'])
+def test_unique_id_that_is_not_lowercase_hex(unique_id):
+    tx = Transaction.from_fields('1', '0', 1, '2020-05-12 18:20:25.659289', unique_id)
+    payload = binary.encode_transaction(tx)
+    assert not payload[0] & RAW_HEX
+    assert binary.decode_transaction(payload).unique_id == unique_id
+
+
+def test_unicode_account_names():
+    tx = Transaction(_to='nœud-ü', _from='ノード', amount=3)
+    assert same_transaction(binary.decode_transaction(binary.encode_transaction(tx)), tx)
+
+
+def signed_block():
+    block = Block(index=300, transactions=[Transaction(_to='1', _from='0', amount=1, fee=0.5),
+                                           Transaction(_to='0', _from='reward', amount=0.25)],
+                  prev_hash='ab' * 32)
+    block.add_signature('alpha:' + '0f' * 64, 2.5)  # signer prefixed, raw hex signature
+    block.add_signature('beta:' + 'not hex', 1)  # signer prefixed, str signature
+    block.add_signature('cd' * 64, 3)  # legacy signature without a signer
+    block.add_signature('legacy', 0.5)
+    return block
+
+
+def test_block_round_trip_keeps_signers_and_header():
+    block = signed_block()
+    decoded = binary.decode_block(binary.encode_block(block))
+    assert str(decoded) == str(block)
+    assert decoded.signatures == block.signatures
+    assert [type(stake) for stake in decoded.signatures.values()] == [type(stake) for stake in block.signatures.values()]
+    assert decoded.header_hash() == block.header_hash()
+    assert decoded.verify_merkle_root()
+
+
+@pytest.mark.parametrize('sig, flags', [('alpha:' + '0f' * 64, HAS_SIGNER | RAW_HEX), ('beta:not hex', HAS_SIGNER),
+                                         ('cd' * 64, RAW_HEX), ('legacy', 0)])
+def test_signature_flags(sig, flags):
+    block = Block.from_fields(1, '2020-05-12 18:20:25.659289', [], {})
+    unsigned = binary.encode_block(block)
+    block.add_signature(sig, 1)
+    signed = binary.encode_block(block)
+    assert signed[len(unsigned)] == flags  # the count varint is one byte either way, the flags follow it
+    assert binary.decode_block(signed).signatures == {sig: 1}
+
+
+def test_empty_genesis_block():
+    block = Block(index=0)
+    decoded = binary.decode_block(binary.encode_block(block))
+    assert str(decoded) == str(block) and decoded.prev_hash == ''
+
+
+@pytest.mark.parametrize('name', ['json', 'binary'])
+def test_block_message_round_trip(name):
+    block = signed_block()
+    msg = get_codec(name).encode_message('Block', {'block': block, 'leader_id': '0', 'term': 12,
+                                                   'history': ['0', '2']})
+    assert msg['codec'] == name
+    contents = decode_message(msg)
+    assert str(contents['block']) == str(block)
+    assert contents['term'] == 12 and contents['history'] == ['0', '2'] and contents['leader_id'] == '0'
+
+
+@pytest.mark.parametrize('name', ['json', 'binary'])
+def test_transaction_message_round_trip(name):
+    tx = Transaction(_to='2', _from='1', amount=0.75, fee=0.01)
+    assert same_transaction(decode_message(get_codec(name).encode_message('Transaction', tx)), tx)
+
+
+def test_message_without_codec_is_json():
+    tx = Transaction(_to='2', _from='1', amount=1)
+    msg = get_codec('json').encode_message('Transaction', tx)
+    del msg['codec']
+    assert same_transaction(decode_message(msg), tx)
+
+
+def test_nested_values_and_none():
+    value = {'a': [1, 'two', None, [3.5, {'b': -4}]], 'empty': {}, 'list': []}
+    out = bytearray()
+    binary.write_value(out, value)
+    assert binary.read_value(Reader(bytes(out))) == value
+
+
+def test_unencodable_and_unknown_tag():
+    with pytest.raises(TypeError):
+        binary.write_value(bytearray(), object())
+    with pytest.raises(ValueError):
+        binary.read_value(Reader(b'x'))
@@ -0,0 +1,79 @@
+import queue, threading
+from datetime import datetime
+import pytest
+from Cluster import Cluster
+from Codec import decode_message, get_codec
+from KeyStore import KeyStore
+from Transport import InProcessTransport
+
+
+@pytest.fixture
+def node_dir(tmp_path, monkeypatch):
+    (tmp_path / 'code').mkdir()
+    monkeypatch.chdir(tmp_path / 'code')  # keys, chain and ledger live in ../files
+    return tmp_path
+
+
+@pytest.fixture
+def start_nodes(node_dir):
+    started = []
+
+    def start(cluster, node_ids, **kwargs):
+        nodes = start_in_threads(cluster, node_ids, **kwargs)
+        started.extend(nodes.values())
+        return nodes
+    yield start
+    for node in started:
+        node.messenger.close()
+        node.core.close()
+
+
+def start_in_threads(cluster, node_ids, **kwargs):
+    from Node import Node
+    nodes = {}
+    threads = [threading.Thread(target=lambda node_id=node_id: nodes.__setitem__(
+        node_id, Node(node_id, transport='inprocess', cluster=cluster, **kwargs))) for node_id in node_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return nodes
+
+
+def sync_message(**contents):
+    return get_codec('binary').encode_message('sync', contents)
+
+
+def test_key_store_keeps_the_genesis(node_dir):
+    genesis = datetime(2026, 1, 2, 3, 4, 5, 678)
+    assert KeyStore('0').load_genesis() is None
+    KeyStore('0').save_genesis(genesis)
+    assert KeyStore('0').load_genesis() == genesis
+    assert KeyStore('1').load_genesis() is None
+
+
+def test_late_sync_is_answered_with_the_genesis(start_nodes):
+    cluster = Cluster(['genesis-a', 'genesis-b'])
+    nodes = start_nodes(cluster, cluster.nodes)
+    assert all(node.genesis_ready.wait(10) for node in nodes.values())
+    genesis = nodes['genesis-a'].genesis_time
+    assert nodes['genesis-b'].genesis_time == genesis
+
+    answers = queue.Queue()
+    late = InProcessTransport('blockchain')
+    late.start('genesis-late', answers.put)
+    nodes['genesis-a'].handle_incoming_message(sync_message(sender='genesis-late', start_time=str(datetime.now())))
+    answer = decode_message(answers.get(timeout=5))
+    assert datetime.fromisoformat(answer['genesis_time']) == genesis
+    assert nodes['genesis-a'].genesis_time == genesis  # not recomputed from the late start time
+    late.close()
+
+
+def test_announced_genesis_is_adopted_and_stored(start_nodes):
+    cluster = Cluster(['genesis-c', 'genesis-d'])
+    node = start_nodes(cluster, ['genesis-c'], fast_start=True)['genesis-c']
+    assert not node.genesis_ready.is_set()  # its peer never came online
+    genesis = datetime(2026, 1, 2, 3, 4, 5)
+    node.handle_incoming_message(sync_message(sender='genesis-d', genesis_time=str(genesis)))
+    assert node.genesis_ready.is_set() and node.genesis_time == genesis
+    assert KeyStore('genesis-c').load_genesis() == genesis
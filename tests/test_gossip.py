@@ -0,0 +1,116 @@
+import collections
+import pytest
+from Gossip import GOSSIP_FROM, GOSSIP_HOPS, GOSSIP_ID, Gossip, envelope, is_gossip, message_id
+
+MESSAGE = {'type': 'Transaction', 'contents': 'tx', 'codec': 'json'}
+
+
+class Network:
+    """Delivers sent messages synchronously, in order, when run() is called."""
+
+    def __init__(self):
+        self.pending = collections.deque()  # (destination, message)
+        self.sent = collections.Counter()  # sender -> messages sent
+
+    def endpoint(self, node_id):
+        network = self
+
+        class Endpoint:
+            def send(self, message, destination):
+                network.sent[node_id] += 1
+                network.pending.append((destination, message))
+
+            def broadcast(self, message, destinations):
+                for destination in destinations:
+                    self.send(message, destination)
+        return Endpoint()
+
+    def run(self, gossips):
+        delivered = collections.defaultdict(list)
+        while self.pending:
+            destination, message = self.pending.popleft()
+            contents = gossips[destination].receive(message)
+            if contents is not None:
+                delivered[destination].append(contents)
+        return delivered
+
+
+def cluster(n, **kwargs):
+    network = Network()
+    nodes = [str(node) for node in range(n)]
+    return network, {node: Gossip(node, nodes, network.endpoint(node), **kwargs) for node in nodes}
+
+
+def test_message_id_is_the_same_everywhere_and_ignores_key_order():
+    assert message_id(MESSAGE) == message_id(dict(reversed(list(MESSAGE.items()))))
+    assert message_id(MESSAGE) != message_id(dict(MESSAGE, contents='other'))
+    assert message_id({'contents': b'\x00\x01'}) != message_id({'contents': b'\x00\x02'})
+
+
+def test_envelope():
+    wrapped = envelope(MESSAGE, 'client', 2)
+    assert is_gossip(wrapped) and not is_gossip(MESSAGE)
+    assert (wrapped[GOSSIP_ID], wrapped[GOSSIP_FROM], wrapped[GOSSIP_HOPS]) == (message_id(MESSAGE), 'client', '2')
+
+
+def test_every_node_processes_a_message_once():
+    network, gossips = cluster(30, fanout=4)
+    gossips['0'].broadcast(MESSAGE)
+    delivered = network.run(gossips)
+    assert all(messages == [MESSAGE] for messages in delivered.values())
+    assert '0' not in delivered  # the origin does not process its own message again
+    assert len(delivered) >= 25  # push alone may miss a few nodes
+    assert max(network.sent.values()) <= 4
+    duplicates = sum(gossip.counters['duplicates'] for gossip in gossips.values())
+    assert sum(gossip.counters['received'] for gossip in gossips.values()) == len(delivered) + duplicates
+
+
+def test_relays_exclude_the_sender():
+    network, gossips = cluster(3, fanout=2)
+    gossips['1'].receive(envelope(MESSAGE, '0'))
+    assert [destination for destination, _ in network.pending] == ['2']
+    assert network.pending[0][1][GOSSIP_HOPS] == '1'
+
+
+def test_max_hops_stops_relaying():
+    network, gossips = cluster(10, fanout=2, max_hops=1)
+    assert gossips['1'].receive(envelope(MESSAGE, '0', hops=1)) == MESSAGE
+    assert not network.pending
+
+
+def test_seen_ids_are_bounded():
+    network, gossips = cluster(2, seen_size=2)
+    gossip = gossips['0']
+    for i in range(3):
+        gossip.receive(envelope({'contents': str(i)}, '1'))
+    assert len(gossip.seen) == 2
+    assert gossip.receive(envelope({'contents': '0'}, '1')) == {'contents': '0'}  # forgotten, processed again
+
+
+def test_push_pull_reaches_every_node():
+    network, gossips = cluster(20, fanout=1, mode='push-pull', max_hops=0)  # push alone stops after the first peer
+    gossips['0'].broadcast(MESSAGE)
+    reached = {'0'} | set(network.run(gossips))
+    for _ in range(100):
+        if len(reached) == 20:
+            break
+        for gossip in gossips.values():
+            gossip.pull_round()
+        reached |= set(network.run(gossips))
+    assert len(reached) == 20
+    assert sum(gossip.counters['pushed'] + gossip.counters['pulled'] for gossip in gossips.values()) >= 18
+
+
+def test_digest_answers_both_ways():
+    network, gossips = cluster(2, mode='push-pull')
+    gossips['0'].broadcast(MESSAGE)
+    gossips['1'].remember(message_id({'contents': 'only 1'}), {'contents': 'only 1'})
+    network.pending.clear()
+    gossips['0'].pull_round()
+    delivered = network.run(gossips)
+    assert delivered == {'1': [MESSAGE], '0': [{'contents': 'only 1'}]}
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Gossip('0', ['1'], None, mode='flood')
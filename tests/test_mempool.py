@@ -0,0 +1,82 @@
+import threading
+import pytest
+from Block import Block
+from Mempool import Mempool
+from Transaction import Transaction
+
+
+def pending(n):
+    return [Transaction(_to='1', _from='0', amount=0.1) for _ in range(n)]
+
+
+def ids(transactions):
+    return [tx.unique_id for tx in transactions]
+
+
+def test_add_keeps_arrival_order_and_ignores_duplicates():
+    mempool = Mempool()
+    transactions = pending(5)
+    assert all(mempool.add(tx) for tx in transactions)
+    assert not mempool.add(transactions[2])
+    assert ids(mempool.snapshot()) == ids(transactions)
+    assert mempool.duplicates == 1
+    assert transactions[3] in mempool and transactions[3].unique_id in mempool
+
+
+def test_remove_and_remove_committed():
+    mempool = Mempool()
+    transactions = pending(6)
+    for tx in transactions:
+        mempool.add(tx)
+    assert mempool.remove(transactions[0].unique_id) is transactions[0]
+    assert mempool.remove(transactions[0].unique_id) is None
+    assert mempool.remove_committed(Block(index=1, transactions=transactions[:3])) == 2
+    assert ids(mempool) == ids(transactions[3:])
+
+
+def test_evict_oldest():
+    mempool = Mempool(capacity=3)
+    transactions = pending(5)
+    for tx in transactions:
+        mempool.add(tx)
+    assert mempool.snapshot() == transactions[2:]
+    assert mempool.evicted == 2
+
+
+def test_reject_new():
+    mempool = Mempool(capacity=3, eviction=Mempool.REJECT_NEW)
+    transactions = pending(5)
+    assert [mempool.add(tx) for tx in transactions] == [True, True, True, False, False]
+    assert mempool.snapshot() == transactions[:3]
+
+
+def test_unknown_eviction_policy():
+    with pytest.raises(ValueError):
+        Mempool(eviction='random')
+
+
+def test_snapshot_is_a_copy():
+    mempool = Mempool()
+    mempool.add(pending(1)[0])
+    snapshot = mempool.snapshot()
+    mempool.clear()
+    assert len(snapshot) == 1 and len(mempool) == 0
+
+
+def test_concurrent_adds_and_removes():
+    mempool = Mempool()
+    transactions = pending(4000)
+
+    def add(part):
+        for tx in part:
+            mempool.add(tx)
+
+    threads = [threading.Thread(target=add, args=(transactions[i::4] + transactions[:100],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(mempool) == 4000
+    assert mempool.duplicates == 400
+    assert mempool.remove_all(ids(transactions[:2000])) == 2000
+    assert len(mempool) == 2000
@@ -0,0 +1,107 @@
+import hashlib
+import pytest
+from Block import Block
+from BlockChain import BlockChain
+from Ledger import Ledger
+from Merkle import EMPTY_ROOT, leaf_hash, merkle_proof, merkle_root, node_hash, verify_proof
+from Transaction import Transaction
+
+
+def ids(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+def test_empty_and_single_leaf():
+    assert merkle_root([]) == EMPTY_ROOT
+    leaf = ids(1)
+    assert merkle_root(leaf) == leaf_hash(leaf[0]).hex()
+    assert merkle_proof(leaf, 0) == []
+    assert verify_proof(leaf[0], [], merkle_root(leaf))
+
+
+def test_odd_leaf_is_carried_up_not_duplicated():
+    a, b, c = ids(3)
+    assert merkle_root([a, b, c]) == node_hash(node_hash(leaf_hash(a), leaf_hash(b)), leaf_hash(c)).hex()
+    assert merkle_root([a, b, c]) != merkle_root([a, b, c, c])
+    assert merkle_proof([a, b, c], 2) == [('L', node_hash(leaf_hash(a), leaf_hash(b)).hex())]
+
+
+@pytest.mark.parametrize('n', [2, 3, 5, 6, 7, 9, 11, 16, 17])
+def test_every_proof_verifies(n):
+    leaves = ids(n)
+    root = merkle_root(leaves)
+    for position, unique_id in enumerate(leaves):
+        assert verify_proof(unique_id, merkle_proof(leaves, position), root)
+
+
+@pytest.mark.parametrize('n', [3, 5, 7])
+def test_proof_of_another_leaf_is_rejected(n):
+    leaves = ids(n)
+    root = merkle_root(leaves)
+    assert not verify_proof(leaves[0], merkle_proof(leaves, n - 1), root)
+    assert not verify_proof(leaves[-1], merkle_proof(leaves, 0), root)
+
+
+def test_leaf_cannot_pose_as_inner_node():
+    a, b = ids(2)
+    inner = node_hash(leaf_hash(a), leaf_hash(b))
+    assert leaf_hash(inner.hex()) != inner
+
+
+def test_non_hex_ids():
+    leaves = ['reward-1', 'reward-2', 'reward-3']
+    root = merkle_root(leaves)
+    assert all(verify_proof(leaf, merkle_proof(leaves, i), root) for i, leaf in enumerate(leaves))
+
+
+def test_block_root_covers_its_transactions():
+    block = Block(index=1, transactions=[Transaction(_to='1', _from='0', amount=i) for i in range(5)])
+    assert block.verify_merkle_root()
+    assert block.merkle_root == merkle_root([tx.unique_id for tx in block.transactions])
+    reordered = Block.from_fields(1, block.timestamp, list(reversed(block.transactions)), {}, '', block.merkle_root)
+    assert not reordered.verify_merkle_root()
+
+
+def test_other_spellings_of_an_id_get_other_leaves():
+    unique_id = ids(1)[0]
+    spellings = [unique_id.upper(), ' ' + unique_id, unique_id[:8] + ' ' + unique_id[8:]]
+    assert len({leaf_hash(spelling) for spelling in spellings + [unique_id]}) == len(spellings) + 1
+    root = merkle_root([unique_id])
+    assert not any(verify_proof(spelling, [], root) for spelling in spellings)
+
+
+def test_text_id_cannot_pass_for_hex_bytes():
+    assert leaf_hash('6162') != leaf_hash('ab')
+
+
+def test_tampered_transaction_keeps_root_but_fails_id_check():
+    block = Block(index=1, transactions=[Transaction(_to='1', _from='0', amount=2)])
+    assert block.verify_transaction_ids()
+    relayed = Block(str(block))
+    relayed.transactions[0].amount = 200
+    relayed.transactions[0].to_node = '3'
+    relayed.invalidate()
+    assert relayed.verify_merkle_root() and relayed.header_hash() == block.header_hash()
+    assert not relayed.verify_transaction_ids()
+
+
+def test_extends_tip_rejects_a_tampered_transaction(tmp_path, monkeypatch):
+    (tmp_path / 'code').mkdir()
+    monkeypatch.chdir(tmp_path / 'code')  # the chain lives in ../files
+    chain = BlockChain('0', Ledger('0', {'0': 10, '1': 10}))
+    block = Block(index=1, transactions=[Transaction(_to='1', _from='0', amount=2)],
+                  prev_hash=chain.get_last_block().header_hash())
+    assert chain.extends_tip(Block(str(block)))
+    relayed = Block(str(block))
+    relayed.transactions[0].amount = 9
+    relayed.invalidate()
+    assert not chain.extends_tip(relayed)
+
+
+def test_every_node_creates_the_same_genesis_block(tmp_path, monkeypatch):
+    hashes = set()
+    for node_id in '01':
+        (tmp_path / node_id / 'code').mkdir(parents=True)
+        monkeypatch.chdir(tmp_path / node_id / 'code')
+        hashes.add(BlockChain(node_id, Ledger(node_id, {'0': 10, '1': 10})).get_last_block().header_hash())
+    assert len(hashes) == 1
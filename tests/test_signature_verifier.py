@@ -0,0 +1,100 @@
+import threading
+import pytest
+from Block import Block
+from SignatureVerifier import SignatureVerifier
+from Signer import get_signer, signature_key
+
+
+@pytest.fixture(scope='module')
+def signers():
+    return {node: get_signer('ed25519').generate() for node in '0123'}
+
+
+def signed_block(signers, nodes='123'):
+    block = Block(index=1)
+    digest = bytes.fromhex(block.header_hash())
+    for node in nodes:
+        block.add_signature(signature_key(node, signers[node].sign(digest)), 1)
+    return block
+
+
+def verifier_for(signers, cache_size=SignatureVerifier.DEFAULT_CACHE_SIZE):
+    verifier = SignatureVerifier(cache_size)
+    for node, signer in signers.items():
+        verifier.register(node, signer.public_key)
+    return verifier
+
+
+def test_valid_block_verifies_and_is_cached(signers):
+    verifier = verifier_for(signers)
+    block = signed_block(signers)
+    assert verifier.verify_block(block)
+    assert verifier.stats()['verifications'] == 3 and verifier.stats()['cache_misses'] == 3
+    assert verifier.verify_block(block)
+    assert verifier.last_block_verifications == 0 and verifier.stats()['cache_hits'] == 3
+
+
+def test_signature_is_checked_against_its_signer_only(signers):
+    verifier = verifier_for(signers)
+    block = Block(index=1)
+    digest = bytes.fromhex(block.header_hash())
+    block.add_signature(signature_key('2', signers['1'].sign(digest)), 1)  # signed by 1, claimed by 2
+    assert not verifier.verify_block(block)
+    assert verifier.stats()['failures'] == 1
+
+
+def test_signature_of_another_block_fails(signers):
+    verifier = verifier_for(signers)
+    other = Block(index=2)
+    sig = signature_key('1', signers['1'].sign(bytes.fromhex(other.header_hash())))
+    assert verifier.verify(sig, bytes.fromhex(other.header_hash()))
+    assert not verifier.verify(sig, bytes.fromhex(Block(index=1).header_hash()))
+
+
+@pytest.mark.parametrize('sig, counter', [('9:' + 'ab' * 64, 'unknown_signers'),  # unregistered signer
+                                          ('ab' * 64, 'unknown_signers'),  # no signer prefix
+                                          ('1:not hex', 'failures')])
+def test_unusable_signatures_are_rejected(signers, sig, counter):
+    verifier = verifier_for(signers)
+    assert not verifier.verify(sig, b'message')
+    assert verifier.stats()[counter] == 1
+
+
+def test_failed_signatures_are_not_cached(signers):
+    verifier = verifier_for(signers)
+    sig = signature_key('1', signers['1'].sign(b'other'))
+    assert not verifier.verify(sig, b'message') and not verifier.verify(sig, b'message')
+    assert verifier.stats()['verifications'] == 2 and verifier.stats()['cache_hits'] == 0
+
+
+def test_cache_is_bounded(signers):
+    verifier = verifier_for(signers, cache_size=2)
+    for i in range(5):
+        message = bytes([i]) * 32
+        assert verifier.verify(signature_key('1', signers['1'].sign(message)), message)
+    assert len(verifier.cache) == 2
+
+
+def test_counters_are_exact_under_concurrency(signers):
+    verifier = verifier_for(signers)
+    block = signed_block(signers)
+    verifier.verify_block(block)
+    digest = bytes.fromhex(block.header_hash())
+    signatures = list(block.signatures) + ['9:' + 'ab' * 32, '1:zz']
+    rounds, n_threads = 300, 8
+
+    def work():
+        for _ in range(rounds):
+            for sig in signatures:
+                verifier.verify(sig, digest)
+
+    threads = [threading.Thread(target=work) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = verifier.stats()
+    assert stats['cache_hits'] == 3 * rounds * n_threads  # every lookup after the first verify_block hits
+    assert stats['cache_misses'] == 3
+    assert stats['unknown_signers'] == rounds * n_threads
+    assert stats['failures'] == rounds * n_threads
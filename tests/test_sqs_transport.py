@@ -0,0 +1,140 @@
+import queue, threading
+import pytest
+from LocalSqs import LocalSqs
+from Transport import SqsTransport, broadcast_results
+
+
+def transport(sqs, **kwargs):
+    return SqsTransport('blockchain', client=sqs, queue_urls={node: node for node in '0123'}, **kwargs)
+
+
+def listen(sqs, node, **kwargs):
+    receiver = transport(sqs, wait_time=1, **kwargs)
+    received = queue.Queue()
+    receiver.start(node, received.put)
+    return receiver, received
+
+
+def test_sends_are_batched_and_keep_their_order():
+    sqs = LocalSqs()
+    sender = transport(sqs, send_window=0.05)
+    futures = [sender.send({'type': 'transaction', 'contents': str(i)}, '1') for i in range(25)]
+    assert all(future.result(timeout=5) for future in futures)
+    assert sqs.calls['send_message_batch'] <= 4  # 3 full windows, a 4th if the sender wakes up mid-loop
+    receiver, received = listen(sqs, '1')
+    assert [received.get(timeout=5)['contents'] for _ in range(25)] == [str(i) for i in range(25)]
+    sender.close()
+    receiver.close()
+
+
+def test_receives_and_deletes_in_batches():
+    sqs = LocalSqs()
+    sender = transport(sqs, send_window=0.05)
+    for i in range(20):
+        sender.send({'type': 'transaction', 'contents': str(i)}, '1')
+    sender.flush()
+    receiver, received = listen(sqs, '1')
+    for _ in range(20):
+        received.get(timeout=5)
+    assert receiver.calls['received'] == 20
+    assert receiver.calls['delete_message_batch'] == 2
+    assert not sqs.in_flight
+    sender.close()
+    receiver.close()
+
+
+def test_batches_stay_below_the_byte_limit():
+    sqs = LocalSqs()
+    sender = transport(sqs, send_window=0.05)
+    big = {'type': 'Block', 'contents': 'x' * (100 * 1024)}
+    futures = [sender.send(big, '1') for _ in range(5)]
+    assert all(future.result(timeout=5) for future in futures)  # LocalSqs raises for a batch above 256KiB
+    assert sqs.calls['send_message_batch'] >= 3
+    sender.close()
+
+
+def test_bytes_values_are_sent_as_binary_attributes():
+    sqs = LocalSqs()
+    sender = transport(sqs)
+    message = {'type': 'Block', 'contents': bytes(range(256)), 'codec': 'binary'}
+    sender.send(message, '1').result(timeout=5)
+    receiver, received = listen(sqs, '1')
+    assert received.get(timeout=5) == message
+    sender.close()
+    receiver.close()
+
+
+class FailingSqs(LocalSqs):
+    """LocalSqs whose first calls of a method raise."""
+
+    def __init__(self, method, failures):
+        super().__init__()
+        self.method = method
+        self.failures = failures
+
+    def call(self, method: str):
+        super().call(method)
+        if method == self.method and self.failures:
+            self.failures -= 1
+            raise ConnectionError('simulated outage')
+
+
+def test_listener_survives_receive_errors(monkeypatch):
+    monkeypatch.setattr(SqsTransport, 'RETRY_INTERVAL', 0.01)
+    sqs = FailingSqs('receive_message', 3)
+    receiver, received = listen(sqs, '1')
+    sender = transport(sqs)
+    sender.send({'type': 'sync', 'contents': 'after the outage'}, '1')
+    assert received.get(timeout=5)['contents'] == 'after the outage'
+    assert receiver.calls['receive_errors'] == 3
+    sender.close()
+    receiver.close()
+
+
+def test_failed_send_resolves_its_futures_with_the_error():
+    sqs = FailingSqs('send_message_batch', 1)
+    sender = transport(sqs)
+    with pytest.raises(ConnectionError):
+        sender.send({'type': 'sync', 'contents': 'lost'}, '1').result(timeout=5)
+    assert sender.send({'type': 'sync', 'contents': 'sent'}, '1').result(timeout=5) is True
+    sender.close()
+
+
+class ConcurrencySqs(LocalSqs):
+    """LocalSqs recording how many send calls run at the same time."""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+
+    def send_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return super().send_message_batch(QueueUrl, Entries)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.mark.parametrize('max_in_flight', [1, 2, 4])
+def test_destinations_are_sent_to_concurrently_up_to_max_in_flight(max_in_flight):
+    sqs = ConcurrencySqs(0.05)
+    sender = transport(sqs, send_window=0.02, max_in_flight=max_in_flight)
+    results = broadcast_results(sender.broadcast({'type': 'Block', 'contents': 'b'}, '0123'), timeout=5)
+    assert results == {node: True for node in '0123'}
+    assert sqs.peak == max_in_flight
+    sender.close()
+
+
+def test_transports_share_one_client(monkeypatch):
+    pytest.importorskip('boto3')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setattr(SqsTransport, 'shared_clients', [])
+    first, second = SqsTransport('blockchain'), SqsTransport('election')
+    assert first.sqs is second.sqs
+    assert first.sqs.meta.config.max_pool_connections == 2 * (SqsTransport.MAX_IN_FLIGHT + 1)
+    first.close()
+    second.close()
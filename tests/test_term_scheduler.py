@@ -0,0 +1,61 @@
+import queue, time
+from datetime import datetime, timedelta
+from TermScheduler import TermScheduler
+
+TERM = 0.05
+
+
+def run(scheduler, genesis, terms):
+    started = queue.Queue()
+    scheduler.register(lambda term: started.put((term, time.monotonic())))
+    scheduler.start(genesis)
+    try:
+        return [started.get(timeout=5) for _ in range(terms)]
+    finally:
+        scheduler.stop()
+
+
+def test_terms_start_on_their_boundaries():
+    scheduler = TermScheduler(TERM)
+    starts = run(scheduler, datetime.now() + timedelta(seconds=TERM), 5)
+    assert [term for term, _ in starts] == [1, 2, 3, 4, 5]
+    for term, start in starts:
+        assert 0 <= start - scheduler.boundary(term) < TERM / 2
+    assert scheduler.stats()['missed'] == 0
+
+
+def test_late_start_joins_the_current_term():
+    scheduler = TermScheduler(TERM)
+    genesis = datetime.now() - timedelta(seconds=10 * TERM + TERM / 2)  # halfway through term 11
+    assert [term for term, _ in run(scheduler, genesis, 2)] == [11, 12]
+
+
+def test_genesis_days_ago():
+    scheduler = TermScheduler(3600)
+    scheduler.anchor_to(datetime.now() - timedelta(days=2, minutes=30))
+    assert scheduler.current_term() == 49
+
+
+def test_slow_callbacks_skip_terms_without_drifting():
+    scheduler = TermScheduler(TERM)
+    scheduler.register(lambda term: time.sleep(2.5 * TERM) if term == 2 else None)
+    starts = run(scheduler, datetime.now() + timedelta(seconds=TERM), 4)
+    assert [term for term, _ in starts] == [1, 2, 4, 5]  # term 2 runs into term 4
+    assert scheduler.stats()['missed'] == 1
+    for term, start in starts:
+        assert start >= scheduler.boundary(term)
+    assert starts[-1][1] - scheduler.boundary(5) < TERM / 2
+
+
+def test_failing_callback_does_not_stop_the_terms(capsys):
+    scheduler = TermScheduler(TERM)
+    scheduler.register(lambda term: 1 / 0)
+    assert [term for term, _ in run(scheduler, datetime.now(), 2)] == [1, 2]
+    assert 'ZeroDivisionError' in capsys.readouterr().out
+
+
+def test_no_term_before_genesis():
+    scheduler = TermScheduler(TERM)
+    assert scheduler.current_term() == 0
+    scheduler.anchor_to(datetime.now() + timedelta(seconds=1))
+    assert scheduler.current_term() == 0
@@ -0,0 +1,143 @@
+import queue, threading, time
+import pytest
+from ElectionTimer import ElectionTimer
+from Heartbeat import Heartbeat
+from TimerService import ServiceTimer, TimerService
+
+
+@pytest.fixture
+def service():
+    service = TimerService('Test Timers')
+    yield service
+    service.close()
+
+
+def test_timeouts_fire_in_deadline_order(service):
+    fired = queue.Queue()
+    for delay in (0.06, 0.02, 0.04):
+        service.schedule(delay, lambda delay=delay: fired.put(delay))
+    assert [fired.get(timeout=2) for _ in range(3)] == [0.02, 0.04, 0.06]
+    assert service.fired == 3
+    assert service.max_lateness < 0.05
+
+
+def test_an_earlier_timeout_wakes_the_thread(service):
+    fired = queue.Queue()
+    service.schedule(10, lambda: fired.put('late'))
+    start = time.monotonic()
+    service.schedule(0.02, lambda: fired.put('early'))
+    assert fired.get(timeout=2) == 'early'
+    assert time.monotonic() - start < 1
+
+
+def test_cancelled_timeouts_never_fire(service):
+    fired = []
+    timeout = service.schedule(0.02, lambda: fired.append(1))
+    service.cancel(timeout)
+    service.cancel(timeout)
+    time.sleep(0.1)
+    assert fired == [] and service.cancelled == 1 and service.pending() == 0
+
+
+def test_heap_is_compacted(service):
+    timeouts = [service.schedule(60, lambda: None) for _ in range(4 * TimerService.COMPACT_SIZE)]
+    for timeout in timeouts:
+        service.cancel(timeout)
+    assert len(service.heap) <= TimerService.COMPACT_SIZE + 1
+
+
+def test_a_failing_callback_does_not_stop_the_service(service, capsys):
+    fired = queue.Queue()
+    service.schedule(0.01, lambda: 1 / 0)
+    service.schedule(0.02, lambda: fired.put('next'))
+    assert fired.get(timeout=2) == 'next'
+    assert 'ZeroDivisionError' in capsys.readouterr().out
+
+
+def test_idle_service_sleeps(service):
+    start = time.process_time()
+    time.sleep(0.3)
+    assert time.process_time() - start < 0.1
+
+
+class Counting(ServiceTimer):
+    def __init__(self, service, delay, dispatch=None):
+        super().__init__(service, dispatch)
+        self.delay = delay
+        self.fired = queue.Queue()
+
+    def new_timeout(self):
+        return self.delay
+
+    def on_timeout(self):
+        self.fired.put(threading.current_thread().name)
+
+
+def test_restart_replaces_the_running_timeout(service):
+    timer = Counting(service, 0.05)
+    timer.restart_timer()
+    for _ in range(5):
+        time.sleep(0.02)
+        timer.restart_timer()
+    assert timer.fired.empty()
+    assert timer.fired.get(timeout=2) == 'Test Timers'
+    assert timer.fired.empty() and not timer.active
+
+
+def test_stop_timer(service):
+    timer = Counting(service, 0.02)
+    timer.restart_timer()
+    assert timer.active
+    timer.stop_timer()
+    time.sleep(0.1)
+    assert timer.fired.empty() and not timer.active
+
+
+def test_timeout_stopped_before_dispatch_runs_is_dropped(service):
+    dispatched = []
+    timer = Counting(service, 0.01, dispatch=lambda function, *args: dispatched.append((function, args)))
+    timer.restart_timer()
+    for _ in range(100):
+        if dispatched:
+            break
+        time.sleep(0.01)
+    timer.stop_timer()
+    function, args = dispatched[0]
+    function(*args)
+    assert timer.fired.empty()
+
+
+class Election:
+    _id = '0'
+    election_state = 'leader'
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.heartbeats = queue.Queue()
+
+    def request_leadership(self):
+        self.requests.put(time.monotonic())
+
+    def send_heartbeat(self):
+        self.heartbeats.put(time.monotonic())
+
+
+def test_election_timer_fires_between_duration_and_three_times_duration(service):
+    target = Election()
+    timer = ElectionTimer(0.02, target, service)
+    start = time.monotonic()
+    timer.restart_timer()
+    assert 0.02 <= target.requests.get(timeout=2) - start < 0.5
+    assert timer.active  # restarted for the next election
+    timer.stop_timer()
+
+
+def test_heartbeat_stops_when_no_longer_leader(service):
+    target = Election()
+    heartbeat = Heartbeat(0.08, target, service)
+    heartbeat.restart_timer()
+    for _ in range(3):
+        target.heartbeats.get(timeout=2)
+    target.election_state = 'follower'
+    time.sleep(0.05)
+    assert not heartbeat.active
@@ -0,0 +1,64 @@
+import pytest
+from Block import Block
+from Mempool import Mempool
+from Transaction import Transaction
+from TransactionBatch import TransactionBatch, iter_transfers
+
+
+def pending():
+    return [Transaction(_to='1', _from='0', amount=0.1, fee=0.01), Transaction(_to='2', _from='reward', amount=50),
+            Transaction(_to='0', _from='3', amount=2.5, fee=1)]
+
+
+def test_transactions_are_slotted():
+    with pytest.raises(AttributeError):
+        pending()[0].extra = 1
+
+
+def test_round_trip():
+    transactions = pending()
+    batch = TransactionBatch(transactions)
+    assert len(batch) == 3
+    assert [str(tx) for tx in batch] == [str(tx) for tx in transactions]
+    assert [tx.generateIDh() for tx in batch] == [tx.unique_id for tx in transactions]
+    assert str(batch[-1]) == str(transactions[-1])
+    assert [str(tx) for tx in batch[1:]] == [str(tx) for tx in transactions[1:]]
+    assert batch.to_dicts() == [tx.to_dict() for tx in transactions]
+    with pytest.raises(IndexError):
+        batch[3]
+
+
+def test_block_encoding_does_not_depend_on_the_container():
+    transactions = pending()
+    batched = Block.from_fields(1, 'now', TransactionBatch(transactions), {})
+    listed = Block.from_fields(1, 'now', transactions, {})
+    assert str(batched) == str(listed)
+    assert batched.header_hash() == listed.header_hash()
+
+
+def test_lookup_and_transfers():
+    transactions = pending()
+    batch = TransactionBatch(transactions)
+    assert transactions[2] in batch
+    assert batch.index_of(transactions[1].unique_id) == 1
+    assert batch.index_of(Transaction(_to='1', _from='0', amount=1).unique_id) == -1
+    assert list(batch.transfers()) == list(iter_transfers(transactions))
+    assert batch.total_amount() == pytest.approx(52.6)
+
+
+def test_rejects_ids_and_timestamps_it_cannot_pack():
+    tx = pending()[0]
+    with pytest.raises(ValueError):
+        TransactionBatch([Transaction.from_fields('1', '0', 1, tx.timestamp, 'abcd')])
+    with pytest.raises(ValueError):
+        TransactionBatch([Transaction.from_fields('1', '0', 1, 'yesterday', tx.unique_id)])
+
+
+def test_mempool_add_batch():
+    transactions = pending()
+    mempool = Mempool(capacity=4)
+    mempool.add(transactions[1])
+    assert mempool.add_batch(TransactionBatch(transactions)) == 2
+    assert mempool.duplicates == 1
+    assert mempool.add_batch(pending()) == 3
+    assert mempool.evicted == 2 and len(mempool) == 4
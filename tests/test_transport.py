@@ -0,0 +1,185 @@
+import queue, socket, struct, time
+import pytest
+from Transport import (FRAME_HEADER, InProcessTransport, TcpTransport, broadcast_results, completed, decode_frame,
+                       encode_frame)
+
+MESSAGE = {'type': 'Block', 'contents': bytes(range(256)) * 4, 'codec': 'binary', 'note': 'ünïcode'}
+
+
+def free_port_block(size: int) -> int:
+    """Returns a base port with size free ports after it on the blockchain channel."""
+    for base in range(21000, 40000, 250):
+        sockets = []
+        try:
+            for port in range(base, base + size):
+                s = socket.socket()
+                s.bind((TcpTransport.DEFAULT_HOST, port))
+                sockets.append(s)
+            return base
+        except OSError:
+            continue
+        finally:
+            for s in sockets:
+                s.close()
+    raise RuntimeError('no free ports')
+
+
+def test_frame_round_trip():
+    frame = encode_frame(MESSAGE)
+    length, = FRAME_HEADER.unpack_from(frame)
+    assert length == len(frame) - FRAME_HEADER.size
+    assert decode_frame(frame[FRAME_HEADER.size:]) == MESSAGE
+
+
+def test_inprocess_keeps_messages_sent_before_start():
+    sender, receiver = InProcessTransport('blockchain'), InProcessTransport('blockchain')
+    for i in range(3):
+        assert sender.send({'type': 'sync', 'contents': str(i)}, 'early').result() is True
+    received = queue.Queue()
+    receiver.start('early', received.put)
+    assert [received.get(timeout=2)['contents'] for _ in range(3)] == ['0', '1', '2']
+    receiver.close()
+
+
+def test_tcp_round_trip_with_named_nodes():
+    base = free_port_block(2)
+    addresses = {'alpha': (TcpTransport.DEFAULT_HOST, base), 'beta': (TcpTransport.DEFAULT_HOST, base + 1)}
+    alpha = TcpTransport('blockchain', addresses=addresses)
+    beta = TcpTransport('blockchain', addresses=addresses)
+    received = queue.Queue()
+    alpha.start('alpha', lambda message: None)
+    beta.start('beta', received.put)
+    results = broadcast_results(alpha.broadcast(MESSAGE, ['beta']), timeout=5)
+    assert results == {'beta': True}
+    assert received.get(timeout=5) == MESSAGE
+    alpha.close()
+    beta.close()
+
+
+def test_non_numeric_id_without_address():
+    with pytest.raises(ValueError):
+        TcpTransport('blockchain').address_of('alpha')
+
+
+def test_oversized_frame_closes_the_connection():
+    base = free_port_block(1)
+    receiver = TcpTransport('blockchain', base_port=base)
+    received = queue.Queue()
+    receiver.start('0', received.put)
+    with socket.create_connection((TcpTransport.DEFAULT_HOST, base), timeout=5) as connection:
+        connection.sendall(struct.pack('>I', TcpTransport.MAX_FRAME + 1) + b'x' * 64)
+        assert connection.recv(1) == b''  # closed without waiting for the announced bytes
+    assert received.empty()
+    receiver.close()
+
+
+def test_oversized_message_is_refused_on_send(monkeypatch):
+    monkeypatch.setattr(TcpTransport, 'MAX_FRAME', 100)
+    sender = TcpTransport('blockchain', base_port=free_port_block(1))
+    with pytest.raises(ValueError):
+        sender.send({'contents': 'x' * 200}, '0').result(timeout=1)
+    sender.close()
+
+
+def test_reconnects_back_off(monkeypatch):
+    monkeypatch.setattr(TcpTransport, 'RETRY_INTERVAL', 0.02)
+    monkeypatch.setattr(TcpTransport, 'MAX_RETRY_INTERVAL', 0.16)
+    base = free_port_block(1)
+    sender = TcpTransport('blockchain', base_port=base)
+    attempts = []
+    original = TcpTransport.address_of
+
+    def counted(self, node_id):
+        attempts.append(time.monotonic())
+        return original(self, node_id)
+
+    monkeypatch.setattr(TcpTransport, 'address_of', counted)
+    future = sender.send({'type': 'sync'}, '0')  # nobody listens yet
+    time.sleep(0.6)
+    assert 4 <= len(attempts) <= 8  # 0.02, 0.04, 0.08, 0.16, 0.16 ... instead of one attempt per 0.02 s
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert gaps[-1] > 2 * gaps[0]
+    received = queue.Queue()
+    receiver = TcpTransport('blockchain', base_port=base)
+    receiver.start('0', received.put)
+    assert future.result(timeout=2) is True
+    assert received.get(timeout=2) == {'type': 'sync'}
+    sender.close()
+    receiver.close()
+
+
+def test_transaction_generator_reaches_inprocess_nodes():
+    from Cluster import Cluster
+    from Codec import decode_message
+    from TransactionGenerator import Tx_Generator
+    cluster = Cluster(['gen-a', 'gen-b', 'gen-c'])
+    generator = Tx_Generator(cluster, 'inprocess')
+    message = {'contents': generator.make_tx(), 'type': 'Transaction'}
+    assert generator.broadcast(message, cluster.nodes) == {node: True for node in cluster.nodes}
+    for node in cluster.nodes:
+        received = queue.Queue()
+        receiver = InProcessTransport('blockchain')
+        receiver.start(node, received.put)
+        assert decode_message(received.get(timeout=2)).unique_id == decode_message(message).unique_id
+        receiver.close()
+
+
+def test_broadcast_results_reports_errors_and_timeouts():
+    from concurrent.futures import Future
+    failed, pending = Future(), Future()
+    failed.set_exception(ConnectionError('refused'))
+    results = broadcast_results({'a': completed(), 'b': failed, 'c': pending}, timeout=0.05)
+    assert results['a'] is True
+    assert isinstance(results['b'], ConnectionError)
+    assert isinstance(results['c'], TimeoutError)
+
+
+def test_tcp_broadcast_reaches_every_node_and_waits_for_late_ones():
+    base = free_port_block(4)
+    sender = TcpTransport('blockchain', base_port=base, max_in_flight=2)
+    sender.start('0', lambda message: None)
+    receivers, inboxes = [], {}
+    for node in '12':
+        receivers.append(TcpTransport('blockchain', base_port=base))
+        inboxes[node] = queue.Queue()
+        receivers[-1].start(node, inboxes[node].put)
+    futures = sender.broadcast(MESSAGE, '123')
+    assert broadcast_results({node: futures[node] for node in '12'}, timeout=5) == {'1': True, '2': True}
+    assert not futures['3'].done()  # not listening yet, a slow peer does not hold up the others
+    receivers.append(TcpTransport('blockchain', base_port=base))
+    inboxes['3'] = queue.Queue()
+    receivers[-1].start('3', inboxes['3'].put)
+    assert futures['3'].result(timeout=5) is True
+    assert all(inbox.get(timeout=5) == MESSAGE for inbox in inboxes.values())
+    for transport in [sender] + receivers:
+        transport.close()
+
+
+def test_tcp_outbox_is_bounded(monkeypatch):
+    monkeypatch.setattr(TcpTransport, 'MAX_OUTBOX', 3)
+    sender = TcpTransport('blockchain', base_port=free_port_block(1))
+    futures = [sender.send({'contents': str(i)}, '0') for i in range(5)]  # nobody listens
+    with pytest.raises(OverflowError):
+        futures[0].result(timeout=2)
+    with pytest.raises(OverflowError):
+        futures[1].result(timeout=2)
+    assert not any(future.done() for future in futures[2:])
+    sender.close()
+
+
+def test_first_message_after_a_peer_restart_is_not_lost():
+    base = free_port_block(1)
+    sender = TcpTransport('blockchain', base_port=base)
+    received = queue.Queue()
+    receiver = TcpTransport('blockchain', base_port=base)
+    receiver.start('0', received.put)
+    assert sender.send({'contents': 'before'}, '0').result(timeout=5) is True
+    assert received.get(timeout=5) == {'contents': 'before'}
+    receiver.close()
+    time.sleep(0.1)  # the close reaches the sender
+    restarted = TcpTransport('blockchain', base_port=base)
+    restarted.start('0', received.put)
+    assert sender.send({'contents': 'after'}, '0').result(timeout=5) is True
+    assert received.get(timeout=5) == {'contents': 'after'}
+    sender.close()
+    restarted.close()
@@ -0,0 +1,56 @@
+import pytest
+from Block import Block
+from SignatureVerifier import SignatureVerifier
+from Signer import get_signer, signature_key
+from VerificationPool import VerificationPool, all_valid
+
+
+@pytest.fixture(scope='module')
+def signers():
+    return {node: get_signer('ed25519').generate() for node in '0123'}
+
+
+@pytest.fixture(params=[False, True], ids=['threads', 'processes'])
+def pool(request, signers):
+    verifier = SignatureVerifier()
+    for node, signer in signers.items():
+        verifier.register(node, signer.public_key)
+    pool = VerificationPool(verifier, workers=2, use_processes=request.param)
+    yield pool
+    pool.shutdown()
+
+
+def signed_block(signers, index, forged=None):
+    block = Block(index=index)
+    digest = bytes.fromhex(block.header_hash())
+    for node in '123':
+        signer = signers['0' if node == forged else node]
+        block.add_signature(signature_key(node, signer.sign(digest)), 1)
+    return block
+
+
+def test_submit_block(pool, signers):
+    assert pool.submit_block(signed_block(signers, 1)).result(timeout=30)
+    assert not pool.submit_block(signed_block(signers, 2, forged='2')).result(timeout=30)
+
+
+def test_valid_signatures_are_cached(pool, signers):
+    block = signed_block(signers, 1)
+    assert pool.submit_block(block).result(timeout=30)
+    misses = pool.verifier.stats()['cache_misses']
+    assert pool.submit_block(block).result(timeout=30)
+    assert pool.verifier.stats()['cache_misses'] == misses
+    assert pool.verifier.stats()['cache_hits'] == 3
+
+
+def test_unknown_signer_fails_without_the_pool(pool):
+    assert not pool.submit('9:' + 'ab' * 64, b'message').result(timeout=0)
+
+
+def test_verify_blocks_keeps_order(pool, signers):
+    blocks = [signed_block(signers, i, forged='3' if i % 3 == 0 else None) for i in range(1, 8)]
+    assert pool.verify_blocks(blocks) == [(i, i % 3 != 0) for i in range(1, 8)]
+
+
+def test_all_valid_of_nothing_is_true():
+    assert all_valid([]).result(timeout=0)